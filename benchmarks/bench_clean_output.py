@@ -0,0 +1,103 @@
+"""
+Micro-benchmark du nettoyage et de la sérialisation des résultats.
+
+Compare, sur des lignes synthétiques, l'ancien pipeline pandas (re.findall
+via .apply, lambdas ligne à ligne, to_json puis json.loads puis ré-encodage)
+au nettoyage ligne à ligne en Records et à leur sérialisation directe en octets.
+
+    python -m benchmarks.bench_clean_output [nombre_de_lignes]
+"""
+import json
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+from scrapers.scraper_voltaneo import clean_output_voltaneo
+
+
+def synthetic_results(rows, seed=42):
+    rng = random.Random(seed)
+    results = []
+    for i in range(rows):
+        results.append({
+            "product_category": rng.choice(["Câbles", "Onduleurs", "Fixations"]),
+            "manufacturer": rng.choice(["Huawei", "SMA", "K2"]),
+            "manufacturer_id": f"M{i}",
+            "supplier": "voltaneo",
+            "url": f"https://webshop.voltaneo.com/produit/{i}",
+            "name": f"Produit {i}",
+            "description": "Description " * 5,
+            "technical_ref": [" Puissance :\n 3 kW ", "Tension  :  230 V\r"],
+            "unit_1": "À l'unité",
+            "price_per_unit_1": f"{rng.randint(1, 999)},{rng.randint(0, 99):02d} € HT",
+            "unit_2": "Carton",
+            "price_per_unit_2": rng.choice(["N/A", f"{rng.randint(1, 999)},50 €"]),
+            "unit_3": "N/A",
+            "price_per_unit_3": "N/A",
+            "stock": rng.choice(["En stock 12", "Sur commande", "N/A"]),
+            "is_ok": 1,
+            "error": None,
+        })
+    return results
+
+
+def legacy_clean_output(output_df):
+    for col in ['price_per_unit_1', 'price_per_unit_2', 'price_per_unit_3']:
+        output_df[col] = output_df[col].astype(str).apply(
+            lambda x: re.findall(r'[\d,]+', x)[0] if re.findall(r'[\d,]+', x) else "N/A"
+        )
+        output_df[col] = output_df[col].str.replace(',', '.').astype(float, errors='ignore')
+    output_df['is_available'] = output_df['stock'].apply(
+        lambda x: 1 if isinstance(x, str) and 'stock' in x.lower() else 0
+    )
+
+    def clean_technical_ref(raw_list):
+        cleaned = []
+        if isinstance(raw_list, list):
+            for item in raw_list:
+                if isinstance(item, str):
+                    item = item.strip().replace('\n', '').replace('\r', '')
+                    item = re.sub(r'\s+', ' ', item)
+                    cleaned.append(item)
+        return cleaned if cleaned else "N/A"
+
+    output_df['technical_ref'] = output_df['technical_ref'].apply(clean_technical_ref)
+    return output_df
+
+
+def legacy_serialize(df):
+    return json.dumps(json.loads(df.to_json(orient="records"))).encode("utf-8")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(rows=100_000):
+    results = synthetic_results(rows)
+
+    legacy_df, legacy_clean = timed(legacy_clean_output, pd.DataFrame(results))
+    records, records_clean = timed(clean_output_voltaneo, results)
+    _, legacy_json = timed(legacy_serialize, legacy_df)
+    _, direct_json = timed(records.to_json)
+
+    report = {
+        "rows": rows,
+        "clean_legacy_s": round(legacy_clean, 3),
+        "clean_records_s": round(records_clean, 3),
+        "clean_speedup": round(legacy_clean / records_clean, 1),
+        "serialize_legacy_s": round(legacy_json, 3),
+        "serialize_direct_s": round(direct_json, 3),
+        "serialize_speedup": round(legacy_json / direct_json, 1),
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
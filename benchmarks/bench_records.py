@@ -0,0 +1,88 @@
+"""
+Coût de démarrage et mémoire par ligne des résultats.
+
+Mesure, dans des processus neufs, le temps d'import des modules chargés au
+démarrage d'un worker et de l'API (et si pandas est chargé), puis la mémoire
+retenue par ligne de résultats nettoyés, en Records et convertis en
+DataFrame pandas (représentation renvoyée auparavant par scrape_*).
+
+    python -m benchmarks.bench_records [répétitions]
+"""
+import gc
+import json
+import statistics
+import subprocess
+import sys
+import tracemalloc
+
+from benchmarks.bench_clean_output import synthetic_results
+from scrapers.scraper_voltaneo import clean_output_voltaneo
+
+COLD_START_MODULES = ("scrapers.workers", "scrapers.scraper_eklor", "main")
+ROW_COUNTS = (10, 100, 10_000)
+
+_IMPORT_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "pandas": "pandas" in sys.modules,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+def cold_start(module, repeat=5):
+    samples = [
+        json.loads(subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module)],
+            capture_output=True, text=True, check=True
+        ).stdout)
+        for _ in range(repeat)
+    ]
+    return {
+        "import_ms": round(statistics.median(s["seconds"] for s in samples) * 1000, 1),
+        "max_rss_mb": round(statistics.median(s["max_rss_kb"] for s in samples) / 1024, 1),
+        "pandas_loaded": samples[0]["pandas"],
+    }
+
+
+def retained_bytes(build):
+    """
+    Octets alloués par build() et encore retenus par son résultat.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def row_memory(rows):
+    import pandas as pd
+
+    results = synthetic_results(rows)
+    records = retained_bytes(lambda: clean_output_voltaneo(results))
+    frame = retained_bytes(lambda: clean_output_voltaneo(results).to_frame())
+    return {
+        "rows": rows,
+        "records_bytes_per_row": records // rows,
+        "dataframe_bytes_per_row": frame // rows,
+        "pandas_version": pd.__version__,
+    }
+
+
+def main(repeat=5):
+    report = {
+        "cold_start": {module: cold_start(module, repeat) for module in COLD_START_MODULES},
+        "memory": [row_memory(rows) for rows in ROW_COUNTS],
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
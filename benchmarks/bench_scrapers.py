@@ -0,0 +1,239 @@
+"""
+Benchmark de bout en bout des scrapers contre le serveur de fixtures local
+(benchmarks.fixture_server), sans accès aux vrais sites.
+
+Pour chaque fournisseur, taille de catalogue et niveau de concurrence, lance
+scrape_* et mesure produits/s, latence par produit (p50/p95), temps jusqu'au
+résultat, pic de mémoire (Python + Chromium) et nombre de processus Chromium.
+
+Avec --mode listing, les produits sont lus depuis une catégorie paginée du
+serveur (/categorie/{taille}) et le rapport compte les pages de liste et les
+pages produit chargées ; le cache de résultats étant conservé d'un cas à
+l'autre, répéter une taille (--sizes 100,100) mesure un rafraîchissement.
+Avec --engine api, Voltaneo passe par l'API Store WooCommerce du serveur.
+
+    python -m benchmarks.bench_scrapers --sizes 20,100 --concurrency 1,4 --latency 50
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+from benchmarks.fixture_server import serve
+from scrapers.memory import process_tree_memory
+
+SUPPLIERS = {
+    "eklor": ("scrapers.scraper_eklor", "eklor", "EKLOR"),
+    "powr-connect": ("scrapers.scraper_powr_connect", "powr_connect", "POWR_CONNECT"),
+    "voltaneo": ("scrapers.scraper_voltaneo", "voltaneo", "VOLTANEO"),
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class ResourceSampler:
+    """
+    Échantillonne la mémoire du processus et de ses descendants, et compte
+    les processus Chromium.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self.peak_chromium = 0
+        self._task = None
+
+    def sample(self):
+        usage = process_tree_memory()
+        self.peak_rss_kb = max(self.peak_rss_kb, usage["python_kb"] + usage["browser_kb"])
+        self.peak_chromium = max(self.peak_chromium, usage["browser_processes"])
+
+    async def _loop(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+
+
+def listing_page_count(supplier):
+    from scrapers.listing import LISTING_PAGES
+
+    return sum(value for (name, _), value in LISTING_PAGES._values.items() if name == supplier)
+
+
+async def run_case(supplier, base_url, size, concurrency, engine, pool, mode="product"):
+    import importlib
+    from scrapers.session_cache import session_cache
+
+    module_name, key, _ = SUPPLIERS[supplier]
+    module = importlib.import_module(module_name)
+    scrape = getattr(module, f"scrape_{key}")
+    product_name = f"scrape_product_{key}"
+    scrape_product = getattr(module, product_name)
+    latencies = []
+    finished = []
+
+    async def timed_scrape_product(page, item):
+        start = time.perf_counter()
+        try:
+            return await scrape_product(page, item)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    payload = {
+        "credentials": {"username": "bench", "password": "bench"},
+        "concurrency": concurrency,
+        "engine": engine,
+        "data": [
+            {"url": f"{base_url}/produit/{i}", "supplier": supplier, "product_category": "bench",
+             "manufacturer": "bench", "manufacturer_id": str(i)}
+            for i in range(size)
+        ],
+    }
+    if mode == "listing":
+        payload.update(mode="listing", listings=[f"{base_url}/categorie/{size}"])
+    listing_pages = listing_page_count(key)
+    session_cache.invalidate(key, "bench")
+    setattr(module, product_name, timed_scrape_product)
+    sampler = ResourceSampler()
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        output = await scrape(
+            payload, pool=pool, on_result=lambda index, row: finished.append(time.perf_counter() - start)
+        )
+    finally:
+        elapsed = time.perf_counter() - start
+        await sampler.stop()
+        setattr(module, product_name, scrape_product)
+
+    ok = sum(1 for record in output if record.is_ok == 1) if not isinstance(output, list) else 0
+    return {
+        "supplier": supplier,
+        "size": size,
+        "concurrency": concurrency,
+        "engine": engine,
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "products_per_s": round(size / elapsed, 2) if elapsed else None,
+        "ok": ok,
+        "errors": size - ok,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            "p95": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+        },
+        "time_to_result_ms": {
+            "p50": round(percentile(finished, 0.5) * 1000, 1) if finished else None,
+            "p95": round(percentile(finished, 0.95) * 1000, 1) if finished else None,
+        },
+        "page_loads": {
+            "listing": listing_page_count(key) - listing_pages,
+            "product": len(latencies),
+        },
+        "peak_rss_mb": round(sampler.peak_rss_kb / 1024, 1),
+        "peak_chromium_processes": sampler.peak_chromium,
+    }
+
+
+async def run_all(args, urls):
+    from scrapers.browser_pool import BrowserPool
+
+    pool = BrowserPool(size=1, contexts_per_browser=max(args.concurrency), health_check_interval=0)
+    await pool.start()
+    results = []
+    try:
+        for supplier in args.suppliers:
+            for size in args.sizes:
+                for concurrency in args.concurrency:
+                    results.append(await run_case(
+                        supplier, urls[supplier], size, concurrency, args.engine, pool, args.mode
+                    ))
+                    print(json.dumps(results[-1]), file=sys.stderr)
+    finally:
+        await pool.stop()
+    return results
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"fixture server did not start on port {port}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suppliers", type=lambda s: s.split(","), default=list(SUPPLIERS))
+    parser.add_argument("--sizes", type=lambda s: [int(v) for v in s.split(",")], default=[20, 100])
+    parser.add_argument("--concurrency", type=lambda s: [int(v) for v in s.split(",")], default=[1, 4])
+    parser.add_argument("--engine", choices=("browser", "hybrid", "api"), default="browser")
+    parser.add_argument("--mode", choices=("product", "listing"), default="product")
+    parser.add_argument("--latency", type=float, default=50, help="latence moyenne injectée (ms)")
+    parser.add_argument("--missing-every", type=int, default=10, help="un produit sur N a un champ manquant")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--output", help="fichier JSON du rapport (sortie standard par défaut)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    urls = {supplier: f"http://127.0.0.1:{args.port + offset}" for offset, supplier in enumerate(SUPPLIERS)}
+    for supplier, (_, _, prefix) in SUPPLIERS.items():
+        os.environ[f"{prefix}_BASE_URL"] = urls[supplier]
+    # Le serveur local ne doit pas être bridé par les limites prévues pour les vrais sites
+    os.environ.setdefault("RATE_LIMIT", "0")
+    os.environ.setdefault("LEAN_LOADING", "1")
+
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(args.port, args.latency, args.missing_every), daemon=True
+    )
+    server.start()
+    try:
+        for offset in range(len(SUPPLIERS)):
+            wait_for_port(args.port + offset)
+        results = asyncio.run(run_all(args, urls))
+    finally:
+        server.terminate()
+        server.join()
+
+    report = json.dumps({
+        "config": {
+            "latency_ms": args.latency,
+            "missing_every": args.missing_every,
+            "engine": args.engine,
+            "mode": args.mode,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
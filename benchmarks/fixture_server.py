@@ -0,0 +1,332 @@
+"""
+Serveur local qui imite Eklor, Powr Connect et Voltaneo pour les benchmarks :
+pages de connexion, bannières de consentement, pages produit (avec des champs
+manquants à intervalle régulier), pages de catégorie paginées (mode listing),
+API Store WooCommerce de Voltaneo et latence injectée.
+
+    python -m benchmarks.fixture_server [port_de_base] [latence_ms]
+
+Eklor écoute sur le port de base, Powr Connect sur +1, Voltaneo sur +2.
+"""
+import asyncio
+import random
+import sys
+
+from aiohttp import web
+
+SESSION_COOKIE = "bench_session"
+CONSENT_COOKIE = "bench_consent"
+
+PAGE = """<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{consent}{body}</body></html>"""
+
+AXEPTIO_BANNER = """
+<div class="axeptio_widget_wrapper" id="consent" style="position:fixed;bottom:0;left:0;right:0;height:80px;background:#fff">
+  <button onclick="document.cookie='{cookie}=1; path=/'; document.getElementById('consent').remove()">OK pour moi</button>
+</div>"""
+
+COMPLIANZ_BANNER = """
+<div class="cmplz-cookiebanner" id="consent" style="position:fixed;bottom:0;left:0;right:0;height:80px;background:#fff">
+  <button class="cmplz-btn cmplz-accept" onclick="document.cookie='{cookie}=1; path=/'; document.getElementById('consent').remove()">Accepter</button>
+</div>"""
+
+LOGIN_PAGES = {
+    "eklor": """
+<form method="post" action="/login">
+  <input type="email" name="email"><input type="password" name="password">
+  <button type="submit">Connexion</button>
+</form>""",
+    "powr-connect": """
+<form method="post" action="/connexion">
+  <input name="username"><input type="password" name="password">
+  <input type="checkbox" name="stayConnected">
+  <button type="submit">Connexion</button>
+</form>""",
+    "voltaneo": """
+<form method="post" action="/login">
+  <input name="username"><input type="password" name="password">
+  <input type="checkbox" name="rememberme">
+  <button type="submit">Se connecter</button>
+</form>""",
+}
+
+LOGIN_PATHS = {"eklor": "/login", "powr-connect": "/connexion", "voltaneo": "/login"}
+HOME_PATHS = {"eklor": "/", "powr-connect": "/", "voltaneo": "/mon-compte/"}
+
+
+def product_eklor(index, rng, missing):
+    price = "" if missing else f'<span class="text-3xl font-semibold">{rng.randint(1, 999)},{rng.randint(0, 99):02d} € HT</span>'
+    bullets = "".join(f'<li class="bullet-list">Caractéristique {n} : {rng.randint(1, 500)}</li>' for n in range(6))
+    return f"""
+<h1 class="mb-4 text-2xl font-medium">Produit Eklor {index}</h1>
+{price}
+<button class="Stock-label Stock-label">{rng.choice(["12 produits en stock", "Sur commande"])}</button>
+<p class="mb-6 text-base font-normal">{"Description détaillée du produit. " * 8}</p>
+<ul>{bullets}</ul>"""
+
+
+def product_powr_connect(index, rng, missing):
+    bullets = "" if missing else "".join(f"<li>Caractéristique {n} : {rng.randint(1, 500)}</li>" for n in range(6))
+    return f"""
+<h1 class="text-2xl font-semibold tracking-tight">Produit Powr Connect {index}</h1>
+<p class="mt-4">{"Description détaillée du produit. " * 8}</p>
+<p class="text-2xl font-semibold leading-none">{rng.randint(1, 999)},{rng.randint(0, 99):02d} € HT</p>
+<button class="Stock-label Stock-label">{rng.choice(["En stock", "Rupture"])}</button>
+<ul class="bulleted-list">{bullets}</ul>"""
+
+
+def data_voltaneo(index, rng, missing):
+    """
+    Valeurs d'un produit Voltaneo, communes à la page produit et à l'API Store :
+    (libellé, prix en centimes, masqué) par conditionnement, stock, caractéristiques.
+    """
+    tiers = []
+    for n, label in enumerate(["À l'unité", "Carton de 10", "Palette", "Conteneur"]):
+        tiers.append((label, rng.randint(1, 999) * 100 + rng.randint(0, 99), n == 2 and index % 3 == 0))
+    specs = [(f"Caractéristique {n}", rng.randint(1, 500)) for n in range(6)]
+    return {
+        "tiers": tiers,
+        "stock_label": "" if missing else "En stock",
+        "stock_number": rng.randint(0, 200),
+        "specs": specs,
+    }
+
+
+def euros(cents):
+    return f"{cents // 100},{cents % 100:02d} €"
+
+
+def product_voltaneo(index, rng, missing):
+    data = data_voltaneo(index, rng, missing)
+    hidden_style = ' style="display:none"'
+    tiers = "".join(
+        f'<p class="conditionnement"{hidden_style if hidden else ""}><span class="label">{label}</span>'
+        f'<span class="number">{euros(cents)}</span></p>'
+        for label, cents, hidden in data["tiers"]
+    )
+    specs = "".join(f'<div class="fcat">{name} : {value}</div>' for name, value in data["specs"])
+    return f"""
+<h1 class="product_title entry-title">Produit Voltaneo {index}</h1>
+<div class="product_description">{"Description détaillée du produit. " * 8}</div>
+<section class="addToCartSection">{tiers}</section>
+<div class="stock"><span class="label">{data["stock_label"]}</span><span class="number">{data["stock_number"]}</span></div>
+<div class="col">{specs}</div>"""
+
+
+def prices_voltaneo(cents):
+    return {"price": str(cents), "currency_code": "EUR", "currency_symbol": "€", "currency_minor_unit": 2}
+
+
+def store_api_voltaneo(index, rng, missing):
+    """
+    Produit Voltaneo (variable, un conditionnement par variation) et ses
+    variations au format de l'API Store WooCommerce.
+    """
+    data = data_voltaneo(index, rng, missing)
+    product_id = (index + 1) * 10
+    variations = [
+        {
+            "id": product_id + n + 1,
+            "parent": product_id,
+            "type": "variation",
+            "name": f"Produit Voltaneo {index}",
+            "variation": f"Conditionnement: {label}",
+            "prices": prices_voltaneo(cents),
+            "is_purchasable": not hidden,
+        }
+        for n, (label, cents, hidden) in enumerate(data["tiers"])
+    ]
+    stock = f'{data["stock_number"]} en stock' if data["stock_label"] else ""
+    product = {
+        "id": product_id,
+        "name": f"Produit Voltaneo {index}",
+        "slug": str(index),
+        "permalink": f"/produit/{index}/",
+        "type": "variable",
+        "description": f"<p>{'Description détaillée du produit. ' * 8}</p>",
+        "prices": prices_voltaneo(min(cents for _, cents, hidden in data["tiers"] if not hidden)),
+        "is_in_stock": True,
+        "stock_availability": {"text": stock, "class": "in-stock"},
+        "attributes": [
+            {"name": "Conditionnement", "has_variations": True, "terms": [{"name": label} for label, _, _ in data["tiers"]]},
+            *({"name": name, "has_variations": False, "terms": [{"name": str(value)}]} for name, value in data["specs"]),
+        ],
+        "variations": [
+            {"id": variation["id"], "attributes": [{"name": "Conditionnement", "value": variation["variation"].split(": ")[1]}]}
+            for variation in variations
+        ],
+    }
+    return product, variations
+
+
+def tile_eklor(index, rng):
+    return f"""
+<div class="product-card">
+  <a class="product-card-link" href="/produit/{index}"><h3 class="product-card-title">Produit Eklor {index}</h3></a>
+  <span class="product-card-price">{rng.randint(1, 999)},{rng.randint(0, 99):02d} € HT</span>
+  <span class="Stock-label">{rng.choice(["12 produits en stock", "Sur commande"])}</span>
+</div>"""
+
+
+def tile_powr_connect(index, rng):
+    return f"""
+<article class="product-item">
+  <a class="product-item-link" href="/produit/{index}"><h2 class="product-item-name">Produit Powr Connect {index}</h2></a>
+  <p class="product-item-price">{rng.randint(1, 999)},{rng.randint(0, 99):02d} € HT</p>
+  <span class="Stock-label">{rng.choice(["En stock", "Rupture"])}</span>
+</article>"""
+
+
+def tile_voltaneo(index, rng):
+    return f"""
+<li class="product">
+  <a class="woocommerce-LoopProduct-link" href="/produit/{index}"><h2 class="woocommerce-loop-product__title">Produit Voltaneo {index}</h2></a>
+  <span class="price"><span class="woocommerce-Price-amount">{rng.randint(1, 999)},{rng.randint(0, 99):02d} €</span></span>
+  <p class="stock">En stock {rng.randint(0, 200)}</p>
+</li>"""
+
+
+def listing_eklor(tiles, next_url):
+    link = f'<a rel="next" href="{next_url}">Suivant</a>' if next_url else ""
+    return f'<div class="grid">{tiles}</div><nav>{link}</nav>'
+
+
+def listing_voltaneo(tiles, next_url):
+    link = f'<a class="next page-numbers" href="{next_url}">→</a>' if next_url else ""
+    return f'<ul class="products">{tiles}</ul><nav class="woocommerce-pagination">{link}</nav>'
+
+
+PRODUCTS = {"eklor": product_eklor, "powr-connect": product_powr_connect, "voltaneo": product_voltaneo}
+BANNERS = {"eklor": AXEPTIO_BANNER, "powr-connect": AXEPTIO_BANNER, "voltaneo": COMPLIANZ_BANNER}
+TILES = {"eklor": tile_eklor, "powr-connect": tile_powr_connect, "voltaneo": tile_voltaneo}
+LISTINGS = {"eklor": listing_eklor, "powr-connect": listing_eklor, "voltaneo": listing_voltaneo}
+
+# API Store WooCommerce (Voltaneo) : /wp-json/wc/store/v1/products, par slug
+# (numéro du produit) ou identifiant, avec le nonce REST de la page du compte
+STORE_APIS = {"voltaneo": store_api_voltaneo}
+STORE_API_NONCE = "b3nchn0nce"
+NONCE_SCRIPT = f'<script>var wpApiSettings = {{"root":"/wp-json/","nonce":"{STORE_API_NONCE}","versionString":"wp/v2/"}};</script>'
+
+# Pages de catégorie : /categorie/{taille}?page=N liste les produits 0 à taille - 1
+LISTING_PAGE_SIZE = 40
+
+
+def supplier_app(supplier, latency_ms=0, missing_every=10, seed=42):
+    """
+    Application aiohttp d'un fournisseur. Les pages produit (/produit/{n}), de
+    catégorie (/categorie/{taille}) et l'API Store exigent le cookie de session
+    posé par le formulaire de connexion.
+    """
+    def page(request, title, body):
+        consent = "" if CONSENT_COOKIE in request.cookies else BANNERS[supplier].format(cookie=CONSENT_COOKIE)
+        return web.Response(text=PAGE.format(title=title, consent=consent, body=body), content_type="text/html")
+
+    async def login_page(request):
+        return page(request, "Connexion", LOGIN_PAGES[supplier])
+
+    async def login(request):
+        response = web.HTTPFound(HOME_PATHS[supplier])
+        response.set_cookie(SESSION_COOKIE, "bench", path="/")
+        raise response
+
+    async def home(request):
+        script = NONCE_SCRIPT if supplier in STORE_APIS and SESSION_COOKIE in request.cookies else ""
+        return page(request, "Accueil", f"<h1>Accueil</h1>{script}")
+
+    async def product(request):
+        if SESSION_COOKIE not in request.cookies:
+            raise web.HTTPFound(LOGIN_PATHS[supplier])
+        if latency_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        index = int(request.match_info["index"])
+        rng = random.Random(seed * 100003 + index)
+        missing = missing_every and index % missing_every == missing_every - 1
+        return page(request, f"Produit {index}", PRODUCTS[supplier](index, rng, missing))
+
+    async def category(request):
+        if SESSION_COOKIE not in request.cookies:
+            raise web.HTTPFound(LOGIN_PATHS[supplier])
+        if latency_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        size = int(request.match_info["size"])
+        number = int(request.query.get("page", "1"))
+        start = (number - 1) * LISTING_PAGE_SIZE
+        tiles = "".join(
+            TILES[supplier](index, random.Random(seed * 100003 + index))
+            for index in range(start, min(size, start + LISTING_PAGE_SIZE))
+        )
+        next_url = f"/categorie/{size}?page={number + 1}" if start + LISTING_PAGE_SIZE < size else None
+        return page(request, f"Catégorie, page {number}", LISTINGS[supplier](tiles, next_url))
+
+    def store_product(index):
+        rng = random.Random(seed * 100003 + index)
+        return STORE_APIS[supplier](index, rng, missing_every and index % missing_every == missing_every - 1)
+
+    async def store_api(request):
+        # Comme WordPress : sans nonce REST valide, les cookies de session sont ignorés
+        if SESSION_COOKIE not in request.cookies or request.headers.get("X-WP-Nonce") != STORE_API_NONCE:
+            return web.json_response({"code": "rest_forbidden", "data": {"status": 401}}, status=401)
+        if latency_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000)
+        query = request.query
+        per_page = min(100, int(query.get("per_page", "10")))
+        if query.get("type") == "variation":
+            wanted = {int(value) for value in query.get("include", "").split(",") if value}
+            found = [
+                variation
+                for product_id in sorted({variation_id // 10 * 10 for variation_id in wanted})
+                for variation in store_product(product_id // 10 - 1)[1]
+                if variation["id"] in wanted
+            ]
+        else:
+            indexes = [int(value) for value in query.get("slug", "").split(",") if value.isdigit()]
+            indexes += [int(value) // 10 - 1 for value in query.get("include", "").split(",") if value]
+            found = [store_product(index)[0] for index in indexes if index >= 0]
+        return web.json_response(found[:per_page])
+
+    app = web.Application()
+    app.router.add_get(LOGIN_PATHS[supplier], login_page)
+    app.router.add_post(LOGIN_PATHS[supplier], login)
+    app.router.add_get(HOME_PATHS[supplier], home)
+    if HOME_PATHS[supplier] != "/":
+        app.router.add_get("/", home)
+    app.router.add_get("/produit/{index}", product)
+    app.router.add_get("/categorie/{size}", category)
+    if supplier in STORE_APIS:
+        app.router.add_get("/wp-json/wc/store/v1/products", store_api)
+    return app
+
+
+async def start_servers(base_port, latency_ms=0, missing_every=10, host="127.0.0.1"):
+    """
+    Démarre les trois fournisseurs ; renvoie (runners, {fournisseur: url de base}).
+    """
+    runners = []
+    urls = {}
+    for offset, supplier in enumerate(PRODUCTS):
+        runner = web.AppRunner(supplier_app(supplier, latency_ms, missing_every), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, base_port + offset).start()
+        runners.append(runner)
+        urls[supplier] = f"http://{host}:{base_port + offset}"
+    return runners, urls
+
+
+def serve(base_port=8900, latency_ms=0, missing_every=10):
+    async def run():
+        runners, urls = await start_servers(base_port, latency_ms, missing_every)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            for runner in runners:
+                await runner.cleanup()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    serve(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8900,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0,
+    )
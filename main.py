@@ -1,33 +1,277 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from typing import Dict, Any
+import asyncio
 import json
 
-from scrapers.scraper_powr_connect import scrape_powr_connect
-from scrapers.scraper_voltaneo import scrape_voltaneo
-from scrapers.scraper_eklor import scrape_eklor
+from scrapers.adaptive_waits import wait_stats
+from scrapers.batch import InvalidBatch, scrape_batch
+from scrapers.browser_pool import BrowserPool, PoolExhausted
+from scrapers.export import UnsupportedFormat, encode_response, negotiate_format
+from scrapers.host_scheduler import host_scheduler
+from scrapers.jobs import JobManager, UnknownJob, create_job_store
+from scrapers.listing import listing_pages
+from scrapers.memory import memory_watchdog
+from scrapers.metrics import current_timings, render_metrics, start_request_timings, timed
+from scrapers.scheduler import assign_tenant, fair_scheduler
+from scrapers.snapshots import track_changes, track_record
+from scrapers.streaming import stream_ndjson
+from scrapers.work_queue import create_work_queue
+from scrapers.workers import SCRAPER_WORKERS, WorkerSupervisor, remote_scraper
+from scrapers.scraper_powr_connect import clean_output_powr_connect, clean_record_powr_connect, scrape_powr_connect
+from scrapers.scraper_voltaneo import clean_output_voltaneo, clean_record_voltaneo, scrape_voltaneo
+from scrapers.scraper_eklor import clean_output_eklor, clean_record_eklor, scrape_eklor
 
-app = FastAPI()
+SUPPLIERS = {
+    "powr-connect": (scrape_powr_connect, clean_output_powr_connect),
+    "voltaneo": (scrape_voltaneo, clean_output_voltaneo),
+    "eklor": (scrape_eklor, clean_output_eklor),
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool = None
+    workers = None
+    suppliers = SUPPLIERS
+    memory_watchdog.start()
+    if SCRAPER_WORKERS > 0:
+        # Mode workers : l'API dépose les produits dans la file, les processus workers scrapent
+        queue = create_work_queue()
+        workers = WorkerSupervisor(queue)
+        await workers.start()
+        suppliers = {
+            name: (remote_scraper(queue, name, clean_output), clean_output)
+            for name, (_, clean_output) in SUPPLIERS.items()
+        }
+    else:
+        pool = BrowserPool()
+        await pool.start()
+    # Chaque run passe par l'ordonnanceur des tenants (file équitable par produit)
+    suppliers = {
+        name: (fair_scheduler.wrap(name, scrape), clean_output)
+        for name, (scrape, clean_output) in suppliers.items()
+    }
+    app.state.browser_pool = pool
+    app.state.workers = workers
+    app.state.suppliers = suppliers
+    jobs = JobManager(create_job_store(), suppliers, pool=pool)
+    await jobs.start()
+    app.state.jobs = jobs
+    try:
+        yield
+    finally:
+        await jobs.stop()
+        if workers:
+            await workers.stop()
+        if pool:
+            await pool.stop()
+        await memory_watchdog.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+def scraper(supplier):
+    return app.state.suppliers[supplier][0]
+
+def tenant_payload(payload, request):
+    """
+    Rattache le payload au tenant de l'en-tête X-API-Key (ou des identifiants).
+    """
+    return assign_tenant(payload, request.headers.get("x-api-key"))
+
+def check_listings(payload):
+    """
+    Les catégories explicites du mode listing ajoutent des lignes hors payload :
+    refusées en mode workers, où seules les lignes de "data" sont réparties.
+    """
+    if app.state.workers and listing_pages(payload):
+        raise HTTPException(status_code=422, detail="listings are not supported in worker mode")
+
+def response_format(request):
+    """
+    Valide le format demandé avant de lancer le scraping (UnsupportedFormat sinon).
+    """
+    return negotiate_format(request.headers.get("accept"), request.query_params.get("format"))
+
+def records_response(records, supplier="", request=None):
+    """
+    Renvoie les résultats au format négocié (JSON, CSV, Parquet, Arrow ; en-tête
+    Accept ou paramètre ?format=), compressés en gzip/brotli si le client l'accepte.
+    Expose les statistiques de chargement en en-têtes, ainsi que le détail des
+    temps (Server-Timing) si le payload contient "debug".
+    """
+    stats = records.attrs.get("resource_stats")
+    with timed("serialization", supplier):
+        content, media_type, headers = encode_response(
+            records,
+            accept=request.headers.get("accept") if request else None,
+            accept_encoding=request.headers.get("accept-encoding") if request else None,
+            format=request.query_params.get("format") if request else None,
+        )
+    if stats:
+        headers["X-Blocked-Requests"] = str(stats["blocked_requests"])
+        headers["X-Estimated-Bytes-Saved"] = str(stats["estimated_bytes_saved"])
+    timings = current_timings()
+    if timings:
+        headers["Server-Timing"] = timings.server_timing()
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/health")
+async def health_endpoint():
+    if app.state.workers:
+        return app.state.workers.stats()
+    return await app.state.browser_pool.health_check()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # En mode workers, les métriques publiées par les processus workers sont fusionnées
+    snapshots = await asyncio.to_thread(app.state.workers.metrics) if app.state.workers else None
+    return PlainTextResponse(render_metrics(snapshots), media_type="text/plain; version=0.0.4")
+
+@app.get("/limits")
+async def limits_endpoint():
+    return host_scheduler.stats()
+
+@app.get("/waits")
+async def waits_endpoint():
+    return wait_stats()
+
+@app.get("/tenants")
+async def tenants_endpoint():
+    stats = fair_scheduler.stats()
+    if app.state.workers:
+        stats["queue"] = app.state.workers.queue.tenant_stats()
+    return stats
+
+@app.post("/scrape")
+async def scrape_endpoint(payload: Dict[str, Any], request: Request):
+    start_request_timings(tenant_payload(payload, request))
+    try:
+        response_format(request)
+        records = await scrape_batch(
+            payload, app.state.suppliers, pool=app.state.browser_pool,
+            track=lambda supplier, records, group: track_changes(supplier.replace("-", "_"), records, group)
+        )
+        return records_response(records, "batch", request)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except InvalidBatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=f"Browser pool busy: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
 
 @app.post("/scrape-powr-connect")
-async def scrape_powr_connect_endpoint(payload: Dict[str, Any]):
+async def scrape_powr_connect_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    start_request_timings(tenant_payload(payload, request))
     try:
-        df = await scrape_powr_connect(payload)
-        return json.loads(df.to_json(orient="records"))
+        response_format(request)
+        records = await scraper("powr-connect")(payload, pool=app.state.browser_pool)
+        records = await asyncio.to_thread(track_changes, "powr_connect", records, payload)
+        return records_response(records, "powr_connect", request)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=f"Browser pool busy: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
 
+@app.post("/scrape-powr-connect/stream")
+async def scrape_powr_connect_stream_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    tenant_payload(payload, request)
+    return StreamingResponse(
+        stream_ndjson(
+            scraper("powr-connect"), clean_record_powr_connect, payload, pool=app.state.browser_pool,
+            track=lambda record: track_record("powr_connect", record, payload)
+        ),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/scrape-voltaneo")
-async def scrape_voltaneo_endpoint(payload: Dict[str, Any]):
+async def scrape_voltaneo_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    start_request_timings(tenant_payload(payload, request))
     try:
-        df = await scrape_voltaneo(payload)
-        return json.loads(df.to_json(orient="records"))
+        response_format(request)
+        records = await scraper("voltaneo")(payload, pool=app.state.browser_pool)
+        records = await asyncio.to_thread(track_changes, "voltaneo", records, payload)
+        return records_response(records, "voltaneo", request)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=f"Browser pool busy: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
 
+@app.post("/scrape-voltaneo/stream")
+async def scrape_voltaneo_stream_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    tenant_payload(payload, request)
+    return StreamingResponse(
+        stream_ndjson(
+            scraper("voltaneo"), clean_record_voltaneo, payload, pool=app.state.browser_pool,
+            track=lambda record: track_record("voltaneo", record, payload)
+        ),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/scrape-eklor")
-async def scrape_eklor_endpoint(payload: Dict[str, Any]):
+async def scrape_eklor_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    start_request_timings(tenant_payload(payload, request))
     try:
-        df = await scrape_eklor(payload)
-        return json.loads(df.to_json(orient="records"))
+        response_format(request)
+        records = await scraper("eklor")(payload, pool=app.state.browser_pool)
+        records = await asyncio.to_thread(track_changes, "eklor", records, payload)
+        return records_response(records, "eklor", request)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=f"Browser pool busy: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Scraping error: {str(e)}")
+
+@app.post("/scrape-eklor/stream")
+async def scrape_eklor_stream_endpoint(payload: Dict[str, Any], request: Request):
+    check_listings(payload)
+    tenant_payload(payload, request)
+    return StreamingResponse(
+        stream_ndjson(
+            scraper("eklor"), clean_record_eklor, payload, pool=app.state.browser_pool,
+            track=lambda record: track_record("eklor", record, payload)
+        ),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/jobs/{supplier}", status_code=202)
+async def create_job_endpoint(supplier: str, payload: Dict[str, Any], request: Request):
+    if supplier not in SUPPLIERS:
+        raise HTTPException(status_code=404, detail=f"Unknown supplier: {supplier}")
+    check_listings(payload)
+    # Les jobs sont asynchrones : priorité "bulk" sauf demande explicite
+    payload.setdefault("priority", "bulk")
+    tenant_payload(payload, request)
+    job = app.state.jobs.submit(supplier, payload)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str, results: bool = True):
+    try:
+        job = app.state.jobs.get(job_id)
+    except UnknownJob:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    body = json.dumps(job.to_dict()).encode("utf-8")
+    if results:
+        body = body[:-1] + b', "results": ' + app.state.jobs.results_json(job) + b"}"
+    return Response(content=body, media_type="application/json")
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job_endpoint(job_id: str):
+    try:
+        job = await app.state.jobs.cancel(job_id)
+    except UnknownJob:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
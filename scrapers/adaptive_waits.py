@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from scrapers.extraction import WAIT_TIMEOUT
+from scrapers.metrics import Counter, observe_selector
+
+ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "20"))
+ADAPTIVE_WINDOW = int(os.getenv("ADAPTIVE_WINDOW", "200"))
+ADAPTIVE_MARGIN = float(os.getenv("ADAPTIVE_MARGIN", "0.5"))
+ADAPTIVE_FLOOR_MS = float(os.getenv("ADAPTIVE_FLOOR_MS", "500"))
+ADAPTIVE_RESET_AFTER = int(os.getenv("ADAPTIVE_RESET_AFTER", "5"))
+PRODUCT_WAIT_BUDGET_MS = float(os.getenv("PRODUCT_WAIT_BUDGET_MS", "6000"))
+
+SELECTOR_WAITS = Counter(
+    "scraper_selector_waits_total",
+    "Attentes de sélecteurs : trouvés, expirés au délai par défaut ou au délai appris (cut_short)",
+    labels=("supplier", "outcome"),
+)
+WAIT_SECONDS_SAVED = Counter(
+    "scraper_wait_seconds_saved_total",
+    "Temps d'attente évité par les délais appris, sur les attentes écourtées",
+    labels=("supplier",),
+)
+TIMEOUT_RESETS = Counter(
+    "scraper_adaptive_timeout_resets_total",
+    "Délais appris abandonnés après des attentes écourtées consécutives (site ralenti)",
+    labels=("supplier",),
+)
+CONSENT_SKIPPED = Counter(
+    "scraper_consent_skipped_total",
+    "Bannières de consentement ignorées (cookie de consentement déjà posé)",
+    labels=("supplier",),
+)
+
+_registry = {}
+
+
+class AdaptiveWaits:
+    """
+    Délais d'attente des sélecteurs appris par fournisseur : une fois assez
+    d'observations, le délai devient p99 * (1 + marge), sans dépasser le délai
+    par défaut ni le budget d'attente d'un produit.
+
+    Une attente écourtée ne dit pas si l'élément manque ou si le site a
+    ralenti : le temps évité n'est compté qu'une fois le sélecteur retrouvé
+    dans le délai appris, et après `reset_after` attentes écourtées
+    consécutives, les observations du sélecteur sont oubliées (retour au
+    délai par défaut, puis nouvel apprentissage).
+    """
+
+    def __init__(self, supplier, min_samples=ADAPTIVE_MIN_SAMPLES, margin=ADAPTIVE_MARGIN,
+                 floor_ms=ADAPTIVE_FLOOR_MS, product_budget_ms=PRODUCT_WAIT_BUDGET_MS,
+                 reset_after=ADAPTIVE_RESET_AFTER):
+        self.supplier = supplier
+        self.min_samples = min_samples
+        self.margin = margin
+        self.floor_ms = floor_ms
+        self.product_budget_ms = product_budget_ms
+        self.reset_after = max(1, reset_after)
+        self._samples = {}
+        self._defaults = {}
+        self._cut_short = {}
+        self.counters = {
+            "waits": 0,
+            "waits_timed_out": 0,
+            "waits_cut_short": 0,
+            "wait_ms_saved": 0.0,
+            "timeouts_reset": 0,
+            "consent_skipped": 0,
+        }
+        _registry[supplier] = self
+
+    def observe(self, selector, elapsed_ms):
+        self._samples.setdefault(selector, deque(maxlen=ADAPTIVE_WINDOW)).append(elapsed_ms)
+
+    def timeout(self, selector, default=WAIT_TIMEOUT):
+        """
+        Délai (ms) à utiliser pour ce sélecteur.
+        """
+        samples = self._samples.get(selector)
+        if not samples or len(samples) < self.min_samples:
+            return default
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return min(default, max(self.floor_ms, p99 * (1 + self.margin)))
+
+    def _record_cut_short(self, selector, saved_ms):
+        """
+        Attente écourtée : le temps évité reste en suspens jusqu'à ce que le
+        sélecteur soit de nouveau trouvé ; trop d'échecs de suite oublient le délai appris.
+        """
+        count, pending_ms = self._cut_short.get(selector, (0, 0.0))
+        count, pending_ms = count + 1, pending_ms + saved_ms
+        if count < self.reset_after:
+            self._cut_short[selector] = (count, pending_ms)
+            return
+        self._cut_short.pop(selector, None)
+        self._samples.pop(selector, None)
+        self.counters["timeouts_reset"] += 1
+        TIMEOUT_RESETS.inc(supplier=self.supplier)
+
+    def _record_found(self, selector, elapsed_ms):
+        _, pending_ms = self._cut_short.pop(selector, (0, 0.0))
+        if pending_ms:
+            self.counters["wait_ms_saved"] += pending_ms
+            WAIT_SECONDS_SAVED.inc(pending_ms / 1000, supplier=self.supplier)
+        self.observe(selector, elapsed_ms)
+
+    def skip_consent(self):
+        self.counters["consent_skipped"] += 1
+        CONSENT_SKIPPED.inc(supplier=self.supplier)
+
+    async def wait_for_fields(self, page, fields):
+        """
+        Attend en parallèle les sélecteurs des champs marqués "wait" ; le temps
+        total est borné par le budget du produit.
+        """
+        async def wait_one(field):
+            default = field.get("timeout", WAIT_TIMEOUT)
+            self._defaults[field["selector"]] = default
+            timeout = min(self.timeout(field["selector"], default), self.product_budget_ms)
+            self.counters["waits"] += 1
+            start = time.perf_counter()
+            try:
+                await page.wait_for_selector(field["selector"], timeout=timeout)
+            except Exception:
+                self.counters["waits_timed_out"] += 1
+                if timeout < default:
+                    self.counters["waits_cut_short"] += 1
+                    SELECTOR_WAITS.inc(supplier=self.supplier, outcome="cut_short")
+                    self._record_cut_short(field["selector"], default - timeout)
+                else:
+                    SELECTOR_WAITS.inc(supplier=self.supplier, outcome="timed_out")
+                return
+            finally:
+                observe_selector(self.supplier, field.get("field", field["selector"]), time.perf_counter() - start)
+            SELECTOR_WAITS.inc(supplier=self.supplier, outcome="found")
+            self._record_found(field["selector"], (time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(wait_one(field) for field in fields))
+
+    def stats(self):
+        """
+        Compteurs et délai en cours de chaque sélecteur, calculé sur le délai
+        par défaut de son champ et borné par le budget d'un produit.
+        """
+        return {
+            **self.counters,
+            "timeouts_ms": {
+                selector: round(min(
+                    self.timeout(selector, self._defaults.get(selector, WAIT_TIMEOUT)), self.product_budget_ms
+                ), 1)
+                for selector in self._samples
+            },
+        }
+
+
+def wait_stats():
+    return {supplier: waits.stats() for supplier, waits in _registry.items()}
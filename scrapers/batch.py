@@ -0,0 +1,127 @@
+import asyncio
+import os
+from datetime import datetime
+
+from scrapers.browser_pool import PoolExhausted
+from scrapers.listing import listing_pages
+from scrapers.records import Record, RecordSet
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def supplier_key(value):
+    """
+    Normalise un nom de fournisseur ("Powr Connect", "powr_connect"...) en clé
+    d'endpoint ("powr-connect").
+    """
+    return str(value or "").strip().lower().replace("_", "-").replace(" ", "-")
+
+
+def split_concurrency(budget, sizes):
+    """
+    Répartit le budget global de pages entre fournisseurs, au prorata du
+    nombre de produits (au moins une page chacun).
+    """
+    total = sum(sizes.values())
+    return {key: max(1, budget * size // total) for key, size in sizes.items()}
+
+
+def split_batch(payload, suppliers):
+    """
+    Regroupe les produits par fournisseur ; renvoie {fournisseur: (rangs, payload)}.
+    Les options du payload (lean, engine, max_cache_age...) sont transmises à chaque groupe.
+    Les catégories explicites du mode listing ("listings") ne sont pas acceptées :
+    elles ajoutent des produits hors payload, sans fournisseur pour les répartir.
+    """
+    if listing_pages(payload):
+        raise InvalidBatch("listings are only supported by the per-supplier endpoints")
+    credentials = {supplier_key(k): v for k, v in (payload.get("credentials") or {}).items()}
+    options = {k: v for k, v in payload.items() if k not in ("data", "credentials", "concurrency")}
+    groups = {}
+
+    for index, item in enumerate(payload["data"]):
+        key = supplier_key(item.get("supplier"))
+        if key not in suppliers:
+            raise InvalidBatch(f"unknown supplier for item {index}: {item.get('supplier')!r}")
+        groups.setdefault(key, []).append(index)
+
+    missing = [key for key in groups if key not in credentials]
+    if missing:
+        raise InvalidBatch(f"missing credentials for: {', '.join(missing)}")
+
+    budget = int(payload.get("concurrency") or BATCH_CONCURRENCY)
+    concurrency = split_concurrency(budget, {key: len(indices) for key, indices in groups.items()})
+    return {
+        key: (indices, {
+            **options,
+            "credentials": credentials[key],
+            "concurrency": concurrency[key],
+            "data": [payload["data"][i] for i in indices],
+        })
+        for key, indices in groups.items()
+    }
+
+
+def failed_rows(items, error):
+    created_at = datetime.now()
+    return RecordSet(Record({**item, "is_ok": 0, "error": error, "created_at": created_at}) for item in items)
+
+
+def merge_resource_stats(outputs):
+    stats = [output.attrs.get("resource_stats") for output in outputs if output.attrs.get("resource_stats")]
+    if not stats:
+        return None
+    return {
+        "blocked_requests": sum(s["blocked_requests"] for s in stats),
+        "estimated_bytes_saved": sum(s["estimated_bytes_saved"] for s in stats),
+        "allowed_requests": sum(s["allowed_requests"] for s in stats),
+        "allowed_bytes": sum(s["allowed_bytes"] for s in stats),
+    }
+
+
+async def scrape_batch(payload, suppliers, pool=None, track=None):
+    """
+    Scrape un lot multi-fournisseurs : les scrapers tournent en parallèle sur
+    le pool de navigateurs partagé, avec un budget de pages commun, et les
+    résultats sont renvoyés dans l'ordre du payload.
+
+    `suppliers` associe une clé de fournisseur à (scrape, clean_output) ;
+    `track(fournisseur, records, payload du groupe)` peut filtrer les Records
+    d'un groupe ; fonction bloquante, exécutée dans un thread. Un groupe
+    en échec (connexion, pool saturé) produit des lignes en erreur sans
+    interrompre les autres ; PoolExhausted est levée si tous les groupes ont
+    été refusés par le pool ou le watchdog mémoire.
+    """
+    groups = split_batch(payload, suppliers)
+    outputs = await asyncio.gather(
+        *(suppliers[key][0](sub_payload, pool=pool) for key, (_, sub_payload) in groups.items()),
+        return_exceptions=True
+    )
+    if outputs and all(isinstance(output, PoolExhausted) for output in outputs):
+        raise outputs[0]
+
+    merged = [None] * len(payload["data"])
+    results = []
+    for (key, (indices, sub_payload)), output in zip(groups.items(), outputs):
+        failed = isinstance(output, (BaseException, list))
+        if isinstance(output, BaseException):
+            output = failed_rows(sub_payload["data"], f"{key}: {str(output)}")
+        elif isinstance(output, list):
+            error = output[0].get("error") if output else "scraping failed"
+            output = failed_rows(sub_payload["data"], f"{key}: {error}")
+        # track peut filtrer les Records : leur rang est repris par identité
+        positions = {id(record): indices[i] for i, record in enumerate(output)}
+        if track and not failed:
+            output = await asyncio.to_thread(track, key, output, sub_payload)
+        for record in output:
+            merged[positions[id(record)]] = record
+        results.append(output)
+
+    return RecordSet(
+        (record for record in merged if record is not None),
+        attrs={"resource_stats": merge_resource_stats(results)}
+    )
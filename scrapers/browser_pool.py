@@ -0,0 +1,292 @@
+import asyncio
+import os
+import weakref
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+from scrapers.memory import memory_watchdog
+from scrapers.metrics import Gauge, Histogram, timed
+from scrapers.resource_filter import copy_context_state
+from scrapers.scheduler import FairScheduler, Ticket, current_ticket
+
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+CONTEXTS_PER_BROWSER = int(os.getenv("BROWSER_CONTEXTS_PER_BROWSER", "4"))
+ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", "60"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("BROWSER_HEALTH_CHECK_INTERVAL", "15"))
+TENANT_MAX_CONTEXTS = int(os.getenv("BROWSER_TENANT_MAX_CONTEXTS", "0"))
+INTERACTIVE_CONTEXTS = int(os.getenv("BROWSER_INTERACTIVE_CONTEXTS", "1"))
+
+LAUNCH_ARGS = ['--disable-blink-features=AutomationControlled']
+
+CONTEXT_QUEUE_DEPTH = Gauge(
+    "scraper_pool_queue_depth", "Runs en attente d'un contexte du pool, par tenant et priorité",
+    labels=("tenant", "priority"),
+)
+ACTIVE_CONTEXTS = Gauge(
+    "scraper_pool_active_contexts", "Contextes du pool loués, par tenant",
+    labels=("tenant",),
+)
+CONTEXT_WAIT_SECONDS = Histogram(
+    "scraper_pool_wait_seconds", "Attente d'un contexte du pool",
+    labels=("tenant", "priority"),
+)
+
+
+class PoolExhausted(Exception):
+    """
+    Levée quand aucun contexte ne se libère avant l'expiration du délai d'attente.
+    """
+
+
+class MemoryPressure(PoolExhausted):
+    """
+    Levée quand le watchdog mémoire refuse de nouveaux scrapings.
+    """
+
+
+class _Lease:
+    """
+    Location d'un contexte ; le contexte peut être remplacé en cours de run
+    (recyclage), c'est alors le remplaçant qui est fermé à la fin.
+    """
+
+    def __init__(self, browser, context_kwargs):
+        self.browser = browser
+        self.context_kwargs = context_kwargs
+        self.context = None
+        self.replacements = 0
+
+    async def open(self):
+        self.context = await self.browser().new_context(**self.context_kwargs)
+        _leases[self.context] = self
+        return self.context
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+
+
+_leases = weakref.WeakKeyDictionary()
+
+
+async def replace_context(context):
+    """
+    Ouvre un nouveau contexte sur le même navigateur avec l'état connecté
+    (cookies, localStorage) et la politique de chargement de `context`,
+    puis ferme ce dernier. Libère la mémoire accumulée par le contexte
+    sans nouvelle connexion.
+    """
+    lease = _leases[context]
+    state = await context.storage_state()
+    lease.context_kwargs = {**lease.context_kwargs, "storage_state": state}
+    replacement = await lease.open()
+    await copy_context_state(context, replacement)
+    lease.replacements += 1
+    try:
+        await context.close()
+    except Exception:
+        pass
+    return replacement
+
+
+class _BrowserSlot:
+    def __init__(self, index):
+        self.index = index
+        self.browser = None
+        self.active = 0
+        self.launches = 0
+        self.used = False
+        self.lock = asyncio.Lock()
+
+
+class BrowserPool:
+    """
+    Pool de navigateurs Chromium partagé, démarré avec l'application.
+
+    Chaque requête loue un contexte isolé ; le nombre de contextes simultanés
+    est borné par size * contexts_per_browser. Les contextes sont attribués
+    par un FairScheduler : priorité "interactive" d'abord, au plus
+    tenant_max_contexts par tenant, et interactive_contexts contextes que
+    les runs "bulk" ne peuvent pas louer.
+    """
+
+    def __init__(self, size=POOL_SIZE, contexts_per_browser=CONTEXTS_PER_BROWSER,
+                 headless=True, acquire_timeout=ACQUIRE_TIMEOUT,
+                 health_check_interval=HEALTH_CHECK_INTERVAL,
+                 tenant_max_contexts=TENANT_MAX_CONTEXTS, interactive_contexts=INTERACTIVE_CONTEXTS):
+        self.size = max(1, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.headless = headless
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        self._leases = FairScheduler(
+            self.size * self.contexts_per_browser, tenant_max_contexts, reserved=interactive_contexts,
+            metrics=(CONTEXT_QUEUE_DEPTH, ACTIVE_CONTEXTS, CONTEXT_WAIT_SECONDS)
+        )
+        self._waiting = 0
+        self._playwright = None
+        self._health_task = None
+
+    async def start(self):
+        """
+        Démarre Playwright, lance les navigateurs et la boucle de surveillance.
+        """
+        self._playwright = await async_playwright().start()
+        for slot in self._slots:
+            await self._relaunch(slot)
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        """
+        Arrête la surveillance, ferme les navigateurs et Playwright.
+        """
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for slot in self._slots:
+            if slot.browser:
+                try:
+                    await slot.browser.close()
+                except Exception:
+                    pass
+                slot.browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _relaunch(self, slot):
+        if slot.browser:
+            try:
+                await slot.browser.close()
+            except Exception:
+                pass
+        with timed("launch"):
+            slot.browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=LAUNCH_ARGS
+            )
+        slot.launches += 1
+        slot.used = False
+
+    async def _ensure_healthy(self, slot):
+        async with slot.lock:
+            if slot.browser is None or not slot.browser.is_connected():
+                await self._relaunch(slot)
+
+    async def _restart_idle(self):
+        """
+        Relance les navigateurs sans contexte actif, utilisés depuis leur
+        lancement, pour rendre leur mémoire.
+        """
+        for slot in self._slots:
+            async with slot.lock:
+                if slot.active == 0 and slot.used and slot.browser is not None:
+                    await self._relaunch(slot)
+                    memory_watchdog.record_action("browser_restart")
+
+    async def health_check(self):
+        """
+        Vérifie chaque navigateur et relance ceux qui ont planté ; au-delà du
+        seuil "restart" du watchdog mémoire, relance aussi les navigateurs inactifs.
+        """
+        for slot in self._slots:
+            try:
+                await self._ensure_healthy(slot)
+            except Exception:
+                pass
+        if memory_watchdog.at_least("restart"):
+            try:
+                await self._restart_idle()
+            except Exception:
+                pass
+        return {**self.stats(), "memory": memory_watchdog.stats()}
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.health_check()
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        """
+        Loue un contexte isolé sur le navigateur le moins chargé.
+        Attend une place libre au plus acquire_timeout secondes, dans l'ordre
+        de l'ordonnanceur (tenant et priorité du run courant ; sans ticket,
+        priorité "interactive").
+        Refuse la location (MemoryPressure) si la mémoire approche de la limite.
+        """
+        if not memory_watchdog.admit():
+            raise MemoryPressure(f"memory usage above {memory_watchdog.ratios[1]:.0%} of the limit")
+        ticket = current_ticket() or Ticket("", "interactive")
+        self._waiting += 1
+        try:
+            with timed("acquire"):
+                await asyncio.wait_for(self._leases.acquire(ticket), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolExhausted(
+                f"no browser context available after {self.acquire_timeout}s"
+            )
+        finally:
+            self._waiting -= 1
+
+        try:
+            slot = min(self._slots, key=lambda s: s.active)
+            slot.active += 1
+            try:
+                await self._ensure_healthy(slot)
+                slot.used = True
+                lease = _Lease(lambda: slot.browser, context_kwargs)
+                try:
+                    yield await lease.open()
+                finally:
+                    await lease.close()
+            finally:
+                slot.active -= 1
+        finally:
+            self._leases.release(ticket)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "contexts_per_browser": self.contexts_per_browser,
+            "waiting": self._waiting,
+            "tenants": self._leases.stats()["tenants"],
+            "browsers": [
+                {
+                    "index": slot.index,
+                    "connected": bool(slot.browser and slot.browser.is_connected()),
+                    "active_contexts": slot.active,
+                    "launches": slot.launches,
+                }
+                for slot in self._slots
+            ],
+        }
+
+
+@asynccontextmanager
+async def open_context(pool=None, headless=True, **context_kwargs):
+    """
+    Ouvre un contexte depuis le pool partagé, ou lance un navigateur dédié
+    si aucun pool n'est fourni (exécution locale des scrapers).
+    """
+    if pool is not None:
+        async with pool.context(**context_kwargs) as context:
+            yield context
+        return
+
+    async with async_playwright() as p:
+        with timed("launch"):
+            browser = await p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+        try:
+            lease = _Lease(lambda: browser, context_kwargs)
+            yield await lease.open()
+        finally:
+            await browser.close()
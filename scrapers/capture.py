@@ -0,0 +1,131 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CAPTURE_HTML = os.getenv("CAPTURE_HTML", "0") == "1"
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+
+
+class CaptureStore:
+    """
+    HTML des pages produit, compressé (gzip) et stocké par empreinte SHA-256
+    du contenu : une page identique d'une capture à l'autre n'est écrite
+    qu'une fois. L'index SQLite associe (fournisseur, URL, date de capture)
+    à l'empreinte et à la ligne du payload.
+
+    Bloquant (compression, fichier, commit) : la connexion est partagée entre
+    threads (appels via asyncio.to_thread) sous un verrou.
+    """
+
+    def __init__(self, directory=CAPTURE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS captures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, supplier TEXT, url TEXT,
+                captured_at REAL, digest TEXT, item TEXT
+            );
+            CREATE INDEX IF NOT EXISTS captures_url ON captures (supplier, url, captured_at);
+        """)
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, "blobs", digest[:2], f"{digest}.html.gz")
+
+    def save(self, supplier, item, html):
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Fichier temporaire propre au thread : deux captures de la même page peuvent être simultanées
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp, path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO captures (supplier, url, captured_at, digest, item) VALUES (?, ?, ?, ?, ?)",
+                (supplier, item["url"], time.time(), digest, json.dumps(item, default=str))
+            )
+        return digest
+
+    def latest(self, supplier, until=None, urls=None):
+        """
+        Dernière capture de chaque URL (antérieure à `until` si fourni) :
+        liste de (empreinte, ligne du payload, date de capture).
+        """
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT c.digest, c.item, c.captured_at FROM captures c
+                JOIN (
+                    SELECT MAX(id) AS latest, MIN(id) AS first FROM captures
+                    WHERE supplier = ? AND captured_at <= ? GROUP BY url
+                ) l ON c.id = l.latest
+                ORDER BY l.first
+                """,
+                (supplier, until if until is not None else time.time())
+            ).fetchall()
+        wanted = set(urls) if urls else None
+        captures = []
+        for digest, item, captured_at in rows:
+            item = json.loads(item)
+            if wanted is None or item["url"] in wanted:
+                captures.append((digest, item, captured_at))
+        return captures
+
+
+def load_blob(directory, digest):
+    with open(os.path.join(directory, "blobs", digest[:2], f"{digest}.html.gz"), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+
+class HtmlCapture:
+    """
+    Capture des pages d'un run de scraping pour un fournisseur.
+    """
+
+    def __init__(self, store, supplier):
+        self.store = store
+        self.supplier = supplier
+
+    async def save(self, item, html):
+        """
+        Enregistre la page hors de la boucle d'événements ; une erreur de
+        capture n'interrompt pas le scraping.
+        """
+        try:
+            await asyncio.to_thread(self.store.save, self.supplier, item, html)
+        except Exception:
+            pass
+
+    async def save_page(self, page, item):
+        try:
+            html = await page.content()
+        except Exception:
+            return
+        await self.save(item, html)
+
+
+capture_store = None
+
+
+def capture_for(payload, supplier):
+    """
+    HtmlCapture si la capture est activée ("capture" dans le payload, sinon
+    CAPTURE_HTML), None sinon.
+    """
+    global capture_store
+    if not payload.get("capture", CAPTURE_HTML):
+        return None
+    if capture_store is None:
+        capture_store = CaptureStore()
+    return HtmlCapture(capture_store, supplier)
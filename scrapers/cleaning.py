@@ -0,0 +1,85 @@
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+
+PRICE_PATTERN = re.compile(r'([\d,]+)')
+
+COLUMNS_ORDER = [
+    "product_category",
+    "manufacturer",
+    "manufacturer_id",
+    "supplier",
+    "url",
+    "name",
+    "description",
+    "technical_ref",
+    "unit_1",
+    "price_per_unit_1",
+    "unit_2",
+    "price_per_unit_2",
+    "unit_3",
+    "price_per_unit_3",
+    "is_available",
+    "stock",
+    "is_ok",
+    "error",
+    "created_at",
+    "from_cache",
+    "cache_age"
+]
+
+
+def clean_price(value):
+    """
+    Extrait le premier nombre d'un prix ("12,50 € HT" -> 12.5), "N/A" sinon.
+    """
+    match = PRICE_PATTERN.search(str(value))
+    if not match:
+        return "N/A"
+    try:
+        return float(match.group(1).replace(',', '.'))
+    except ValueError:
+        return "N/A"
+
+
+def is_available(stock, marker):
+    """
+    1 si le texte de stock contient le marqueur (insensible à la casse), 0 sinon.
+    """
+    return int(marker in str(stock).lower())
+
+
+def clean_technical_ref(raw_list):
+    """
+    Normalise les espaces de chaque caractéristique ; "N/A" si la liste est vide.
+    Les caractéristiques, très répétées d'un produit à l'autre, sont internées.
+    """
+    if not isinstance(raw_list, list):
+        return "N/A"
+    cleaned = [
+        sys.intern(' '.join(item.replace('\n', '').replace('\r', '').split()))
+        for item in raw_list
+        if isinstance(item, str)
+    ]
+    return cleaned if cleaned else "N/A"
+
+
+def order_record(record):
+    """
+    Équivalent de reindex(columns=COLUMNS_ORDER) pour un seul enregistrement.
+    """
+    return {column: record.get(column) for column in COLUMNS_ORDER}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return (value - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+    return str(value)
+
+
+def record_json(record):
+    """
+    Sérialise un enregistrement comme RecordSet.to_json (created_at en millisecondes).
+    """
+    return json.dumps(record, ensure_ascii=False, default=_json_default).encode("utf-8")
@@ -0,0 +1,205 @@
+import gzip
+import importlib.util
+import io
+import json
+
+CATEGORICAL_COLUMNS = ("product_category", "manufacturer", "supplier", "unit_1", "unit_2", "unit_3", "change_type")
+FLOAT_COLUMNS = ("price_per_unit_1", "price_per_unit_2", "price_per_unit_3", "cache_age")
+INT_COLUMNS = ("is_available", "is_ok", "from_cache")
+LIST_COLUMNS = ("technical_ref",)
+JSON_COLUMNS = ("changes",)
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ACCEPTED_TYPES = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+}
+# Parquet est déjà compressé (zstd) : inutile de le recompresser en HTTP
+COMPRESSIBLE_FORMATS = ("json", "csv", "arrow")
+MIN_COMPRESS_BYTES = 1024
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def _qualities(header):
+    """
+    {valeur: qualité} d'un en-tête Accept / Accept-Encoding, dans l'ordre de
+    l'en-tête ; les valeurs refusées (q=0) sont omises.
+    """
+    qualities = {}
+    for part in (header or "").split(","):
+        value, *params = [p.strip() for p in part.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            qualities[value.lower()] = quality
+    return qualities
+
+
+def negotiate_format(accept=None, format=None):
+    """
+    Format de sortie : paramètre `format` s'il est fourni, sinon le type le
+    mieux noté de l'en-tête Accept ; JSON par défaut.
+    """
+    if format:
+        if format not in MEDIA_TYPES:
+            raise UnsupportedFormat(f"unsupported format: {format} (expected one of {', '.join(MEDIA_TYPES)})")
+    else:
+        qualities = _qualities(accept)
+        accepted = sorted((t for t in qualities if t in ACCEPTED_TYPES), key=lambda t: -qualities[t])
+        format = ACCEPTED_TYPES[accepted[0]] if accepted else "json"
+    if format in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None:
+        raise UnsupportedFormat("the pyarrow package is required for Parquet and Arrow exports")
+    return format
+
+
+def negotiate_encoding(accept_encoding=None):
+    """
+    "br" (si le paquet brotli est installé), "gzip" ou None selon Accept-Encoding ;
+    brotli est préféré à qualité égale.
+    """
+    qualities = _qualities(accept_encoding)
+    wildcard = qualities.get("*", 0)
+    gzip_quality = qualities.get("gzip", wildcard)
+    br_quality = qualities.get("br", wildcard) if importlib.util.find_spec("brotli") is not None else 0
+    if br_quality and br_quality >= gzip_quality:
+        return "br"
+    return "gzip" if gzip_quality else None
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        import brotli
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6)
+
+
+def _nullify(column):
+    return column.where(column.notna() & (column.astype(str) != "N/A"))
+
+
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    if isinstance(value, str) and value and value != "N/A":
+        return [value]
+    return None
+
+
+def typed_frame(df):
+    """
+    DataFrame des résultats avec des types compacts : prix en flottants
+    nullables ("N/A" devient nul), fournisseur, fabricant, catégorie et
+    conditionnements en catégories, technical_ref en liste de chaînes.
+    """
+    import pandas as pd
+
+    typed = {}
+    for column in df.columns:
+        values = df[column]
+        if column in FLOAT_COLUMNS:
+            typed[column] = pd.to_numeric(_nullify(values), errors="coerce").astype("Float64")
+        elif column in INT_COLUMNS:
+            typed[column] = pd.to_numeric(_nullify(values), errors="coerce").astype("Int8")
+        elif column in CATEGORICAL_COLUMNS:
+            typed[column] = _nullify(values).astype("string").astype("category")
+        elif column in LIST_COLUMNS:
+            typed[column] = pd.Series([_as_list(v) for v in values], index=df.index, dtype=object)
+        elif column in JSON_COLUMNS:
+            typed[column] = pd.Series(
+                [None if v is None or v is pd.NA else json.dumps(v, default=str, ensure_ascii=False) for v in values],
+                index=df.index, dtype="string"
+            )
+        elif column == "created_at":
+            typed[column] = pd.to_datetime(values, errors="coerce").astype("datetime64[ms]")
+        else:
+            typed[column] = _nullify(values).astype("string")
+    return pd.DataFrame(typed, index=df.index)
+
+
+def arrow_schema(frame):
+    import pyarrow as pa
+
+    fields = []
+    for column in frame.columns:
+        if column in FLOAT_COLUMNS:
+            type_ = pa.float64()
+        elif column in INT_COLUMNS:
+            type_ = pa.int8()
+        elif column in CATEGORICAL_COLUMNS:
+            type_ = pa.dictionary(pa.int32(), pa.string())
+        elif column in LIST_COLUMNS:
+            type_ = pa.list_(pa.string())
+        elif column == "created_at":
+            type_ = pa.timestamp("ms")
+        else:
+            type_ = pa.string()
+        fields.append(pa.field(column, type_, nullable=True))
+    return pa.schema(fields)
+
+
+def arrow_table(records):
+    import pyarrow as pa
+
+    frame = typed_frame(records.to_frame())
+    return pa.Table.from_pandas(frame, schema=arrow_schema(frame), preserve_index=False)
+
+
+def export_bytes(records, format):
+    """
+    Sérialise les résultats (RecordSet) dans le format demandé (json, csv,
+    parquet, arrow) ; pandas n'est chargé que pour les formats tabulaires.
+    """
+    if format == "json":
+        return records.to_json()
+    if format == "csv":
+        frame = typed_frame(records.to_frame())
+        for column in LIST_COLUMNS:
+            if column in frame.columns:
+                frame[column] = [None if v is None else json.dumps(v, ensure_ascii=False) for v in frame[column]]
+        return frame.to_csv(index=False).encode("utf-8")
+
+    table = arrow_table(records)
+    buffer = io.BytesIO()
+    if format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, buffer, compression="zstd")
+    else:
+        import pyarrow as pa
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
+
+
+def encode_response(records, accept=None, accept_encoding=None, format=None):
+    """
+    (contenu, type de média, en-têtes) de la réponse négociée pour les résultats.
+    """
+    format = negotiate_format(accept, format)
+    content = export_bytes(records, format)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if format in COMPRESSIBLE_FORMATS and len(content) >= MIN_COMPRESS_BYTES:
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding:
+            content = compress(content, encoding)
+            headers["Content-Encoding"] = encoding
+    return content, MEDIA_TYPES[format], headers
@@ -0,0 +1,170 @@
+from selectolax.lexbor import LexborHTMLParser
+
+from scrapers.metrics import timed
+
+WAIT_TIMEOUT = 5000
+
+# Spécification déclarative : chaque champ a un sélecteur et un type
+#   "text"    : textContent du premier élément (équivalent de page.text_content)
+#   "list"    : textContent de tous les éléments (équivalent de all_text_contents)
+#   "options" : blocs répétés, limités à `max`, dont on garde les visibles,
+#               avec un textContent par sous-sélecteur de `parts`
+#   "raw"     : comme "text", mais laissé tel quel au module fournisseur
+# "label" remplace le nom du champ dans les messages d'erreur, "optional"
+# désactive l'erreur "missing ..." pour les champs facultatifs.
+# "wait" fait attendre le sélecteur du champ (ou le sélecteur donné) avant
+# l'extraction, au plus "timeout" ms (WAIT_TIMEOUT par défaut), délai réduit
+# par AdaptiveWaits une fois les temps de chargement connus.
+EXTRACT_JS = """
+(spec) => {
+    const values = {};
+    const errors = [];
+    const text = (root, selector) => {
+        const el = root.querySelector(selector);
+        return el ? el.textContent : null;
+    };
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0 && getComputedStyle(el).visibility !== 'hidden';
+    };
+    for (const field of spec) {
+        try {
+            if (field.kind === 'list') {
+                values[field.field] = Array.from(document.querySelectorAll(field.selector), el => el.textContent);
+            } else if (field.kind === 'options') {
+                const elements = Array.from(document.querySelectorAll(field.selector));
+                values[field.field] = {
+                    count: elements.length,
+                    visible: elements.slice(0, field.max).filter(visible).map(el => {
+                        const parts = {};
+                        for (const [name, selector] of Object.entries(field.parts)) {
+                            parts[name] = text(el, selector);
+                        }
+                        return parts;
+                    })
+                };
+            } else {
+                values[field.field] = text(document, field.selector);
+            }
+        } catch (e) {
+            errors.push(`${field.label || field.field} error: ${e.message}`);
+        }
+    }
+    return {values, errors};
+}
+"""
+
+
+def parse_html(html):
+    return LexborHTMLParser(html)
+
+
+def is_hidden(node):
+    """
+    Approximation statique de is_visible : masquage par attribut, classe ou style inline.
+    """
+    while node is not None:
+        attrs = node.attributes
+        style = (attrs.get("style") or "").replace(" ", "").lower()
+        classes = (attrs.get("class") or "").split()
+        if "hidden" in attrs or "display:none" in style or "visibility:hidden" in style:
+            return True
+        if "hidden" in classes or "d-none" in classes:
+            return True
+        node = node.parent
+    return False
+
+
+def wait_fields(spec):
+    """
+    Sélecteurs à attendre avant l'extraction, avec leur délai par défaut.
+    """
+    return [
+        {
+            "field": field["field"],
+            "selector": field["wait"] if isinstance(field["wait"], str) else field["selector"],
+            "timeout": field.get("timeout", WAIT_TIMEOUT),
+        }
+        for field in spec if field.get("wait")
+    ]
+
+
+async def extract_page(page, spec, waits):
+    """
+    Extrait tous les champs de la spécification en un seul aller-retour
+    (page.evaluate), après avoir attendu les champs marqués "wait".
+    """
+    await waits.wait_for_fields(page, wait_fields(spec))
+    try:
+        with timed("extract", waits.supplier):
+            return await page.evaluate(EXTRACT_JS, spec)
+    except Exception as e:
+        return {"values": {}, "errors": [f"extraction error: {str(e)}"]}
+
+
+def extract_tree(tree, spec):
+    """
+    Même extraction que extract_page, sur un HTML statique parsé par selectolax.
+    """
+    values = {}
+    errors = []
+
+    def text(root, selector):
+        node = root.css_first(selector)
+        return node.text() if node is not None else None
+
+    for field in spec:
+        kind = field.get("kind", "text")
+        try:
+            if kind == "list":
+                values[field["field"]] = [node.text() for node in tree.css(field["selector"])]
+            elif kind == "options":
+                elements = tree.css(field["selector"])
+                values[field["field"]] = {
+                    "count": len(elements),
+                    "visible": [
+                        {name: text(element, selector) for name, selector in field["parts"].items()}
+                        for element in elements[:field["max"]]
+                        if not is_hidden(element)
+                    ],
+                }
+            else:
+                values[field["field"]] = text(tree, field["selector"])
+        except Exception as e:
+            errors.append(f"{field.get('label', field['field'])} error: {str(e)}")
+
+    return {"values": values, "errors": errors}
+
+
+def collect_fields(spec, extracted):
+    """
+    Convertit les champs "text" et "list" extraits en valeurs de sortie
+    ("N/A" si absents) et en erreurs "missing ...".
+    """
+    values = extracted["values"]
+    errors = list(extracted["errors"])
+    data = {}
+
+    for field in spec:
+        kind = field.get("kind", "text")
+        if kind not in ("text", "list"):
+            continue
+        name = field["field"]
+        value = values.get(name)
+        if kind == "text":
+            data[name] = value.strip() if value else "N/A"
+        else:
+            data[name] = value if value else "N/A"
+        if not value and not field.get("optional") and name in values:
+            errors.append(f"missing {field.get('label', name)}")
+
+    return data, errors
+
+
+def product_result(item, data, errors):
+    return {
+        **item,
+        **data,
+        "is_ok": 0 if errors else 1,
+        "error": "; ".join(errors) if errors else None
+    }
@@ -0,0 +1,250 @@
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class TransientError(Exception):
+    """
+    Réponse HTTP 429 ou 5xx, qui mérite une nouvelle tentative.
+    """
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+def is_transient(error):
+    """
+    Erreur qui mérite une nouvelle tentative : 429 / 5xx, timeout ou connexion
+    coupée (ServerDisconnectedError, connexion refusée ou réinitialisée).
+    Une erreur TLS (certificat) ne se corrige pas en réessayant.
+    """
+    if isinstance(error, aiohttp.ClientSSLError):
+        return False
+    return isinstance(error, (
+        TransientError, TimeoutError, asyncio.TimeoutError, PlaywrightTimeoutError, aiohttp.ClientConnectionError
+    ))
+
+
+def retry_after_seconds(headers):
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def check_status(url, status, headers):
+    """
+    Lève TransientError pour un statut 429 ou 5xx.
+    """
+    if status in TRANSIENT_STATUSES:
+        raise TransientError(url, status, retry_after_seconds(headers))
+
+
+async def goto(page, url):
+    """
+    page.goto qui signale les réponses 429 / 5xx comme erreurs transitoires.
+    """
+    response = await page.goto(url)
+    if response is not None:
+        check_status(url, response.status, response.headers)
+    return response
+
+
+class HostLimits:
+    """
+    Limites appliquées à un hôte fournisseur.
+    """
+
+    ENV = {
+        "rate": ("RATE_LIMIT", "5"),
+        "burst": ("RATE_BURST", "10"),
+        "attempts": ("RETRY_ATTEMPTS", "3"),
+        "base_delay": ("RETRY_BASE_DELAY", "0.5"),
+        "max_delay": ("RETRY_MAX_DELAY", "10"),
+        "failure_threshold": ("CIRCUIT_THRESHOLD", "5"),
+        "reset_timeout": ("CIRCUIT_RESET", "60"),
+    }
+
+    def __init__(self, rate=5, burst=10, attempts=3, base_delay=0.5, max_delay=10,
+                 failure_threshold=5, reset_timeout=60):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.attempts = max(1, int(attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+
+    @classmethod
+    def from_env(cls, prefix=None):
+        """
+        Lit `{prefix}_RATE_LIMIT`, `{prefix}_RETRY_ATTEMPTS`... avec repli sur
+        les variables globales (`RATE_LIMIT`...) puis sur les valeurs par défaut.
+        """
+        return cls(**{
+            name: os.getenv(f"{prefix}_{variable}" if prefix else variable, os.getenv(variable, default))
+            for name, (variable, default) in cls.ENV.items()
+        })
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.ENV}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class CircuitBreaker:
+    """
+    S'ouvre après `failure_threshold` échecs transitoires consécutifs ; après
+    `reset_timeout` secondes, laisse repasser les requêtes (semi-ouvert) :
+    un succès le referme, un échec le rouvre.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class _Host:
+    def __init__(self, limits):
+        self.limits = limits
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.breaker = CircuitBreaker(limits.failure_threshold, limits.reset_timeout)
+        self.counters = {"requests": 0, "retries": 0, "transient_failures": 0, "rejected": 0}
+
+
+class HostScheduler:
+    """
+    Ordonnanceur partagé par hôte : limite de débit (token bucket), nouvelles
+    tentatives avec backoff exponentiel et jitter sur les erreurs transitoires
+    (timeouts, connexions coupées, 429, 5xx) et disjoncteur qui fait échouer immédiatement les
+    requêtes vers un fournisseur en panne.
+    """
+
+    def __init__(self, default_limits=None):
+        self.default_limits = default_limits or HostLimits.from_env()
+        self._limits = {}
+        self._hosts = {}
+
+    @staticmethod
+    def host(url):
+        host = urlsplit(url).netloc.lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def configure(self, host, limits):
+        self._limits[host] = limits
+        self._hosts.pop(host, None)
+
+    def _host(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = _Host(self._limits.get(host, self.default_limits))
+        return self._hosts[host]
+
+    async def call(self, url, request):
+        """
+        Exécute `request()` (coroutine) pour une URL en respectant les limites
+        de son hôte. Lève CircuitOpen si le fournisseur est considéré en panne.
+        """
+        name = self.host(url)
+        host = self._host(name)
+        limits = host.limits
+
+        for attempt in range(limits.attempts):
+            if not host.breaker.allow():
+                host.counters["rejected"] += 1
+                raise CircuitOpen(
+                    f"circuit open for {name}: {host.breaker.failures} consecutive transient failures, "
+                    f"supplier considered down"
+                )
+            await host.bucket.acquire()
+            host.counters["requests"] += 1
+            try:
+                result = await request()
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                host.counters["transient_failures"] += 1
+                host.breaker.record_failure()
+                if attempt == limits.attempts - 1:
+                    raise
+                delay = random.uniform(0, min(limits.max_delay, limits.base_delay * 2 ** attempt))
+                if getattr(e, "retry_after", None):
+                    delay = max(delay, min(e.retry_after, limits.max_delay))
+                host.counters["retries"] += 1
+                await asyncio.sleep(delay)
+            else:
+                host.breaker.record_success()
+                return result
+
+    def stats(self):
+        for name in self._limits:
+            self._host(name)
+        return {
+            name: {
+                "limits": host.limits.to_dict(),
+                "circuit": host.breaker.state,
+                "consecutive_failures": host.breaker.failures,
+                **host.counters,
+            }
+            for name, host in self._hosts.items()
+        }
+
+
+host_scheduler = HostScheduler()
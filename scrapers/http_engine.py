@@ -0,0 +1,203 @@
+import asyncio
+import os
+from http.cookies import SimpleCookie
+
+import aiohttp
+from yarl import URL
+
+from scrapers.host_scheduler import check_status, host_scheduler
+from scrapers.runner import scrape_items
+from scrapers.scheduler import fair_scheduler
+from scrapers.singleflight import coalesce, product_flights
+
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "16"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "fr-FR,fr;q=0.9",
+}
+
+
+def resolve_engine(payload, default, engines=("hybrid", "browser")):
+    """
+    Moteur de scraping : "hybrid" (HTTP puis navigateur en secours), "browser",
+    ou un autre moteur de `engines` propre au fournisseur.
+    """
+    engine = payload.get("engine") or default
+    return engine if engine in engines else "browser"
+
+
+class HttpFetcher:
+    """
+    Session aiohttp en keep-alive alimentée par les cookies du contexte
+    Playwright connecté.
+    """
+
+    def __init__(self, headers=None, concurrency=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self._session = aiohttp.ClientSession(
+            headers={**DEFAULT_HEADERS, **(headers or {})},
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    async def sync_cookies(self, context):
+        """
+        Recopie les cookies du contexte Playwright dans la session HTTP.
+        """
+        state = await context.storage_state()
+        self._session.cookie_jar.clear()
+        for cookie in state.get("cookies", []):
+            domain = cookie["domain"].lstrip(".")
+            morsels = SimpleCookie()
+            morsels[cookie["name"]] = cookie["value"]
+            morsels[cookie["name"]]["domain"] = domain
+            morsels[cookie["name"]]["path"] = cookie.get("path") or "/"
+            self._session.cookie_jar.update_cookies(morsels, response_url=URL(f"https://{domain}/"))
+
+    async def fetch(self, url, validators=None):
+        """
+        Renvoie (url finale, statut, html, validateurs). Avec des validateurs
+        (ETag / Last-Modified), la requête est conditionnelle et peut répondre 304.
+        Lève TransientError sur une réponse 429 ou 5xx.
+        """
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        async with self._session.get(url, headers=headers, allow_redirects=True) as response:
+            check_status(url, response.status, response.headers)
+            html = await response.text(errors="replace")
+            response_validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+            if not any(response_validators.values()):
+                response_validators = None
+            return str(response.url), response.status, html, response_validators
+
+    async def fetch_json(self, url, headers=None):
+        """
+        Renvoie (statut, JSON décodé ou None si le statut n'est pas 200).
+        Lève TransientError sur une réponse 429 ou 5xx.
+        """
+        headers = {"Accept": "application/json", **(headers or {})}
+        async with self._session.get(url, headers=headers, allow_redirects=False) as response:
+            check_status(url, response.status, response.headers)
+            if response.status != 200:
+                return response.status, None
+            return response.status, await response.json(content_type=None)
+
+
+async def fetch_products(fetcher, parse_product, is_login_page, data, on_result=None, collect=True,
+                         revalidator=None, capture=None, supplier="", account=""):
+    """
+    Scrape les produits sans navigateur. Renvoie une liste alignée sur `data`,
+    avec None pour les produits à reprendre avec Playwright (erreur HTTP,
+    redirection vers la connexion ou champs introuvables dans le HTML).
+    Avec collect=False, les produits extraits sont seulement marqués True.
+
+    Les requêtes passent par l'ordonnanceur par hôte (débit, nouvelles
+    tentatives, disjoncteur).
+
+    Si un `revalidator` (CachedRun) est fourni, les produits déjà en cache
+    sont demandés en requête conditionnelle et un 304 reprend la ligne en cache.
+    Avec une `capture` (HtmlCapture), le HTML des pages extraites est enregistré.
+    Une URL déjà en cours de récupération pour `supplier` et le même compte
+    `account` (autre run du processus) n'est pas redemandée : le résultat
+    est partagé.
+    """
+    results = [None] * len(data)
+    semaphore = asyncio.Semaphore(fetcher.concurrency)
+
+    async def fetch_one(index, item):
+        async def scheduled_visit():
+            async with fair_scheduler.slot():
+                return await visit()
+
+        async def visit():
+            validators = revalidator.validators(item["url"]) if revalidator else None
+
+            async def request():
+                async with semaphore:
+                    return await fetcher.fetch(item["url"], validators)
+
+            try:
+                final_url, status, html, response_validators = await host_scheduler.call(item["url"], request)
+            except Exception:
+                return None
+            if status == 304 and revalidator:
+                return revalidator.not_modified(item)
+            if status != 200 or is_login_page(final_url):
+                return None
+            try:
+                result = parse_product(html, item)
+            except Exception:
+                return None
+            if result is not None and revalidator:
+                revalidator.remember_validators(item["url"], response_validators)
+            if result is not None and capture:
+                await capture.save(item, html)
+            return result
+
+        try:
+            result = await coalesce(product_flights, "http", supplier, account, item, scheduled_visit)
+        except Exception:
+            return
+        if result is None:
+            return
+        if on_result:
+            on_result(index, result)
+        results[index] = result if collect else True
+
+    await asyncio.gather(*(fetch_one(i, item) for i, item in enumerate(data)))
+    return results
+
+
+async def scrape_hybrid(context, page, session, scrape_product, parse_product, is_login_page,
+                        data, concurrency=1, headers=None, on_result=None, collect=True, revalidator=None,
+                        capture=None):
+    """
+    Scrape d'abord en HTTP avec les cookies de la session, puis reprend avec
+    Playwright uniquement les produits non extraits. L'ordre d'entrée est conservé.
+    """
+    async with HttpFetcher(headers=headers) as fetcher:
+        await fetcher.sync_cookies(context)
+        results = await fetch_products(
+            fetcher, parse_product, is_login_page, data, on_result, collect, revalidator, capture,
+            session.supplier, session.account
+        )
+
+    return await resume_with_browser(
+        context, page, session, scrape_product, data, results, concurrency, on_result, collect, capture
+    )
+
+
+async def resume_with_browser(context, page, session, scrape_product, data, results, concurrency=1,
+                              on_result=None, collect=True, capture=None):
+    """
+    Reprend avec Playwright les produits de `data` dont le résultat est None
+    et complète `results` à leur rang.
+    """
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        fallback = await scrape_items(
+            context, page, session, scrape_product, [data[i] for i in missing], concurrency,
+            on_result=(lambda i, result: on_result(missing[i], result)) if on_result else None,
+            collect=collect, capture=capture
+        )
+        for index, result in zip(missing, fallback):
+            results[index] = result
+
+    return results
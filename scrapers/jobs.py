@@ -0,0 +1,370 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_FLUSH_ROWS = int(os.getenv("JOB_FLUSH_ROWS", "50"))
+JOB_FLUSH_INTERVAL = float(os.getenv("JOB_FLUSH_INTERVAL", "0.5"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+
+class Job:
+    """
+    État d'un job de scraping asynchrone.
+    """
+
+    FIELDS = ("id", "supplier", "status", "total", "done", "errors",
+              "created_at", "started_at", "finished_at", "error")
+
+    def __init__(self, id, supplier, total, status=PENDING, done=0, errors=0,
+                 created_at=None, started_at=None, finished_at=None, error=None):
+        self.id = id
+        self.supplier = supplier
+        self.total = total
+        self.status = status
+        self.done = done
+        self.errors = errors
+        self.created_at = created_at or time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.error = error
+
+    def eta_seconds(self):
+        if self.status != RUNNING or not self.started_at or not self.done:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / self.done * (self.total - self.done), 1)
+
+    def to_dict(self):
+        return {
+            **{field: getattr(self, field) for field in self.FIELDS},
+            "progress": {
+                "done": self.done,
+                "total": self.total,
+                "errors": self.errors,
+                "eta_seconds": self.eta_seconds(),
+            },
+        }
+
+
+class MemoryJobStore:
+    """
+    Stockage des jobs en mémoire (perdu au redémarrage).
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._rows = {}
+        self._results = {}
+
+    def save(self, job):
+        self._jobs[job.id] = job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def add_row(self, job_id, index, row):
+        self._rows.setdefault(job_id, {})[index] = row
+
+    def save_progress(self, job, rows):
+        for index, row in rows:
+            self.add_row(job.id, index, row)
+        self.save(job)
+
+    def rows(self, job_id):
+        rows = self._rows.get(job_id, {})
+        return [rows[i] for i in sorted(rows)]
+
+    def set_results(self, job_id, results):
+        self._results[job_id] = results
+        self._rows.pop(job_id, None)
+
+    def results(self, job_id):
+        return self._results.get(job_id)
+
+
+class SQLiteJobStore:
+    """
+    Stockage des jobs dans SQLite : les résultats terminés survivent à un
+    redémarrage, les jobs en cours sont marqués "interrupted".
+    La connexion est partagée entre threads (écritures via asyncio.to_thread)
+    sous un verrou.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, supplier TEXT, status TEXT, total INTEGER,
+                done INTEGER, errors INTEGER, created_at REAL, started_at REAL,
+                finished_at REAL, error TEXT, results BLOB
+            );
+            CREATE TABLE IF NOT EXISTS job_rows (
+                job_id TEXT, idx INTEGER, row TEXT, PRIMARY KEY (job_id, idx)
+            );
+        """)
+        self._db.execute(
+            "UPDATE jobs SET status = ?, error = 'service restarted' WHERE status IN (?, ?)",
+            (INTERRUPTED, PENDING, RUNNING)
+        )
+        self._db.commit()
+
+    def _save(self, job):
+        values = [getattr(job, field) for field in Job.FIELDS]
+        self._db.execute(
+            f"INSERT INTO jobs ({', '.join(Job.FIELDS)}) VALUES ({', '.join('?' * len(values))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{f} = excluded.{f}' for f in Job.FIELDS[1:])}",
+            values
+        )
+
+    def _add_rows(self, job_id, rows):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO job_rows (job_id, idx, row) VALUES (?, ?, ?)",
+            [(job_id, index, json.dumps(row, default=str)) for index, row in rows]
+        )
+
+    def save(self, job):
+        with self._lock, self._db:
+            self._save(job)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(Job.FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return Job(**dict(zip(Job.FIELDS, row))) if row else None
+
+    def add_row(self, job_id, index, row):
+        with self._lock, self._db:
+            self._add_rows(job_id, [(index, row)])
+
+    def save_progress(self, job, rows):
+        """
+        Enregistre un lot de lignes et l'avancement du job en une transaction.
+        """
+        with self._lock, self._db:
+            self._add_rows(job.id, rows)
+            self._save(job)
+
+    def rows(self, job_id):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT row FROM job_rows WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    def set_results(self, job_id, results):
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET results = ? WHERE id = ?", (results, job_id))
+            self._db.execute("DELETE FROM job_rows WHERE job_id = ?", (job_id,))
+
+    def results(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT results FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+
+def create_job_store(kind=JOB_STORE):
+    if kind == "sqlite":
+        return SQLiteJobStore()
+    return MemoryJobStore()
+
+
+class JobWriter:
+    """
+    Écrit les lignes et l'avancement d'un job hors de la boucle
+    (asyncio.to_thread) : par lots de `rows` lignes ou toutes les `interval`
+    secondes, puis une dernière fois à la fin du job. Une seule tâche écrit,
+    les écritures restent donc dans l'ordre.
+    """
+
+    def __init__(self, store, job, rows=JOB_FLUSH_ROWS, interval=JOB_FLUSH_INTERVAL):
+        self.store = store
+        self.job = job
+        self.rows = max(1, rows)
+        self.interval = interval
+        self._pending = []
+        self._output = None
+        self._closing = False
+        self._saved = False
+        self._wake = asyncio.Event()
+        # Première écriture immédiate : le job passe à "running"
+        self._wake.set()
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, index, row):
+        self._pending.append((index, row))
+        if len(self._pending) >= self.rows:
+            self._wake.set()
+
+    async def close(self, output=None):
+        """
+        Dernière écriture : état final du job et, s'il a abouti, ses résultats.
+        """
+        if output is not None:
+            # Les résultats contiennent déjà les lignes en attente
+            self._output = output
+            self._pending = []
+        self._closing = True
+        self._wake.set()
+        await asyncio.shield(self._task)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            closing = self._closing
+            if self._saved and not closing and not self._pending:
+                continue
+            rows, self._pending = self._pending, []
+            output = self._output if closing else None
+            await asyncio.to_thread(self._write, copy.copy(self.job), rows, output)
+            self._saved = True
+            if closing:
+                return
+
+    def _write(self, job, rows, output):
+        if output is not None:
+            self.store.set_results(job.id, output.to_json())
+        self.store.save_progress(job, rows)
+
+
+class UnknownJob(Exception):
+    pass
+
+
+class JobManager:
+    """
+    File de jobs exécutés par des workers en tâche de fond.
+
+    `suppliers` associe un nom de fournisseur à (scrape, clean_output).
+    """
+
+    def __init__(self, store, suppliers, pool=None, workers=JOB_WORKERS,
+                 flush_rows=JOB_FLUSH_ROWS, flush_interval=JOB_FLUSH_INTERVAL):
+        self.store = store
+        self.suppliers = suppliers
+        self.pool = pool
+        self.workers = max(1, workers)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue()
+        self._tasks = {}
+        self._workers = []
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Arrête les workers ; les jobs en cours sont marqués "interrupted".
+        """
+        self._stopping = True
+        for task in [*self._workers, *self._tasks.values()]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._tasks.values(), return_exceptions=True)
+        self._workers = []
+
+    def submit(self, supplier, payload):
+        job = Job(id=uuid.uuid4().hex, supplier=supplier, total=len(payload["data"]))
+        self.store.save(job)
+        self._queue.put_nowait((job.id, payload))
+        return job
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            raise UnknownJob(job_id)
+        return job
+
+    async def cancel(self, job_id):
+        job = self.get(job_id)
+        if job.status == PENDING:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self.store.save(job)
+        elif job.id in self._tasks:
+            task = self._tasks[job.id]
+            task.cancel()
+            await asyncio.wait([task])
+            job = self.get(job_id)
+        return job
+
+    def results_json(self, job):
+        """
+        Résultats nettoyés du job en octets JSON ; partiels tant qu'il n'est pas terminé.
+        """
+        results = self.store.results(job.id)
+        if results is not None:
+            return results if isinstance(results, bytes) else results.encode("utf-8")
+        rows = self.store.rows(job.id)
+        if not rows:
+            return b"[]"
+        _, clean = self.suppliers[job.supplier]
+        return clean(rows).to_json()
+
+    async def _worker(self):
+        while True:
+            job_id, payload = await self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or job.status != PENDING:
+                continue
+            task = asyncio.create_task(self._run(job, payload))
+            self._tasks[job.id] = task
+            await asyncio.wait([task])
+            self._tasks.pop(job.id, None)
+
+    async def _run(self, job, payload):
+        scrape, _ = self.suppliers[job.supplier]
+        job.status = RUNNING
+        job.started_at = time.time()
+        writer = JobWriter(self.store, job, self.flush_rows, self.flush_interval)
+        output = None
+
+        def on_result(index, row):
+            writer.add(index, row)
+            # Le mode listing ajoute des produits au-delà du payload
+            job.total = max(job.total, index + 1)
+            job.done += 1
+            if row.get("is_ok") == 0 or row.get("status") == "failed":
+                job.errors += 1
+
+        try:
+            output = await scrape(payload, pool=self.pool, on_result=on_result)
+            if isinstance(output, list):
+                job.status = FAILED
+                job.error = output[0].get("error") if output else "scraping failed"
+                output = None
+            else:
+                job.status = DONE
+        except asyncio.CancelledError:
+            if self._stopping:
+                job.status = INTERRUPTED
+                job.error = "service stopped"
+            else:
+                job.status = CANCELLED
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        job.finished_at = time.time()
+        await writer.close(output)
@@ -0,0 +1,294 @@
+import asyncio
+import os
+import sqlite3
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from scrapers.extraction import parse_html
+from scrapers.host_scheduler import goto, host_scheduler
+from scrapers.http_engine import HttpFetcher
+from scrapers.metrics import Counter, timed
+from scrapers.result_cache import VOLATILE_FIELDS
+
+LISTING_MAX_PAGES = int(os.getenv("LISTING_MAX_PAGES", "50"))
+LISTING_CONCURRENCY = int(os.getenv("LISTING_CONCURRENCY", "4"))
+LISTING_INDEX_PATH = os.getenv("LISTING_INDEX_PATH", "listings.sqlite3")
+
+LISTING_PAGES = Counter(
+    "scraper_listing_pages_total",
+    "Pages de liste chargées en mode listing",
+    labels=("supplier", "outcome"),
+)
+LISTING_PRODUCTS = Counter(
+    "scraper_listing_products_total",
+    "Produits du mode listing, servis depuis une page de liste ou par visite de leur page",
+    labels=("supplier", "source"),
+)
+
+
+def listing_mode(payload):
+    return payload.get("mode") == "listing"
+
+
+def listing_pages(payload):
+    """
+    Pages de liste (catégories) explicitement demandées en mode listing.
+    """
+    return list(payload.get("listings") or []) if listing_mode(payload) else []
+
+
+def product_key(url):
+    """
+    Forme comparable d'une URL produit : hôte en minuscules, sans fragment ni "/" final.
+    """
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+class ListingSpec:
+    """
+    Structure des pages de liste d'un fournisseur : sélecteur des vignettes
+    produit, champs lus dans chaque vignette (même format que les specs
+    d'extraction, "attr" pour lire un attribut plutôt que le texte) et lien
+    vers la page suivante.
+    """
+
+    def __init__(self, tile, fields, next_page):
+        self.tile = tile
+        self.fields = fields
+        self.next_page = next_page
+
+
+def parse_listing(html, base_url, spec):
+    """
+    Renvoie (vignettes, URL de la page suivante ou None). Chaque vignette est
+    un dict des champs trouvés, "url" rendue absolue ; une vignette sans lien
+    est ignorée.
+    """
+    tree = parse_html(html)
+    tiles = []
+    for node in tree.css(spec.tile):
+        tile = {}
+        for field in spec.fields:
+            element = node.css_first(field["selector"])
+            if element is None:
+                continue
+            value = element.attributes.get(field["attr"]) if field.get("attr") else element.text(separator=" ")
+            if value and value.strip():
+                tile[field["field"]] = " ".join(value.split())
+        if tile.get("url"):
+            tile["url"] = urljoin(base_url, tile["url"])
+            tiles.append(tile)
+
+    link = tree.css_first(spec.next_page)
+    href = link.attributes.get("href") if link is not None else None
+    return tiles, urljoin(base_url, href) if href else None
+
+
+class ListingIndex:
+    """
+    Page de liste (première page de la catégorie) où chaque produit a été vu
+    en dernier, pour retrouver les catégories à parcourir à partir d'URLs produit.
+    """
+
+    def __init__(self, path=LISTING_INDEX_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                supplier TEXT, url TEXT, listing_url TEXT, seen_at REAL,
+                PRIMARY KEY (supplier, url)
+            )
+        """)
+        self._db.commit()
+
+    def lookup(self, supplier, urls):
+        """
+        {URL produit normalisée: page de liste} pour les produits déjà vus.
+        """
+        found = {}
+        urls = list(urls)
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT url, listing_url FROM listings WHERE supplier = ? AND url IN ({', '.join('?' * len(chunk))})",
+                (supplier, *chunk)
+            )
+            found.update(rows)
+        return found
+
+    def record(self, supplier, seen):
+        """
+        Enregistre {URL produit normalisée: page de liste} vus pendant un parcours.
+        """
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO listings (supplier, url, listing_url, seen_at) VALUES (?, ?, ?, ?)",
+                [(supplier, url, listing_url, now) for url, listing_url in seen.items()]
+            )
+
+
+listing_index = None
+
+
+def get_listing_index():
+    """
+    Index partagé, ouvert au premier usage.
+    """
+    global listing_index
+    if listing_index is None:
+        listing_index = ListingIndex()
+    return listing_index
+
+
+class ListingLoader:
+    """
+    Charge les pages de liste en HTTP avec les cookies de la session
+    (moteurs HTTP, plusieurs catégories en parallèle) ou avec la page
+    Playwright connectée (moteur "browser", une page à la fois).
+    """
+
+    def __init__(self, supplier, is_login_page, page=None, fetcher=None):
+        self.supplier = supplier
+        self.is_login_page = is_login_page
+        self.page = page
+        self.fetcher = fetcher
+        self.concurrency = LISTING_CONCURRENCY if fetcher else 1
+
+    async def load(self, url):
+        """
+        HTML de la page de liste ; lève une exception si elle n'est pas servie.
+        """
+        try:
+            with timed("listing", self.supplier):
+                if self.fetcher:
+                    final_url, status, html, _ = await host_scheduler.call(url, lambda: self.fetcher.fetch(url))
+                    if status != 200:
+                        raise RuntimeError(f"listing page returned {status}: {url}")
+                else:
+                    await host_scheduler.call(url, lambda: goto(self.page, url))
+                    final_url, html = self.page.url, await self.page.content()
+            if self.is_login_page(final_url):
+                raise RuntimeError(f"redirected to login page: {final_url}")
+        except Exception:
+            LISTING_PAGES.inc(supplier=self.supplier, outcome="error")
+            raise
+        LISTING_PAGES.inc(supplier=self.supplier, outcome="ok")
+        return html
+
+
+async def harvest(loader, spec, roots, wanted=None, max_pages=LISTING_MAX_PAGES):
+    """
+    Parcourt chaque catégorie de `roots` page après page et renvoie
+    {URL produit normalisée: (catégorie, vignette)}. Si `wanted` donne les
+    produits attendus d'une catégorie, son parcours s'arrête dès qu'ils ont
+    tous été vus. Une page en erreur termine le parcours de sa catégorie.
+    """
+    tiles = {}
+    semaphore = asyncio.Semaphore(loader.concurrency)
+
+    async def walk(root):
+        remaining = set((wanted or {}).get(root, ()))
+        url = root
+        for _ in range(max_pages):
+            try:
+                async with semaphore:
+                    html = await loader.load(url)
+            except Exception:
+                return
+            found, url = parse_listing(html, url, spec)
+            for tile in found:
+                key = product_key(tile["url"])
+                tiles.setdefault(key, (root, tile))
+                remaining.discard(key)
+            if url is None or (wanted and root in wanted and not remaining):
+                return
+
+    await asyncio.gather(*(walk(root) for root in roots))
+    return tiles
+
+
+def listing_row(cache, supplier, account, item, tile, details=True):
+    """
+    Ligne produit construite depuis une vignette et les champs statiques
+    encore valides du cache. None si un champ manque et que la page produit
+    doit être visitée ; avec details=False, les champs absents restent vides.
+    Les libellés de conditionnement (unit_*) sont repris du cache.
+    """
+    cached = cache.static_fields(supplier, account, item["url"])
+    if cached is None:
+        if details:
+            return None
+        cached = {}
+    fields = {field: value for field, value in tile.items() if field != "url"}
+    for field in VOLATILE_FIELDS:
+        if field in fields or field.startswith("unit_") or cached.get(field, "N/A") == "N/A":
+            continue
+        if details:
+            return None
+    return {**item, **cached, **fields, "is_ok": 1, "error": None}
+
+
+async def scrape_listing(context, page, run, spec, is_login_page, visit, payload, engine="hybrid",
+                         headers=None, collect=True):
+    """
+    Mode listing : parcourt les pages de liste ("listings" du payload, et
+    catégories où les produits demandés ont déjà été vus) et construit en une
+    passe les lignes des produits dont la vignette suffit. Les autres
+    produits passent par visit(items, on_result), le scraping habituel des
+    pages produit. Les produits des catégories explicites absents du payload
+    sont ajoutés au run.
+    Avec "details": false dans le payload, aucune page produit n'est visitée.
+    Renvoie une liste alignée sur run.to_scrape.
+    """
+    supplier = run.supplier
+    roots = listing_pages(payload)
+    details = payload.get("details", True)
+    index = get_listing_index()
+    keys = [product_key(item["url"]) for item in run.to_scrape]
+    wanted = {}
+    for key, root in index.lookup(supplier, keys).items():
+        if root not in roots:
+            wanted.setdefault(root, set()).add(key)
+
+    if engine != "browser":
+        async with HttpFetcher(headers=headers) as fetcher:
+            await fetcher.sync_cookies(context)
+            tiles = await harvest(ListingLoader(supplier, is_login_page, fetcher=fetcher), spec, [*roots, *wanted], wanted)
+    else:
+        tiles = await harvest(ListingLoader(supplier, is_login_page, page=page), spec, [*roots, *wanted], wanted)
+    index.record(supplier, {key: root for key, (root, _) in tiles.items()})
+
+    known = set(keys)
+    discovered = [
+        {"url": tile["url"]}
+        for key, (root, tile) in tiles.items() if key not in known and root in roots
+    ]
+    if discovered:
+        run.extend(discovered)
+        keys += [product_key(item["url"]) for item in discovered]
+
+    results = [None] * len(run.to_scrape)
+    for i, item in enumerate(run.to_scrape):
+        if keys[i] not in tiles:
+            continue
+        row = listing_row(run.cache, supplier, run.account, item, tiles[keys[i]][1], details)
+        if row is None:
+            continue
+        LISTING_PRODUCTS.inc(supplier=supplier, source="listing")
+        run.on_listing_result(i, row)
+        results[i] = row if collect else True
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing and not details:
+        for i in missing:
+            row = {**run.to_scrape[i], "is_ok": 0, "error": "not found in listing pages"}
+            run.on_result(i, row)
+            results[i] = row if collect else True
+    elif missing:
+        LISTING_PRODUCTS.inc(len(missing), supplier=supplier, source="visit")
+        fallback = await visit([run.to_scrape[i] for i in missing], lambda i, row: run.on_result(missing[i], row))
+        for i, result in zip(missing, fallback or []):
+            results[i] = result
+    return results
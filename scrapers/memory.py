@@ -0,0 +1,252 @@
+import asyncio
+import os
+import time
+
+from scrapers.metrics import Counter, Gauge
+
+MEMORY_LIMIT_MB = float(os.getenv("MEMORY_LIMIT_MB", "0"))
+MEMORY_CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "2"))
+MEMORY_RECYCLE_RATIO = float(os.getenv("MEMORY_RECYCLE_RATIO", "0.7"))
+MEMORY_SHED_RATIO = float(os.getenv("MEMORY_SHED_RATIO", "0.85"))
+MEMORY_RESTART_RATIO = float(os.getenv("MEMORY_RESTART_RATIO", "0.92"))
+
+LEVELS = ("ok", "recycle", "shed", "restart")
+
+MEMORY_BYTES = Gauge(
+    "scraper_memory_bytes", "Mémoire résidente (Python, navigateurs) et utilisation du conteneur",
+    labels=("process",),
+)
+MEMORY_PEAK_BYTES = Gauge(
+    "scraper_memory_peak_bytes", "Plus haut niveau de mémoire observé depuis le démarrage",
+    labels=("process",),
+)
+RECYCLES = Counter(
+    "scraper_recycles_total", "Pages et contextes recyclés (nombre de navigations ou mémoire)",
+    labels=("supplier", "kind", "reason"),
+)
+MEMORY_ACTIONS = Counter(
+    "scraper_memory_actions_total", "Actions du watchdog mémoire (shed, browser_restart, worker_restart)",
+    labels=("action",),
+)
+
+
+def processes():
+    """
+    (pid, ppid, nom) de tous les processus, lus dans /proc.
+    """
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        found.append((int(entry), ppid, name))
+    return found
+
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def is_browser_process(name):
+    name = name.lower()
+    return "chrom" in name or "headless" in name
+
+
+def process_tree_memory(root=None):
+    """
+    Mémoire résidente (ko) du processus et de ses descendants :
+    {"python_kb", "browser_kb", "browser_processes"}.
+    """
+    root = root or os.getpid()
+    children = {}
+    for pid, ppid, name in processes():
+        children.setdefault(ppid, []).append((pid, name))
+    python_kb = rss_kb(root)
+    browser_kb = 0
+    browser_processes = 0
+    stack = [root]
+    while stack:
+        for pid, name in children.get(stack.pop(), []):
+            if is_browser_process(name):
+                browser_kb += rss_kb(pid)
+                browser_processes += 1
+            else:
+                python_kb += rss_kb(pid)
+            stack.append(pid)
+    return {"python_kb": python_kb, "browser_kb": browser_kb, "browser_processes": browser_processes}
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def container_memory():
+    """
+    (utilisation, limite) du cgroup en octets, ou (None, None) hors conteneur.
+    L'utilisation exclut le cache de fichiers inactif, comme le calcul de l'OOM killer.
+    """
+    for current, limit, stat, inactive in (
+        ("memory.current", "memory.max", "memory.stat", "inactive_file"),
+        ("memory/memory.usage_in_bytes", "memory/memory.limit_in_bytes", "memory/memory.stat", "total_inactive_file"),
+    ):
+        usage = _read_int(f"/sys/fs/cgroup/{current}")
+        if usage is None:
+            continue
+        try:
+            with open(f"/sys/fs/cgroup/{stat}") as f:
+                for line in f:
+                    key, _, value = line.partition(" ")
+                    if key == inactive:
+                        usage -= int(value)
+                        break
+        except OSError:
+            pass
+        bound = _read_int(f"/sys/fs/cgroup/{limit}")
+        # Sans limite, cgroup v1 renvoie une valeur proche de 2**63
+        return usage, bound if bound and bound < 2 ** 60 else None
+    return None, None
+
+
+class MemoryWatchdog:
+    """
+    Échantillonne la mémoire (Python, Chromium, conteneur) et en déduit un
+    niveau par rapport à la limite : "recycle" (les runs recyclent leur
+    contexte), "shed" (les nouveaux scrapings sont refusés), "restart" (les
+    navigateurs inactifs ou le worker sont relancés).
+
+    Sans limite (MEMORY_LIMIT_MB ou cgroup), le watchdog ne fait que mesurer.
+    Avec scope="process", seule la mémoire du processus et de ses descendants
+    compte (workers : limite partagée entre processus).
+    """
+
+    def __init__(self, limit_mb=MEMORY_LIMIT_MB, interval=MEMORY_CHECK_INTERVAL, scope="container",
+                 recycle_ratio=MEMORY_RECYCLE_RATIO, shed_ratio=MEMORY_SHED_RATIO,
+                 restart_ratio=MEMORY_RESTART_RATIO):
+        self.limit_mb = limit_mb
+        self.interval = interval
+        self.scope = scope
+        self.ratios = (recycle_ratio, shed_ratio, restart_ratio)
+        self.level = "ok"
+        self.usage = {}
+        self.peaks = {}
+        self.sampled_at = None
+        self.shed = 0
+        self.recycles = {}
+        self._task = None
+
+    def limit_bytes(self):
+        if self.limit_mb > 0:
+            return int(self.limit_mb * 1024 * 1024)
+        if self.scope == "container":
+            return container_memory()[1]
+        return None
+
+    def share(self, processes):
+        """
+        Passe en limite par processus : la limite globale est partagée entre
+        `processes` processus (workers), chacun ne mesurant que sa mémoire.
+        """
+        limit = self.limit_bytes()
+        self.scope = "process"
+        self.limit_mb = limit / max(1, processes) / 1024 / 1024 if limit else 0
+
+    def sample(self):
+        tree = process_tree_memory()
+        usage = {"python": tree["python_kb"] * 1024, "browser": tree["browser_kb"] * 1024}
+        used = usage["python"] + usage["browser"]
+        if self.scope == "container":
+            container, _ = container_memory()
+            if container is not None:
+                usage["container"] = container
+                used = container
+        limit = self.limit_bytes()
+        level = "ok"
+        if limit:
+            for name, ratio in zip(LEVELS[1:], self.ratios):
+                if used >= limit * ratio:
+                    level = name
+        self.level = level
+        self.usage = {**usage, "browser_processes": tree["browser_processes"], "used": used, "limit": limit}
+        self.sampled_at = time.time()
+        for process, value in usage.items():
+            MEMORY_BYTES.set(value, process=process)
+            if value > self.peaks.get(process, 0):
+                self.peaks[process] = value
+                MEMORY_PEAK_BYTES.set(value, process=process)
+        return level
+
+    def at_least(self, level):
+        return LEVELS.index(self.level) >= LEVELS.index(level)
+
+    def admit(self):
+        """
+        Indique si un nouveau scraping peut démarrer ; compte les refus.
+        """
+        if self.at_least("shed"):
+            self.shed += 1
+            self.record_action("shed")
+            return False
+        return True
+
+    def record_recycle(self, supplier, kind, reason):
+        key = f"{kind}:{reason}"
+        self.recycles[key] = self.recycles.get(key, 0) + 1
+        RECYCLES.inc(supplier=supplier, kind=kind, reason=reason)
+
+    def record_action(self, action):
+        MEMORY_ACTIONS.inc(action=action)
+
+    async def _loop(self):
+        while True:
+            try:
+                self.sample()
+            except Exception:
+                pass
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "scope": self.scope,
+            "sampled_at": self.sampled_at,
+            "usage_mb": {
+                key: round(value / 1024 / 1024, 1)
+                for key, value in self.usage.items() if key not in ("browser_processes", "limit") and value is not None
+            },
+            "limit_mb": round(self.usage["limit"] / 1024 / 1024, 1) if self.usage.get("limit") else None,
+            "browser_processes": self.usage.get("browser_processes"),
+            "peak_mb": {key: round(value / 1024 / 1024, 1) for key, value in self.peaks.items()},
+            "shed": self.shed,
+            "recycles": dict(self.recycles),
+        }
+
+
+memory_watchdog = MemoryWatchdog()
@@ -0,0 +1,256 @@
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _series(snapshot, name):
+    """
+    Séries (clé de labels, valeur) d'une métrique dans l'instantané d'un autre processus.
+    """
+    return [(tuple(key), value) for key, value in snapshot.get(name, {}).get("series", ())]
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, value=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        self._values[key] = self._values.get(key, 0) + value
+
+    def snapshot(self):
+        return {"type": "counter", "series": [[list(key), value] for key, value in self._values.items()]}
+
+    def render(self, snapshots=None):
+        """
+        Les valeurs des instantanés {worker: instantané} sont additionnées à celles du processus.
+        """
+        values = dict(self._values)
+        for snapshot in (snapshots or {}).values():
+            for key, value in _series(snapshot, self.name):
+                values[key] = values.get(key, 0) + value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def set(self, value, **labels):
+        self._values[tuple(labels.get(name, "") for name in self.labels)] = value
+
+    def snapshot(self):
+        return {"type": "gauge", "series": [[list(key), value] for key, value in self._values.items()]}
+
+    def render(self, snapshots=None):
+        """
+        Les valeurs des instantanés {worker: instantané} sont rendues avec un label `worker`.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        for worker, snapshot in sorted((snapshots or {}).items()):
+            for key, value in sorted(_series(snapshot, self.name)):
+                lines.append(f"{self.name}{_labels(self.labels, key, [('worker', worker)])} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["buckets"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def snapshot(self):
+        return {"type": "histogram", "series": [[list(key), series] for key, series in self._series.items()]}
+
+    def render(self, snapshots=None):
+        """
+        Les séries des instantanés {worker: instantané} sont additionnées à celles du processus.
+        """
+        merged = {key: {**series, "buckets": list(series["buckets"])} for key, series in self._series.items()}
+        for snapshot in (snapshots or {}).values():
+            for key, other in _series(snapshot, self.name):
+                series = merged.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                series["buckets"] = [a + b for a, b in zip(series["buckets"], other["buckets"])]
+                series["sum"] += other["sum"]
+                series["count"] += other["count"]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(merged.items()):
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+PHASE_SECONDS = Histogram(
+    "scraper_phase_seconds",
+    "Durée des phases de scraping (launch, login, goto, consent, extract, cleaning, serialization)",
+    labels=("supplier", "phase"),
+)
+SELECTOR_SECONDS = Histogram(
+    "scraper_selector_wait_seconds",
+    "Attente des sélecteurs avant extraction, par champ",
+    labels=("supplier", "field"),
+)
+FIELD_ERRORS = Counter(
+    "scraper_field_errors_total",
+    "Erreurs de champ des produits scrapés (missing price, technical_ref error...)",
+    labels=("supplier", "error"),
+)
+
+
+def render_metrics(snapshots=None):
+    """
+    Toutes les métriques au format texte Prometheus, fusionnées avec les
+    instantanés {worker: instantané} des processus workers.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(snapshots))
+    return "\n".join(lines) + "\n"
+
+
+def snapshot_metrics():
+    """
+    Valeurs de toutes les métriques du processus, sérialisables en JSON.
+    """
+    return {metric.name: metric.snapshot() for metric in _registry}
+
+
+def dump_metrics(path):
+    """
+    Écrit l'instantané des métriques dans `path` (remplacement atomique).
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot_metrics(), f)
+    os.replace(tmp, path)
+
+
+class RequestTimings:
+    """
+    Détail des temps d'une requête, par phase (durée cumulée et nombre d'appels).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, phase, seconds):
+        count, total = self.phases.get(phase, (0, 0.0))
+        self.phases[phase] = (count + 1, total + seconds)
+
+    def to_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "phases": {
+                phase: {"count": count, "total_ms": round(total * 1000, 1)}
+                for phase, (count, total) in self.phases.items()
+            },
+        }
+
+    def server_timing(self):
+        """
+        Valeur de l'en-tête Server-Timing (durée cumulée par phase, nombre d'appels en description).
+        """
+        entries = [f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}"]
+        entries.extend(
+            f'{phase.replace(":", "-")};dur={total * 1000:.1f};desc="{count}"'
+            for phase, (count, total) in self.phases.items()
+        )
+        return ", ".join(entries)
+
+
+def start_request_timings(payload):
+    """
+    Active le détail des temps pour la requête courante si le payload contient "debug".
+    """
+    if not payload.get("debug"):
+        return None
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def current_timings():
+    return _request_timings.get()
+
+
+def observe(phase, supplier, seconds):
+    PHASE_SECONDS.observe(seconds, supplier=supplier, phase=phase)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+def observe_selector(supplier, field, seconds):
+    SELECTOR_SECONDS.observe(seconds, supplier=supplier, field=field)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(f"wait:{field}", seconds)
+
+
+@contextmanager
+def timed(phase, supplier=""):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(phase, supplier, time.perf_counter() - start)
+
+
+def record_field_errors(supplier, error):
+    """
+    Compte les erreurs d'un produit (champ "error", séparées par "; "),
+    réduites à leur libellé : "technical_ref error: ..." devient "technical_ref error".
+    """
+    if not error:
+        return
+    for message in error.split("; "):
+        FIELD_ERRORS.inc(supplier=supplier, error=message.split(":", 1)[0])
@@ -0,0 +1,83 @@
+import json
+
+from scrapers.cleaning import COLUMNS_ORDER, _json_default
+
+# Colonnes ajoutées par la détection des changements ("changes_only")
+TRACKING_COLUMNS = ("change_type", "changes")
+
+
+class Record:
+    """
+    Ligne de résultat au schéma fixe (COLUMNS_ORDER et colonnes de suivi) :
+    attributs en __slots__, sans dictionnaire par instance.
+    """
+
+    __slots__ = (*COLUMNS_ORDER, *TRACKING_COLUMNS)
+
+    def __init__(self, row):
+        for column in self.__slots__:
+            setattr(self, column, row.get(column))
+
+    def get(self, column, default=None):
+        return getattr(self, column, default)
+
+    def __getitem__(self, column):
+        return getattr(self, column)
+
+    def to_dict(self, columns=COLUMNS_ORDER):
+        return {column: getattr(self, column) for column in columns}
+
+
+class RecordSet:
+    """
+    Résultats nettoyés d'un scraping, dans l'ordre du payload : remplace le
+    DataFrame renvoyé par scrape_*. `columns` sont les colonnes exportées,
+    `attrs` les métadonnées du run (resource_stats). pandas n'est importé
+    que par to_frame(), pour les exports tabulaires.
+    """
+
+    def __init__(self, records=(), columns=COLUMNS_ORDER, attrs=None):
+        self.records = list(records)
+        self.columns = tuple(columns)
+        self.attrs = dict(attrs or {})
+
+    @classmethod
+    def from_rows(cls, rows, clean_record=None, created_at=None):
+        """
+        Construit les Records depuis des lignes brutes, nettoyées une à une
+        par clean_record(row, created_at) si fourni.
+        """
+        if clean_record is None:
+            return cls(Record(row) for row in rows)
+        return cls(Record(clean_record(row, created_at)) for row in rows)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __repr__(self):
+        lines = [json.dumps(row, ensure_ascii=False, default=_json_default) for row in self.rows()]
+        return "\n".join([f"RecordSet({len(self)} rows)", *lines])
+
+    def rows(self):
+        return [record.to_dict(self.columns) for record in self.records]
+
+    def to_json(self):
+        """
+        Octets JSON des lignes, created_at en millisecondes depuis l'epoch
+        (comme record_json pour le streaming).
+        """
+        return json.dumps(self.rows(), ensure_ascii=False, default=_json_default).encode("utf-8")
+
+    def to_frame(self):
+        import pandas as pd
+
+        frame = pd.DataFrame(self.rows(), columns=list(self.columns))
+        frame.attrs.update(self.attrs)
+        return frame
+
@@ -0,0 +1,93 @@
+"""
+Rejoue l'extraction et le nettoyage (extract_product_*, clean_output_*) sur
+les pages capturées (CAPTURE_HTML / "capture" dans le payload), sans réseau
+ni connexion, réparti sur les cœurs du processeur.
+
+    python -m scrapers.replay eklor --processes 8 --output eklor.json
+"""
+import argparse
+import importlib
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from scrapers.capture import CAPTURE_DIR, CaptureStore, load_blob
+from scrapers.records import RecordSet
+
+REPLAY_CHUNK_SIZE = int(os.getenv("REPLAY_CHUNK_SIZE", "200"))
+
+REPLAYERS = {
+    "eklor": ("scrapers.scraper_eklor", "extract_product_eklor", "clean_output_eklor"),
+    "powr_connect": ("scrapers.scraper_powr_connect", "extract_product_powr_connect", "clean_output_powr_connect"),
+    "voltaneo": ("scrapers.scraper_voltaneo", "extract_product_voltaneo", "clean_output_voltaneo"),
+}
+
+
+def _replay_chunk(module_name, extract_name, directory, captures):
+    """
+    Extrait un lot de pages capturées (exécuté dans un processus du pool).
+    """
+    extract = getattr(importlib.import_module(module_name), extract_name)
+    rows = []
+    for digest, item, _ in captures:
+        try:
+            rows.append(extract(load_blob(directory, digest), item))
+        except Exception as e:
+            rows.append({**item, "is_ok": 0, "error": f"replay failed: {e}"})
+    return rows
+
+
+def replay(supplier, directory=CAPTURE_DIR, processes=None, until=None, urls=None):
+    """
+    RecordSet nettoyé de la dernière capture de chaque URL du fournisseur,
+    comme l'aurait renvoyé scrape_*. created_at est la date de capture.
+    """
+    supplier = supplier.replace("-", "_")
+    module_name, extract_name, clean_name = REPLAYERS[supplier]
+    captures = CaptureStore(directory).latest(supplier, until, urls)
+    if not captures:
+        return RecordSet()
+
+    processes = max(1, processes or os.cpu_count() or 1)
+    size = max(1, min(REPLAY_CHUNK_SIZE, math.ceil(len(captures) / (processes * 4))))
+    chunks = [captures[i:i + size] for i in range(0, len(captures), size)]
+    rows = []
+    if processes == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            rows.extend(_replay_chunk(module_name, extract_name, directory, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(chunks))) as executor:
+            for chunk_rows in executor.map(
+                _replay_chunk, repeat(module_name), repeat(extract_name), repeat(directory), chunks
+            ):
+                rows.extend(chunk_rows)
+
+    clean_output = getattr(importlib.import_module(module_name), clean_name)
+    output = clean_output(rows)
+    for record, (_, _, captured_at) in zip(output, captures):
+        record.created_at = datetime.fromtimestamp(captured_at)
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("supplier", choices=[*REPLAYERS, "powr-connect"])
+    parser.add_argument("--dir", default=CAPTURE_DIR, help="répertoire des captures")
+    parser.add_argument("--processes", type=int, help="processus d'extraction (nombre de cœurs par défaut)")
+    parser.add_argument("--until", type=float, help="ignorer les captures postérieures (timestamp Unix)")
+    parser.add_argument("--output", help="fichier JSON des résultats (sortie standard par défaut)")
+    args = parser.parse_args(argv)
+
+    output = replay(args.supplier, args.dir, args.processes, args.until)
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(output.to_json())
+    else:
+        sys.stdout.buffer.write(output.to_json() + b"\n")
+
+
+if __name__ == "__main__":
+    main()
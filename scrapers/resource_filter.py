@@ -0,0 +1,164 @@
+import os
+import weakref
+from urllib.parse import urlsplit
+
+LEAN_LOADING = os.getenv("LEAN_LOADING", "1") == "1"
+
+# Ordres de grandeur utilisés pour estimer les octets évités par type de ressource
+ESTIMATED_RESOURCE_BYTES = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googleadservices.com",
+    "facebook.net",
+    "facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "tiktok.com",
+    "linkedin.com",
+    "licdn.com",
+    "bing.com",
+)
+
+_policies = weakref.WeakKeyDictionary()
+_stats = weakref.WeakKeyDictionary()
+_consent_handled = weakref.WeakSet()
+
+
+class ResourcePolicy:
+    """
+    Politique de chargement d'un fournisseur : types de ressources et domaines
+    bloqués, avec une liste de domaines toujours autorisés.
+    """
+
+    def __init__(self, block_types=("image", "media", "font"), block_domains=TRACKER_DOMAINS,
+                 block_url_patterns=(), allow_domains=(), consent_domains=(), consent_url_patterns=()):
+        self.block_types = frozenset(block_types)
+        self.block_domains = tuple(block_domains) + tuple(consent_domains)
+        self.block_url_patterns = tuple(block_url_patterns) + tuple(consent_url_patterns)
+        self.allow_domains = tuple(allow_domains)
+        self.blocks_consent = bool(consent_domains or consent_url_patterns)
+
+    def should_block(self, url, resource_type):
+        host = urlsplit(url).hostname or ""
+        if _matches_domain(host, self.allow_domains):
+            return False
+        if resource_type in self.block_types:
+            return True
+        if _matches_domain(host, self.block_domains):
+            return True
+        return any(pattern in url for pattern in self.block_url_patterns)
+
+
+def _matches_domain(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class ResourceStats:
+    """
+    Compteurs de requêtes bloquées / chargées pendant un run.
+    """
+
+    def __init__(self):
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.estimated_bytes_saved = 0
+        self.allowed_requests = 0
+        self.allowed_bytes = 0
+
+    def record_blocked(self, resource_type):
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+        self.estimated_bytes_saved += ESTIMATED_RESOURCE_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+
+    def record_response(self, response):
+        self.allowed_requests += 1
+        try:
+            self.allowed_bytes += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    def to_dict(self):
+        return {
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+            "allowed_requests": self.allowed_requests,
+            "allowed_bytes": self.allowed_bytes,
+        }
+
+
+async def apply_resource_policy(context, policy, stats=None):
+    """
+    Installe l'interception des requêtes sur le contexte et renvoie les compteurs
+    (`stats` pour poursuivre des compteurs existants).
+    """
+    stats = stats or ResourceStats()
+
+    async def handle(route):
+        request = route.request
+        if policy.should_block(request.url, request.resource_type):
+            stats.record_blocked(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    context.on("response", stats.record_response)
+    _policies[context] = policy
+    _stats[context] = stats
+    return stats
+
+
+async def copy_context_state(source, target):
+    """
+    Reporte sur `target` la politique de chargement (mêmes compteurs) et le
+    consentement déjà traité de `source`, quand un contexte est recyclé.
+    """
+    policy = _policies.get(source)
+    if policy is not None:
+        await apply_resource_policy(target, policy, _stats.get(source))
+    if source in _consent_handled:
+        _consent_handled.add(target)
+
+
+def lean_loading_enabled(payload):
+    return bool(payload.get("lean", LEAN_LOADING))
+
+
+def consent_blocked(page):
+    """
+    Indique si la bannière de consentement est bloquée dans le contexte de la page,
+    auquel cas il est inutile de l'attendre.
+    """
+    policy = _policies.get(page.context)
+    return bool(policy and policy.blocks_consent)
+
+
+def consent_handled(page):
+    """
+    Indique si la bannière de consentement est bloquée ou a déjà été traitée
+    dans le contexte de la page : le cookie de consentement vaut pour tout le
+    contexte, inutile de l'attendre à chaque produit.
+    """
+    return consent_blocked(page) or page.context in _consent_handled
+
+
+def mark_consent_handled(page):
+    _consent_handled.add(page.context)
+
+
+def reset_consent(context):
+    """
+    À appeler après un effacement des cookies du contexte.
+    """
+    _consent_handled.discard(context)
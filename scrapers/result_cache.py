@@ -0,0 +1,266 @@
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+from scrapers.session_cache import account_key
+from scrapers.singleflight import COALESCED, rebase
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_PRICE_TTL = float(os.getenv("RESULT_CACHE_PRICE_TTL", "3600"))
+RESULT_CACHE_STATIC_TTL = float(os.getenv("RESULT_CACHE_STATIC_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "results.sqlite3")
+
+# Champs qui changent souvent (prix, conditionnements, stock) ; les autres
+# champs scrapés (nom, description, caractéristiques) sont considérés statiques.
+VOLATILE_FIELDS = (
+    "price_per_unit", "unit_1", "price_per_unit_1", "unit_2", "price_per_unit_2",
+    "unit_3", "price_per_unit_3", "stock",
+)
+SCRAPED_FIELDS = VOLATILE_FIELDS + ("name", "description", "technical_ref")
+
+
+class MemoryResultBackend:
+    """
+    Cache LRU en mémoire du processus.
+    """
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class SQLiteResultBackend:
+    """
+    Cache persistant dans SQLite, partagé entre processus.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(results)")]
+        if columns and "account" not in columns:
+            # Ancien cache indexé sans empreinte du mot de passe : ses entrées ne sont pas réattribuables
+            self._db.execute("DROP TABLE results")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                supplier TEXT, account TEXT, url TEXT, entry TEXT,
+                PRIMARY KEY (supplier, account, url)
+            )
+        """)
+        self._db.commit()
+
+    def get(self, key):
+        row = self._db.execute(
+            "SELECT entry FROM results WHERE supplier = ? AND account = ? AND url = ?", key
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (supplier, account, url, entry) VALUES (?, ?, ?, ?)",
+            (*key, json.dumps(entry))
+        )
+        self._db.commit()
+
+
+class ResultCache:
+    """
+    Résultats scrapés par (fournisseur, compte, URL), sans les métadonnées du
+    payload : les prix et le stock affichés dépendent du compte connecté.
+
+    Les champs volatils et statiques ont chacun leur date de collecte et leur
+    TTL ; une entrée n'est servie que si les deux sont encore valides.
+    """
+
+    def __init__(self, backend, price_ttl=RESULT_CACHE_PRICE_TTL, static_ttl=RESULT_CACHE_STATIC_TTL):
+        self.backend = backend
+        self.price_ttl = price_ttl
+        self.static_ttl = static_ttl
+
+    def get(self, supplier, account, url, max_age):
+        """
+        Renvoie (champs, âge en secondes) si l'entrée a moins de max_age secondes.
+        """
+        entry = self.backend.get((supplier, account, url))
+        if entry is None:
+            return None
+        now = time.time()
+        price_age = now - entry["price_at"]
+        if price_age > min(max_age, self.price_ttl) or now - entry["static_at"] > self.static_ttl:
+            return None
+        return entry["fields"], price_age
+
+    def validators(self, supplier, account, url):
+        """
+        ETag / Last-Modified de l'entrée, même périmée, pour une requête conditionnelle.
+        """
+        entry = self.backend.get((supplier, account, url))
+        return entry.get("validators") if entry else None
+
+    def put(self, supplier, account, url, row, validators=None):
+        now = time.time()
+        self.backend.set((supplier, account, url), {
+            "fields": {field: row[field] for field in SCRAPED_FIELDS if field in row},
+            "price_at": now,
+            "static_at": now,
+            "validators": validators or None,
+        })
+
+    def static_fields(self, supplier, account, url):
+        """
+        Champs de l'entrée si ses champs statiques sont encore valides, quel que
+        soit l'âge des prix (mode listing, qui relit les prix sur les pages de liste).
+        """
+        entry = self.backend.get((supplier, account, url))
+        if entry is None or time.time() - entry["static_at"] > self.static_ttl:
+            return None
+        return entry["fields"]
+
+    def refresh(self, supplier, account, url, row):
+        """
+        Met à jour les champs volatils de l'entrée sans changer la date de ses
+        champs statiques.
+        """
+        entry = self.backend.get((supplier, account, url))
+        if entry is None:
+            return
+        entry["fields"].update({field: row[field] for field in VOLATILE_FIELDS if field in row})
+        entry["price_at"] = time.time()
+        self.backend.set((supplier, account, url), entry)
+
+    def touch(self, supplier, account, url):
+        """
+        Marque l'entrée comme fraîche (réponse 304) et renvoie ses champs.
+        """
+        entry = self.backend.get((supplier, account, url))
+        if entry is None:
+            return None
+        entry["price_at"] = entry["static_at"] = time.time()
+        self.backend.set((supplier, account, url), entry)
+        return entry["fields"]
+
+
+def create_result_cache(kind=RESULT_CACHE_BACKEND):
+    backend = SQLiteResultBackend() if kind == "sqlite" else MemoryResultBackend()
+    return ResultCache(backend)
+
+
+result_cache = create_result_cache()
+
+
+class CachedRun:
+    """
+    Sépare les produits d'un payload entre ceux servis depuis le cache du
+    compte du payload (si "max_cache_age" est fourni) et ceux à scraper, puis alimente le cache
+    avec les résultats frais. Chaque ligne indique from_cache et cache_age.
+
+    Une URL présente plusieurs fois dans le payload n'est scrapée qu'une fois ;
+    le résultat est recopié sur chaque ligne avec ses propres métadonnées.
+    """
+
+    def __init__(self, cache, supplier, payload, on_result=None):
+        self.cache = cache
+        self.supplier = supplier
+        self.account = account_key(payload.get("credentials"))
+        self.data = payload["data"]
+        self.forward = on_result
+        self.results = [None] * len(self.data)
+        self.missing = []
+        self.duplicates = {}
+        self._validators = {}
+        max_age = payload.get("max_cache_age")
+        first = {}
+
+        for index, item in enumerate(self.data):
+            hit = cache.get(supplier, self.account, item["url"], float(max_age)) if max_age is not None else None
+            if hit is None:
+                if item["url"] in first:
+                    self.duplicates.setdefault(first[item["url"]], []).append(index)
+                    COALESCED.inc(supplier=supplier, scope="payload")
+                else:
+                    first[item["url"]] = index
+                    self.missing.append(index)
+                continue
+            fields, age = hit
+            row = {**item, **fields, "is_ok": 1, "error": None, "from_cache": 1, "cache_age": round(age)}
+            self.results[index] = row
+            if on_result:
+                on_result(index, row)
+
+        self.to_scrape = [self.data[i] for i in self.missing]
+
+    def on_result(self, index, row):
+        """
+        Callback des résultats scrapés (index relatif à to_scrape).
+        """
+        if "from_cache" not in row:
+            row["from_cache"] = 0
+            row["cache_age"] = 0
+            if row.get("is_ok") == 1:
+                self.cache.put(self.supplier, self.account, row["url"], row, self._validators.pop(row["url"], None))
+        if self.forward:
+            leader = self.missing[index]
+            self.forward(leader, row)
+            for duplicate in self.duplicates.get(leader, ()):
+                self.forward(duplicate, rebase(row, self.data[leader], self.data[duplicate]))
+
+    def on_listing_result(self, index, row):
+        """
+        Callback des lignes construites depuis une page de liste : seuls les
+        champs volatils de l'entrée en cache sont rafraîchis.
+        """
+        row["from_cache"] = 0
+        row["cache_age"] = 0
+        self.cache.refresh(self.supplier, self.account, row["url"], row)
+        self.on_result(index, row)
+
+    def extend(self, items):
+        """
+        Ajoute au run des produits à scraper découverts en cours de route (mode listing).
+        """
+        start = len(self.data)
+        self.data = [*self.data, *items]
+        self.results.extend([None] * len(items))
+        self.missing.extend(range(start, start + len(items)))
+        self.to_scrape.extend(items)
+
+    def validators(self, url):
+        return self.cache.validators(self.supplier, self.account, url)
+
+    def remember_validators(self, url, validators):
+        if validators:
+            self._validators[url] = validators
+
+    def not_modified(self, item):
+        """
+        Ligne reconstruite depuis le cache après une réponse 304.
+        """
+        fields = self.cache.touch(self.supplier, self.account, item["url"])
+        if fields is None:
+            return None
+        return {**item, **fields, "is_ok": 1, "error": None, "from_cache": 1, "cache_age": 0}
+
+    def merge(self, live_results):
+        """
+        Replace les résultats scrapés à leur rang dans le payload, doublons compris.
+        """
+        for index, row in zip(self.missing, live_results or []):
+            self.results[index] = row
+            for duplicate in self.duplicates.get(index, ()):
+                self.results[duplicate] = None if row is None else rebase(row, self.data[index], self.data[duplicate])
+        return self.results
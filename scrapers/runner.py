@@ -0,0 +1,166 @@
+import asyncio
+import os
+from collections import deque
+from scrapers.browser_pool import replace_context
+from scrapers.memory import memory_watchdog
+from scrapers.session_cache import SessionExpired
+from scrapers.scheduler import fair_scheduler
+from scrapers.singleflight import coalesce, product_flights
+
+MAX_CONCURRENCY = 16
+PAGE_RECYCLE_NAVIGATIONS = int(os.getenv("PAGE_RECYCLE_NAVIGATIONS", "100"))
+CONTEXT_RECYCLE_NAVIGATIONS = int(os.getenv("CONTEXT_RECYCLE_NAVIGATIONS", "500"))
+MEMORY_RECYCLE_MIN_NAVIGATIONS = int(os.getenv("MEMORY_RECYCLE_MIN_NAVIGATIONS", "20"))
+
+
+def resolve_concurrency(payload, default):
+    """
+    Nombre de pages en parallèle : valeur du payload, sinon celle du fournisseur.
+    """
+    value = payload.get("concurrency") or default
+    return max(1, min(int(value), MAX_CONCURRENCY))
+
+
+class Recycler:
+    """
+    Recyclage des pages et du contexte d'un run : une page est remplacée après
+    page_navigations produits, le contexte après context_navigations produits
+    ou dès que le watchdog mémoire dépasse le seuil "recycle". Le nouveau
+    contexte reprend l'état connecté de l'ancien, sans nouvelle connexion.
+    """
+
+    def __init__(self, supplier, page_navigations=PAGE_RECYCLE_NAVIGATIONS,
+                 context_navigations=CONTEXT_RECYCLE_NAVIGATIONS,
+                 memory_min_navigations=MEMORY_RECYCLE_MIN_NAVIGATIONS, watchdog=memory_watchdog):
+        self.supplier = supplier
+        self.page_navigations = page_navigations
+        self.context_navigations = context_navigations
+        self.memory_min_navigations = memory_min_navigations
+        self.watchdog = watchdog
+        self.context_count = 0
+        self.context_recyclable = True
+
+    def page_due(self, navigations):
+        return 0 < self.page_navigations <= navigations
+
+    def context_reason(self):
+        if not self.context_recyclable:
+            return None
+        if 0 < self.context_navigations <= self.context_count:
+            return "navigations"
+        if self.watchdog.at_least("recycle") and self.context_count >= self.memory_min_navigations:
+            return "memory"
+        return None
+
+    def navigated(self):
+        self.context_count += 1
+
+    async def recycle_page(self, context, page):
+        try:
+            await page.close()
+        except Exception:
+            pass
+        self.watchdog.record_recycle(self.supplier, "page", "navigations")
+        return await context.new_page()
+
+    async def recycle_context(self, context):
+        """
+        Renvoie le contexte remplaçant, ou `context` si le recyclage échoue
+        (il n'est alors plus tenté pendant ce run).
+        """
+        reason = self.context_reason()
+        try:
+            replacement = await replace_context(context)
+        except Exception:
+            self.context_recyclable = False
+            return context
+        self.context_count = 0
+        self.watchdog.record_recycle(self.supplier, "context", reason)
+        return replacement
+
+
+async def scrape_one(context, page, session, scrape_product, item, capture=None):
+    """
+    Scrape un produit en isolant ses erreurs ; se reconnecte une fois si la
+    session a expiré. Avec une `capture` (HtmlCapture), le HTML de la page
+    produit est enregistré pour être rejoué.
+
+    Si la même URL est déjà en cours de visite chez ce fournisseur pour le
+    même compte (autre run du processus), le résultat de cette visite est partagé. Sinon la visite
+    attend sa place auprès de l'ordonnanceur des tenants.
+    """
+    async def scheduled_visit():
+        async with fair_scheduler.slot():
+            return await visit()
+
+    async def visit():
+        try:
+            generation = session.generation
+            try:
+                result = await scrape_product(page, item)
+            except SessionExpired:
+                await session.renew(context, page, generation)
+                result = await scrape_product(page, item)
+        except Exception as e:
+            return {**item, "error": str(e), "status": "failed"}
+        if capture and not str(result.get("error") or "").startswith("page.goto failed"):
+            await capture.save_page(page, item)
+        return result
+
+    try:
+        return await coalesce(
+            product_flights, "browser", session.supplier, session.account, item, scheduled_visit
+        )
+    except Exception as e:
+        return {**item, "error": str(e), "status": "failed"}
+
+
+async def scrape_items(context, page, session, scrape_product, data, concurrency=1, on_result=None,
+                       collect=True, capture=None):
+    """
+    Scrape les produits sur `concurrency` pages du même contexte connecté.
+    Les résultats sont renvoyés dans l'ordre des entrées ; on_result(index, résultat)
+    est appelé dès qu'un produit est terminé. Avec collect=False, les résultats
+    ne sont transmis qu'à on_result et ne sont pas conservés.
+
+    Les pages et le contexte sont recyclés en cours de run (voir Recycler) :
+    le contexte n'est remplacé qu'une fois tous les workers arrêtés.
+    """
+    results = [None] * len(data)
+    pending = deque(range(len(data)))
+    recycler = Recycler(session.supplier)
+    pages = [page, *[await context.new_page() for _ in range(min(concurrency, len(data)) - 1)]]
+    navigations = [0] * len(pages)
+
+    async def worker(slot):
+        while pending and not recycler.context_reason():
+            index = pending.popleft()
+            if recycler.page_due(navigations[slot]):
+                pages[slot] = await recycler.recycle_page(context, pages[slot])
+                navigations[slot] = 0
+            result = await scrape_one(context, pages[slot], session, scrape_product, data[index], capture)
+            navigations[slot] += 1
+            recycler.navigated()
+            if on_result:
+                on_result(index, result)
+            if collect:
+                results[index] = result
+
+    try:
+        while True:
+            await asyncio.gather(*(worker(slot) for slot in range(len(pages))))
+            if not pending:
+                break
+            # Tous les workers sont à l'arrêt : le contexte peut être remplacé
+            context = await recycler.recycle_context(context)
+            pages = [await context.new_page() if p.is_closed() else p for p in pages]
+            navigations = [0] * len(pages)
+    finally:
+        for worker_page in pages:
+            if worker_page is not page:
+                try:
+                    await worker_page.close()
+                except Exception:
+                    pass
+
+    return results
@@ -0,0 +1,269 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from scrapers.metrics import Gauge, Histogram
+
+SCHEDULER_CAPACITY = int(os.getenv("SCHEDULER_CAPACITY", "16"))
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "0"))
+INTERACTIVE_MAX_ITEMS = int(os.getenv("INTERACTIVE_MAX_ITEMS", "50"))
+TENANT_WEIGHTS = os.getenv("TENANT_WEIGHTS", "")
+
+PRIORITIES = ("interactive", "bulk")
+
+QUEUE_DEPTH = Gauge(
+    "scraper_tenant_queue_depth", "Produits en attente d'une place, par tenant et priorité",
+    labels=("tenant", "priority"),
+)
+ACTIVE_VISITS = Gauge(
+    "scraper_tenant_active_visits", "Produits en cours de visite, par tenant",
+    labels=("tenant",),
+)
+WAIT_SECONDS = Histogram(
+    "scraper_tenant_wait_seconds", "Attente d'une place avant la visite d'un produit",
+    labels=("tenant", "priority"),
+)
+
+_ticket = contextvars.ContextVar("scheduler_ticket", default=None)
+
+
+def current_ticket():
+    """
+    Ticket du run courant (posé par FairScheduler.wrap), ou None.
+    """
+    return _ticket.get()
+
+
+def parse_weights(value):
+    """
+    "tenant_a:2,tenant_b:0.5" -> {"tenant_a": 2.0, "tenant_b": 0.5}
+
+    Lève ValueError pour un poids non numérique, nul ou négatif.
+    """
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.strip().rpartition(":")
+        if not name:
+            continue
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            weights[name] = 0.0
+        if not 0 < weights[name] < float("inf"):
+            raise ValueError(f"TENANT_WEIGHTS: weight of {name!r} must be a positive number, got {weight!r}")
+    return weights
+
+
+def api_key_tenant(api_key):
+    """
+    Tenant d'une clé d'API : empreinte courte, la clé n'apparaît ni dans les
+    métriques ni dans la file des workers.
+    """
+    return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def assign_tenant(payload, api_key=None):
+    """
+    Rattache le payload au tenant de la clé d'API (en-tête X-API-Key ou
+    "api_key" dans le payload) ; sans clé, le tenant est déduit des identifiants.
+    """
+    api_key = api_key or payload.pop("api_key", None)
+    if api_key:
+        payload["tenant"] = api_key_tenant(api_key)
+    return payload
+
+
+class Ticket:
+    def __init__(self, tenant, priority):
+        self.tenant = tenant
+        self.priority = priority
+
+
+class _Tenant:
+    def __init__(self, name, weight, cap):
+        self.name = name
+        self.weight = weight
+        self.cap = cap
+        self.active = 0
+        self.finish = 0.0
+        self.waiting = {priority: deque() for priority in PRIORITIES}
+        self.served = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def depth(self, priority=None):
+        if priority:
+            return len(self.waiting[priority])
+        return sum(len(queue) for queue in self.waiting.values())
+
+
+class FairScheduler:
+    """
+    Ordonnanceur des visites de produits entre tenants (clé d'API ou
+    identifiants fournisseur).
+
+    `capacity` visites au plus en même temps dans le processus, et
+    `tenant_cap` par tenant (0 : sans plafond). Quand une place se libère, elle revient d'abord
+    à la priorité "interactive", puis, au sein d'une même priorité, au tenant
+    de plus petite étiquette de départ (start-time fair queuing pondéré par
+    produit) : un lot de 5 000 produits n'empêche pas une requête de 10
+    produits d'être servie au même rythme que lui.
+
+    `reserved` places sont réservées à la priorité "interactive" ; `metrics`
+    donne les jauges (file, places occupées) et l'histogramme d'attente.
+    """
+
+    def __init__(self, capacity=SCHEDULER_CAPACITY, tenant_cap=TENANT_MAX_CONCURRENCY,
+                 weights=None, interactive_max_items=INTERACTIVE_MAX_ITEMS, reserved=0, metrics=None):
+        self.capacity = max(1, capacity)
+        self.tenant_cap = tenant_cap if tenant_cap > 0 else self.capacity
+        self.weights = parse_weights(TENANT_WEIGHTS) if weights is None else weights
+        self.interactive_max_items = interactive_max_items
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        self._queue_depth, self._active, self._wait = metrics or (QUEUE_DEPTH, ACTIVE_VISITS, WAIT_SECONDS)
+        self.active = 0
+        self.virtual_time = 0.0
+        self._tenants = {}
+
+    def ticket(self, supplier, payload):
+        """
+        Tenant et priorité d'un payload. La priorité vaut "priority" du payload,
+        sinon "interactive" jusqu'à interactive_max_items produits, "bulk" au-delà.
+        """
+        tenant = payload.get("tenant")
+        if not tenant:
+            username = (payload.get("credentials") or {}).get("username", "")
+            tenant = f"{supplier}:{username}"
+        priority = payload.get("priority")
+        if priority not in PRIORITIES:
+            priority = "interactive" if len(payload.get("data") or []) <= self.interactive_max_items else "bulk"
+        return Ticket(tenant, priority)
+
+    def wrap(self, supplier, scrape):
+        """
+        Scraper de même signature que scrape_* dont les visites de produits
+        passent par l'ordonnanceur. Le tenant et la priorité sont ajoutés au
+        payload (transmis aux workers).
+        """
+        async def scheduled(payload, *args, **kwargs):
+            ticket = self.ticket(supplier, payload)
+            payload = {**payload, "tenant": ticket.tenant, "priority": ticket.priority}
+            token = _ticket.set(ticket)
+            try:
+                return await scrape(payload, *args, **kwargs)
+            finally:
+                _ticket.reset(token)
+
+        return scheduled
+
+    def _tenant(self, name):
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = _Tenant(name, self.weights.get(name, 1.0), self.tenant_cap)
+        return tenant
+
+    def _waiting(self):
+        return any(tenant.depth() for tenant in self._tenants.values())
+
+    def _limit(self, priority):
+        return self.capacity if priority == "interactive" else self.capacity - self.reserved
+
+    def _grant(self, tenant):
+        start = max(tenant.finish, self.virtual_time)
+        tenant.finish = start + 1.0 / tenant.weight
+        self.virtual_time = start
+        tenant.active += 1
+        self.active += 1
+        self._active.set(tenant.active, tenant=tenant.name)
+
+    def _dispatch(self):
+        while self.active < self.capacity:
+            chosen = None
+            for priority in PRIORITIES:
+                if self.active >= self._limit(priority):
+                    continue
+                eligible = [t for t in self._tenants.values() if t.waiting[priority] and t.active < t.cap]
+                if eligible:
+                    chosen = min(eligible, key=lambda t: max(t.finish, self.virtual_time)), priority
+                    break
+            if chosen is None:
+                return
+            tenant, priority = chosen
+            future, _ = tenant.waiting[priority].popleft()
+            self._queue_depth.set(tenant.depth(priority), tenant=tenant.name, priority=priority)
+            self._grant(tenant)
+            future.set_result(None)
+
+    async def acquire(self, ticket):
+        tenant = self._tenant(ticket.tenant)
+        enqueued = time.monotonic()
+        if self.active < self._limit(ticket.priority) and tenant.active < tenant.cap and not self._waiting():
+            self._grant(tenant)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            tenant.waiting[ticket.priority].append((future, enqueued))
+            self._queue_depth.set(tenant.depth(ticket.priority), tenant=tenant.name, priority=ticket.priority)
+            # Les attentes en cours (tenant plafonné, places réservées) ne bloquent pas les autres
+            self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release(ticket)
+                else:
+                    tenant.waiting[ticket.priority].remove((future, enqueued))
+                    self._queue_depth.set(tenant.depth(ticket.priority), tenant=tenant.name, priority=ticket.priority)
+                raise
+        waited = time.monotonic() - enqueued
+        tenant.served += 1
+        tenant.wait_total += waited
+        tenant.wait_max = max(tenant.wait_max, waited)
+        self._wait.observe(waited, tenant=tenant.name, priority=ticket.priority)
+
+    def release(self, ticket):
+        tenant = self._tenants[ticket.tenant]
+        tenant.active -= 1
+        self.active -= 1
+        self._active.set(tenant.active, tenant=tenant.name)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Place pour visiter un produit du run courant ; sans ticket (scraper
+        appelé directement), aucune attente.
+        """
+        ticket = _ticket.get()
+        if ticket is None:
+            yield
+            return
+        await self.acquire(ticket)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "tenants": {
+                tenant.name: {
+                    "weight": tenant.weight,
+                    "active": tenant.active,
+                    "max_concurrency": tenant.cap,
+                    "queue_depth": {priority: tenant.depth(priority) for priority in PRIORITIES},
+                    "served": tenant.served,
+                    "avg_wait_ms": round(tenant.wait_total / tenant.served * 1000, 1) if tenant.served else None,
+                    "max_wait_ms": round(tenant.wait_max * 1000, 1),
+                }
+                for tenant in self._tenants.values()
+            },
+        }
+
+
+fair_scheduler = FairScheduler()
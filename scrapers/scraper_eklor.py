@@ -1,44 +1,101 @@
 import asyncio
-import pandas as pd
-from playwright.async_api import async_playwright
+from scrapers.adaptive_waits import AdaptiveWaits
+from scrapers.browser_pool import open_context
+from scrapers.capture import capture_for
+from scrapers.cleaning import (
+    clean_price, is_available, order_record
+)
+from scrapers.extraction import collect_fields, extract_page, extract_tree, parse_html, product_result
+from scrapers.host_scheduler import HostLimits, goto, host_scheduler
+from scrapers.http_engine import resolve_engine, scrape_hybrid
+from scrapers.listing import ListingSpec, listing_mode, listing_pages, scrape_listing
+from scrapers.metrics import record_field_errors, timed
+from scrapers.records import RecordSet
+from scrapers.result_cache import CachedRun, result_cache
+from scrapers.resource_filter import (
+    ResourcePolicy, apply_resource_policy, consent_handled, lean_loading_enabled,
+    mark_consent_handled
+)
+from scrapers.runner import resolve_concurrency, scrape_items
+from scrapers.session_cache import SessionExpired, SupplierSession, session_cache
 import json
 from datetime import datetime
-import re
+import os
+from urllib.parse import urlsplit
+
+BASE_URL_EKLOR = os.getenv("EKLOR_BASE_URL", "https://eklor.shop")
+CONCURRENCY_EKLOR = int(os.getenv("EKLOR_CONCURRENCY", "1"))
+USER_AGENT_EKLOR = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+ENGINE_EKLOR = os.getenv("EKLOR_ENGINE", "hybrid")
+RESOURCE_POLICY_EKLOR = ResourcePolicy(consent_domains=("axept.io",))
+WAITS_EKLOR = AdaptiveWaits("eklor")
+LIMITS_EKLOR = HostLimits.from_env("EKLOR")
+host_scheduler.configure(host_scheduler.host(BASE_URL_EKLOR), LIMITS_EKLOR)
+
+EXTRACTION_SPEC_EKLOR = [
+    {"field": "name", "selector": 'h1.mb-4.text-2xl.font-medium', "wait": True},
+    {"field": "price_per_unit", "selector": 'span.text-3xl.font-semibold', "label": "price"},
+    {"field": "stock", "selector": 'button.Stock-label.Stock-label'},
+    {"field": "description", "selector": 'p.mb-6.text-base.font-normal'},
+    {"field": "technical_ref", "selector": 'li.bullet-list', "kind": "list", "wait": True, "timeout": 3000},
+]
+
+LISTING_SPEC_EKLOR = ListingSpec(
+    tile='div.product-card',
+    fields=[
+        {"field": "url", "selector": 'a.product-card-link', "attr": "href"},
+        {"field": "name", "selector": 'h3.product-card-title'},
+        {"field": "price_per_unit", "selector": 'span.product-card-price'},
+        {"field": "stock", "selector": 'span.Stock-label'},
+    ],
+    next_page='a[rel="next"]',
+)
 
 async def accept_cookies_eklor(page):
     """
     Accepte la bannière de cookies sur le site Eklor si elle est présente.
     """
+    if consent_handled(page):
+        WAITS_EKLOR.skip_consent()
+        return
     try:
         await page.click('text="OK pour moi"', timeout=3000)
     except:
         pass
+    mark_consent_handled(page)
 
 async def login_eklor(page, email, password):
     """
     Se connecte au site Eklor avec les identifiants fournis.
     """
-    await page.goto("https://eklor.shop/login")
+    await page.goto(f"{BASE_URL_EKLOR}/login")
     await page.wait_for_selector('input[type="email"]')
     await page.fill('input[type="email"]', email)
     await page.fill('input[type="password"]', password)
     await accept_cookies_eklor(page)
     await page.click('button[type="submit"]')
-    await page.wait_for_url("https://eklor.shop/", timeout=10000)
+    await page.wait_for_url(f"{BASE_URL_EKLOR}/", timeout=10000)
+
+def is_login_page_eklor(url):
+    """
+    Indique si l'URL correspond à la page de connexion Eklor.
+    """
+    return url.split("?")[0].rstrip("/").endswith(f"{urlsplit(BASE_URL_EKLOR).netloc}/login")
 
 async def scrape_product_eklor(page, item):
     """
     Scrape les informations détaillées d'un produit Eklor à partir de son URL.
     """
     url = item["url"]
-    errors = []
-    data = {}
 
     try:
-        await page.goto(url)
-        await page.wait_for_load_state("domcontentloaded")
-        await accept_cookies_eklor(page)
+        with timed("goto", "eklor"):
+            await host_scheduler.call(url, lambda: goto(page, url))
+            await page.wait_for_load_state("domcontentloaded")
+        with timed("consent", "eklor"):
+            await accept_cookies_eklor(page)
     except Exception as e:
+        record_field_errors("eklor", "page.goto failed")
         return {
             **item,
             **{f: "N/A" for f in ["name", "reference", "price_per_unit", "description", "technical_ref"]},
@@ -46,139 +103,121 @@ async def scrape_product_eklor(page, item):
             "error": f"page.goto failed: {str(e)}"
         }
 
-    try:
-        name = await page.text_content('h1.mb-4.text-2xl.font-medium')
-        data["name"] = name.strip() if name else "N/A"
-        if not name:
-            errors.append("missing name")
-    except Exception as e:
-        data["name"] = "N/A"
-        errors.append(f"name error: {str(e)}")
+    if is_login_page_eklor(page.url):
+        raise SessionExpired(f"redirected to login page: {page.url}")
 
-    try:
-        price = await page.text_content('span.text-3xl.font-semibold')
-        data["price_per_unit"] = price.strip() if price else "N/A"
-        if not price:
-            errors.append("missing price")
-    except Exception as e:
-        data["price_per_unit"] = "N/A"
-        errors.append(f"price error: {str(e)}")
+    extracted = await extract_page(page, EXTRACTION_SPEC_EKLOR, WAITS_EKLOR)
+    result = build_product_eklor(item, extracted)
+    record_field_errors("eklor", result["error"])
+    return result
 
-    try:
-        stock = await page.text_content('button.Stock-label.Stock-label')
-        data["stock"] = stock.strip() if stock else "N/A"
-        if not stock:
-            errors.append("missing stock")
-    except Exception as e:
-        data["stock"] = "N/A"
-        errors.append(f"stock error: {str(e)}")
+def build_product_eklor(item, extracted):
+    """
+    Construit la ligne de résultat Eklor à partir des champs extraits.
+    """
+    data, errors = collect_fields(EXTRACTION_SPEC_EKLOR, extracted)
+    return product_result(item, data, errors)
 
-    try:
-        summary = await page.text_content('p.mb-6.text-base.font-normal')
-        data["description"] = summary.strip() if summary else "N/A"
-        if not summary:
-            errors.append("missing description")
-    except Exception as e:
-        data["description"] = "N/A"
-        errors.append(f"description error: {str(e)}")
+def extract_product_eklor(html, item):
+    """
+    Construit la ligne de résultat Eklor à partir du HTML d'une page produit
+    (servi sans navigateur ou rejoué depuis une capture).
+    """
+    return build_product_eklor(item, extract_tree(parse_html(html), EXTRACTION_SPEC_EKLOR))
 
-    try:
-        await page.wait_for_selector('li.bullet-list', timeout=3000)
-        tech_elements = await page.locator('li.bullet-list').all_text_contents()
-        data["technical_ref"] = tech_elements if tech_elements else "N/A"
-        if not tech_elements:
-            errors.append("missing technical_ref")
-    except Exception as e:
-        data["technical_ref"] = "N/A"
-        errors.append(f"technical_ref error: {str(e)}")
-
-    return {
-        **item,
-        **data,
-        "is_ok": 0 if errors else 1,
-        "error": "; ".join(errors) if errors else None
-    }
-
-def clean_output_eklor(output_df):
-    """
-    Nettoie et enrichit le DataFrame final des résultats du scraping Eklor.
-    """
-    output_df['price_per_unit'] = output_df['price_per_unit'].astype(str).apply(
-        lambda x: re.findall(r'[\d,]+', x)[0] if re.findall(r'[\d,]+', x) else "N/A"
-    )
-    output_df['price_per_unit'] = output_df['price_per_unit'].str.replace(',', '.').astype(float, errors='ignore')
-    output_df['is_available'] = output_df['stock'].apply(
-        lambda x: 1 if isinstance(x, str) and 'produits en stock' in x.lower() else 0
-    )
-    output_df['created_at'] = datetime.now()
-
-    output_df['unit_1'] = "À l'unité"
-    output_df['price_per_unit_1'] = output_df['price_per_unit']
-    output_df['unit_2'] = "N/A"
-    output_df['price_per_unit_2'] = "N/A"
-    output_df['unit_3'] = "N/A"
-    output_df['price_per_unit_3'] = "N/A"
-
-    columns_order = [
-        "product_category",
-        "manufacturer",
-        "manufacturer_id",
-        "supplier",
-        "url",
-        "name",
-        "description",
-        "technical_ref",
-        "unit_1",
-        "price_per_unit_1",
-        "unit_2",
-        "price_per_unit_2",
-        "unit_3",
-        "price_per_unit_3",
-        "is_available",
-        "stock",
-        "is_ok",
-        "error",
-        "created_at"
-    ]
-    output_df = output_df.reindex(columns=columns_order)
-
-    return output_df
-
-async def scrape_eklor(payload, headless=True):
-    """
-    Lance la session Playwright et exécute le scraping pour chaque produit Eklor.
+def parse_product_eklor(html, item):
+    """
+    Extrait un produit Eklor depuis le HTML servi sans navigateur.
+    Renvoie None si un champ est introuvable, pour reprendre le produit avec Playwright.
+    """
+    result = extract_product_eklor(html, item)
+    return result if result["is_ok"] else None
+
+def clean_output_eklor(rows):
+    """
+    Nettoie et enrichit les résultats du scraping Eklor (RecordSet), ligne
+    à ligne comme clean_record_eklor.
+    """
+    return RecordSet.from_rows(rows, clean_record_eklor, datetime.now())
+
+def clean_record_eklor(row, created_at=None):
+    """
+    Nettoie un résultat brut Eklor (aussi utilisé pour le streaming).
+    """
+    price = clean_price(row.get('price_per_unit'))
+    return order_record({
+        **row,
+        'price_per_unit': price,
+        'is_available': is_available(row.get('stock'), 'produits en stock'),
+        'created_at': created_at or datetime.now(),
+        'unit_1': "À l'unité",
+        'price_per_unit_1': price,
+        'unit_2': "N/A",
+        'price_per_unit_2': "N/A",
+        'unit_3': "N/A",
+        'price_per_unit_3': "N/A",
+    })
+
+async def scrape_eklor(payload, headless=True, pool=None, on_result=None, collect=True):
+    """
+    Loue un contexte Playwright et exécute le scraping pour chaque produit Eklor.
+    Les produits assez récents dans le cache de résultats ne sont pas rescrapés.
     """
     credentials = payload["credentials"]
-    data = payload["data"]
+    run = CachedRun(result_cache, "eklor", payload, on_result)
+    capture = capture_for(payload, "eklor")
     results = []
+    resource_stats = None
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=headless,
-            args=['--disable-blink-features=AutomationControlled']
-        )
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800}
-        )
-        page = await context.new_page()
-
-        try:
-            await login_eklor(page, credentials["username"], credentials["password"])
-        except:
-            return [{"error": "login_failed"}]
-
-        for item in data:
-            try:
-                result = await scrape_product_eklor(page, item)
-            except Exception as e:
-                result = {**item, "error": str(e), "status": "failed"}
-            results.append(result)
+    if run.to_scrape or listing_pages(payload):
+        session = SupplierSession(session_cache, "eklor", credentials, login_eklor)
 
-        await browser.close()
+        async with open_context(
+            pool,
+            headless=headless,
+            user_agent=USER_AGENT_EKLOR,
+            viewport={"width": 1280, "height": 800},
+            storage_state=session.restored_state
+        ) as context:
+            if lean_loading_enabled(payload):
+                resource_stats = await apply_resource_policy(context, RESOURCE_POLICY_EKLOR)
+            page = await context.new_page()
 
-    output = pd.DataFrame(results)
-    output = clean_output_eklor(output)
+            try:
+                await session.open(context, page)
+            except:
+                return [{"error": "login_failed"}]
+
+            concurrency = resolve_concurrency(payload, CONCURRENCY_EKLOR)
+            engine = resolve_engine(payload, ENGINE_EKLOR)
+
+            async def visit(items, on_result):
+                if engine == "hybrid":
+                    return await scrape_hybrid(
+                        context, page, session, scrape_product_eklor, parse_product_eklor,
+                        is_login_page_eklor, items, concurrency,
+                        headers={"User-Agent": USER_AGENT_EKLOR}, on_result=on_result,
+                        collect=collect, revalidator=run, capture=capture
+                    )
+                return await scrape_items(
+                    context, page, session, scrape_product_eklor, items, concurrency,
+                    on_result=on_result, collect=collect, capture=capture
+                )
+
+            if listing_mode(payload):
+                results = await scrape_listing(
+                    context, page, run, LISTING_SPEC_EKLOR, is_login_page_eklor, visit, payload, engine,
+                    headers={"User-Agent": USER_AGENT_EKLOR}, collect=collect
+                )
+            else:
+                results = await visit(run.to_scrape, run.on_result)
+
+    if not collect:
+        return None
+
+    with timed("cleaning", "eklor"):
+        output = clean_output_eklor(run.merge(results))
+    output.attrs["resource_stats"] = resource_stats.to_dict() if resource_stats else None
 
     return output
 
@@ -1,26 +1,74 @@
 import asyncio
-import pandas as pd
-from playwright.async_api import async_playwright
+from scrapers.adaptive_waits import AdaptiveWaits
+from scrapers.browser_pool import open_context
+from scrapers.capture import capture_for
+from scrapers.cleaning import (
+    clean_price, is_available, order_record
+)
+from scrapers.extraction import collect_fields, extract_page, extract_tree, parse_html, product_result
+from scrapers.host_scheduler import HostLimits, goto, host_scheduler
+from scrapers.http_engine import resolve_engine, scrape_hybrid
+from scrapers.listing import ListingSpec, listing_mode, listing_pages, scrape_listing
+from scrapers.metrics import record_field_errors, timed
+from scrapers.records import RecordSet
+from scrapers.result_cache import CachedRun, result_cache
+from scrapers.resource_filter import (
+    ResourcePolicy, apply_resource_policy, consent_handled, lean_loading_enabled,
+    mark_consent_handled
+)
+from scrapers.runner import resolve_concurrency, scrape_items
+from scrapers.session_cache import SessionExpired, SupplierSession, session_cache
 from datetime import datetime
-import re
+import os
 import json
 
+BASE_URL_POWR_CONNECT = os.getenv("POWR_CONNECT_BASE_URL", "https://powr-connect.shop")
+CONCURRENCY_POWR_CONNECT = int(os.getenv("POWR_CONNECT_CONCURRENCY", "1"))
+ENGINE_POWR_CONNECT = os.getenv("POWR_CONNECT_ENGINE", "hybrid")
+RESOURCE_POLICY_POWR_CONNECT = ResourcePolicy(consent_domains=("axept.io",))
+WAITS_POWR_CONNECT = AdaptiveWaits("powr_connect")
+LIMITS_POWR_CONNECT = HostLimits.from_env("POWR_CONNECT")
+host_scheduler.configure(host_scheduler.host(BASE_URL_POWR_CONNECT), LIMITS_POWR_CONNECT)
+
+EXTRACTION_SPEC_POWR_CONNECT = [
+    {"field": "name", "selector": 'h1.text-2xl.font-semibold.tracking-tight', "wait": True},
+    {"field": "description", "selector": 'p.mt-4'},
+    {"field": "price_per_unit", "selector": 'p.text-2xl.font-semibold.leading-none', "label": "price"},
+    {"field": "stock", "selector": 'button.Stock-label.Stock-label'},
+    {"field": "technical_ref", "selector": 'ul.bulleted-list li', "kind": "list", "wait": True, "timeout": 3000},
+]
+
+LISTING_SPEC_POWR_CONNECT = ListingSpec(
+    tile='article.product-item',
+    fields=[
+        {"field": "url", "selector": 'a.product-item-link', "attr": "href"},
+        {"field": "name", "selector": 'h2.product-item-name'},
+        {"field": "price_per_unit", "selector": 'p.product-item-price'},
+        {"field": "stock", "selector": 'span.Stock-label'},
+    ],
+    next_page='a[rel="next"]',
+)
+
 async def accept_cookies_powr_connect(page):
     """
     Accepte la bannière de cookies sur le site Powr Connect si elle est présente.
     """
+    if consent_handled(page):
+        WAITS_POWR_CONNECT.skip_consent()
+        return
     try:
         await page.wait_for_selector('div[class*="axeptio_widget_wrapper"]', timeout=3000)
         await page.locator('button:has-text("OK pour moi")').click()
         await asyncio.sleep(0.5)
     except:
         pass
+    mark_consent_handled(page)
 
 async def login_powr_connect(page, email, password):
     """
     Se connecte au site Powr Connect avec les identifiants fournis.
     """
-    await page.goto("https://powr-connect.shop/connexion")
+    await page.goto(f"{BASE_URL_POWR_CONNECT}/connexion")
     await accept_cookies_powr_connect(page)
     await page.fill('input[name="username"]', email)
     await page.fill('input[name="password"]', password)
@@ -36,19 +84,26 @@ async def login_powr_connect(page, email, password):
     """)
     await page.wait_for_url(lambda url: not url.endswith("/connexion"), timeout=10000)
 
+def is_login_page_powr_connect(url):
+    """
+    Indique si l'URL correspond à la page de connexion Powr Connect.
+    """
+    return url.split("?")[0].rstrip("/").endswith("/connexion")
+
 async def scrape_product_powr_connect(page, item):
     """
     Scrape les informations détaillées d'un produit Powr Connect à partir de son URL.
     """
     url = item["url"]
-    errors = []
-    data = {}
 
     try:
-        await page.goto(url)
-        await page.wait_for_load_state("domcontentloaded")
-        await accept_cookies_powr_connect(page)
+        with timed("goto", "powr_connect"):
+            await host_scheduler.call(url, lambda: goto(page, url))
+            await page.wait_for_load_state("domcontentloaded")
+        with timed("consent", "powr_connect"):
+            await accept_cookies_powr_connect(page)
     except Exception as e:
+        record_field_errors("powr_connect", "page.goto failed")
         return {
             **item,
             **{f: "N/A" for f in ["name", "description", "price_per_unit", "stock", "technical_ref"]},
@@ -56,133 +111,118 @@ async def scrape_product_powr_connect(page, item):
             "error": f"page.goto failed: {str(e)}"
         }
 
-    try:
-        name = await page.text_content('h1.text-2xl.font-semibold.tracking-tight')
-        data["name"] = name.strip() if name else "N/A"
-        if not name:
-            errors.append("missing name")
-    except Exception as e:
-        data["name"] = "N/A"
-        errors.append(f"name error: {str(e)}")
+    if is_login_page_powr_connect(page.url):
+        raise SessionExpired(f"redirected to login page: {page.url}")
 
-    try:
-        desc = await page.text_content('p.mt-4')
-        data["description"] = desc.strip() if desc else "N/A"
-        if not desc:
-            errors.append("missing description")
-    except Exception as e:
-        data["description"] = "N/A"
-        errors.append(f"description error: {str(e)}")
+    extracted = await extract_page(page, EXTRACTION_SPEC_POWR_CONNECT, WAITS_POWR_CONNECT)
+    result = build_product_powr_connect(item, extracted)
+    record_field_errors("powr_connect", result["error"])
+    return result
 
-    try:
-        price = await page.text_content('p.text-2xl.font-semibold.leading-none')
-        data["price_per_unit"] = price.strip() if price else "N/A"
-        if not price:
-            errors.append("missing price")
-    except Exception as e:
-        data["price_per_unit"] = "N/A"
-        errors.append(f"price error: {str(e)}")
+def build_product_powr_connect(item, extracted):
+    """
+    Construit la ligne de résultat Powr Connect à partir des champs extraits.
+    """
+    data, errors = collect_fields(EXTRACTION_SPEC_POWR_CONNECT, extracted)
+    return product_result(item, data, errors)
 
-    try:
-        stock = await page.text_content('button.Stock-label.Stock-label')
-        data["stock"] = stock.strip() if stock else "N/A"
-        if not stock:
-            errors.append("missing stock")
-    except Exception as e:
-        data["stock"] = "N/A"
-        errors.append(f"stock error: {str(e)}")
+def extract_product_powr_connect(html, item):
+    """
+    Construit la ligne de résultat Powr Connect à partir du HTML d'une page produit
+    (servi sans navigateur ou rejoué depuis une capture).
+    """
+    return build_product_powr_connect(item, extract_tree(parse_html(html), EXTRACTION_SPEC_POWR_CONNECT))
 
-    try:
-        await page.wait_for_selector('ul.bulleted-list li', timeout=3000)
-        tech = await page.locator('ul.bulleted-list li').all_text_contents()
-        data["technical_ref"] = tech if tech else "N/A"
-        if not tech:
-            errors.append("missing technical_ref")
-    except Exception as e:
-        data["technical_ref"] = "N/A"
-        errors.append(f"technical_ref error: {str(e)}")
-
-    return {
-        **item,
-        **data,
-        "is_ok": 0 if errors else 1,
-        "error": "; ".join(errors) if errors else None
-    }
-
-def clean_output_powr_connect(output_df):
-    """
-    Nettoie et enrichit le DataFrame final des résultats du scraping Powr Connect.
-    """
-    output_df['price_per_unit'] = output_df['price_per_unit'].astype(str).apply(
-        lambda x: re.findall(r'[\d,]+', x)[0] if re.findall(r'[\d,]+', x) else "N/A"
-    )
-    output_df['price_per_unit'] = output_df['price_per_unit'].str.replace(',', '.').astype(float, errors='ignore')
-    output_df['is_available'] = output_df['stock'].apply(
-        lambda x: 1 if isinstance(x, str) and 'produits en stock' in x.lower() else 0
-    )
-    output_df['created_at'] = datetime.now()
-
-    output_df['unit_1'] = "À l'unité"
-    output_df['price_per_unit_1'] = output_df['price_per_unit']
-    output_df['unit_2'] = "N/A"
-    output_df['price_per_unit_2'] = "N/A"
-    output_df['unit_3'] = "N/A"
-    output_df['price_per_unit_3'] = "N/A"
-
-    columns_order = [
-        "product_category",
-        "manufacturer",
-        "manufacturer_id",
-        "supplier",
-        "url",
-        "name",
-        "description",
-        "technical_ref",
-        "unit_1",
-        "price_per_unit_1",
-        "unit_2",
-        "price_per_unit_2",
-        "unit_3",
-        "price_per_unit_3",
-        "is_available",
-        "stock",
-        "is_ok",
-        "error",
-        "created_at"
-    ]
-    output_df = output_df.reindex(columns=columns_order)
-
-    return output_df
-
-async def scrape_powr_connect(payload, headless=True):
-    """
-    Lance la session Playwright et exécute le scraping pour chaque produit Powr Connect.
+def parse_product_powr_connect(html, item):
+    """
+    Extrait un produit Powr Connect depuis le HTML servi sans navigateur.
+    Renvoie None si un champ est introuvable, pour reprendre le produit avec Playwright.
+    """
+    result = extract_product_powr_connect(html, item)
+    return result if result["is_ok"] else None
+
+def clean_output_powr_connect(rows):
+    """
+    Nettoie et enrichit les résultats du scraping Powr Connect (RecordSet), ligne
+    à ligne comme clean_record_powr_connect.
+    """
+    return RecordSet.from_rows(rows, clean_record_powr_connect, datetime.now())
+
+def clean_record_powr_connect(row, created_at=None):
+    """
+    Nettoie un résultat brut Powr Connect (aussi utilisé pour le streaming).
+    """
+    price = clean_price(row.get('price_per_unit'))
+    return order_record({
+        **row,
+        'price_per_unit': price,
+        'is_available': is_available(row.get('stock'), 'produits en stock'),
+        'created_at': created_at or datetime.now(),
+        'unit_1': "À l'unité",
+        'price_per_unit_1': price,
+        'unit_2': "N/A",
+        'price_per_unit_2': "N/A",
+        'unit_3': "N/A",
+        'price_per_unit_3': "N/A",
+    })
+
+async def scrape_powr_connect(payload, headless=True, pool=None, on_result=None, collect=True):
+    """
+    Loue un contexte Playwright et exécute le scraping pour chaque produit Powr Connect.
+    Les produits assez récents dans le cache de résultats ne sont pas rescrapés.
     """
     credentials = payload["credentials"]
-    data = payload["data"]
+    run = CachedRun(result_cache, "powr_connect", payload, on_result)
+    capture = capture_for(payload, "powr_connect")
     results = []
+    resource_stats = None
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context()
-        page = await context.new_page()
+    if run.to_scrape or listing_pages(payload):
+        session = SupplierSession(session_cache, "powr_connect", credentials, login_powr_connect)
 
-        try:
-            await login_powr_connect(page, credentials["username"], credentials["password"])
-        except:
-            return [{"error": "login_failed"}]
+        async with open_context(
+            pool,
+            headless=headless,
+            storage_state=session.restored_state
+        ) as context:
+            if lean_loading_enabled(payload):
+                resource_stats = await apply_resource_policy(context, RESOURCE_POLICY_POWR_CONNECT)
+            page = await context.new_page()
 
-        for item in data:
             try:
-                result = await scrape_product_powr_connect(page, item)
-            except Exception as e:
-                result = {**item, "error": str(e), "status": "failed"}
-            results.append(result)
-
-        await browser.close()
-
-    output = pd.DataFrame(results)
-    output = clean_output_powr_connect(output)
+                await session.open(context, page)
+            except:
+                return [{"error": "login_failed"}]
+
+            concurrency = resolve_concurrency(payload, CONCURRENCY_POWR_CONNECT)
+            engine = resolve_engine(payload, ENGINE_POWR_CONNECT)
+
+            async def visit(items, on_result):
+                if engine == "hybrid":
+                    return await scrape_hybrid(
+                        context, page, session, scrape_product_powr_connect, parse_product_powr_connect,
+                        is_login_page_powr_connect, items, concurrency,
+                        on_result=on_result, collect=collect, revalidator=run, capture=capture
+                    )
+                return await scrape_items(
+                    context, page, session, scrape_product_powr_connect, items, concurrency,
+                    on_result=on_result, collect=collect, capture=capture
+                )
+
+            if listing_mode(payload):
+                results = await scrape_listing(
+                    context, page, run, LISTING_SPEC_POWR_CONNECT, is_login_page_powr_connect, visit, payload, engine,
+                    collect=collect
+                )
+            else:
+                results = await visit(run.to_scrape, run.on_result)
+
+    if not collect:
+        return None
+
+    with timed("cleaning", "powr_connect"):
+        output = clean_output_powr_connect(run.merge(results))
+    output.attrs["resource_stats"] = resource_stats.to_dict() if resource_stats else None
 
     return output
 
@@ -1,24 +1,88 @@
 import asyncio
-import pandas as pd
-from playwright.async_api import async_playwright
+from scrapers.adaptive_waits import AdaptiveWaits
+from scrapers.browser_pool import open_context
+from scrapers.capture import capture_for
+from scrapers.cleaning import (
+    clean_price, clean_technical_ref, is_available, order_record
+)
+from scrapers.extraction import collect_fields, extract_page, extract_tree, parse_html, product_result
+from scrapers.host_scheduler import HostLimits, goto, host_scheduler
+from scrapers.http_engine import resolve_engine, scrape_hybrid
+from scrapers.listing import ListingSpec, listing_mode, listing_pages, scrape_listing
+from scrapers.metrics import record_field_errors, timed
+from scrapers.records import RecordSet
+from scrapers.result_cache import CachedRun, result_cache
+from scrapers.resource_filter import (
+    ResourcePolicy, apply_resource_policy, consent_handled, lean_loading_enabled,
+    mark_consent_handled
+)
+from scrapers.runner import resolve_concurrency, scrape_items
+from scrapers.session_cache import SessionExpired, SupplierSession, session_cache
+from scrapers.store_api import html_text, price_text, scrape_store_api
 import json
 from datetime import datetime
-import re
+import os
+
+BASE_URL_VOLTANEO = os.getenv("VOLTANEO_BASE_URL", "https://webshop.voltaneo.com")
+CONCURRENCY_VOLTANEO = int(os.getenv("VOLTANEO_CONCURRENCY", "1"))
+ENGINE_VOLTANEO = os.getenv("VOLTANEO_ENGINE", "browser")
+RESOURCE_POLICY_VOLTANEO = ResourcePolicy(consent_url_patterns=("complianz-gdpr",))
+WAITS_VOLTANEO = AdaptiveWaits("voltaneo")
+LIMITS_VOLTANEO = HostLimits.from_env("VOLTANEO")
+host_scheduler.configure(host_scheduler.host(BASE_URL_VOLTANEO), LIMITS_VOLTANEO)
+
+ENGINES_VOLTANEO = ("api", "hybrid", "browser")
+NONCE_URL_VOLTANEO = f"{BASE_URL_VOLTANEO}/mon-compte/"
+
+MAX_PRICES_VOLTANEO = 3
+
+EXTRACTION_SPEC_VOLTANEO = [
+    {"field": "name", "selector": 'h1.product_title.entry-title', "wait": True},
+    {"field": "description", "selector": 'div.product_description'},
+    {
+        "field": "price_options",
+        "selector": 'section.addToCartSection p.conditionnement',
+        "kind": "options",
+        "max": MAX_PRICES_VOLTANEO,
+        "parts": {"label": 'span.label', "number": 'span.number'},
+        "label": "price options",
+        "wait": True,
+        "timeout": 5000,
+    },
+    {"field": "stock_label", "selector": 'div.stock span.label', "kind": "raw"},
+    {"field": "stock_number", "selector": 'div.stock span.number', "kind": "raw"},
+    {"field": "technical_ref", "selector": 'div.col div.fcat', "kind": "list", "wait": 'div.col', "timeout": 3000},
+]
+
+LISTING_SPEC_VOLTANEO = ListingSpec(
+    tile='ul.products li.product',
+    fields=[
+        {"field": "url", "selector": 'a.woocommerce-LoopProduct-link', "attr": "href"},
+        {"field": "name", "selector": 'h2.woocommerce-loop-product__title'},
+        {"field": "price_per_unit_1", "selector": 'span.price span.woocommerce-Price-amount'},
+        {"field": "stock", "selector": 'p.stock'},
+    ],
+    next_page='a.next.page-numbers',
+)
 
 async def accept_cookies_voltaneo(page):
     """
     Accepte la bannière de cookies sur le site Voltaneo si elle est présente.
     """
+    if consent_handled(page):
+        WAITS_VOLTANEO.skip_consent()
+        return
     try:
         await page.locator('button.cmplz-btn.cmplz-accept').click(timeout=3000)
     except:
         pass
+    mark_consent_handled(page)
 
 async def login_voltaneo(page, email, password):
     """
     Se connecte au site Voltaneo avec les identifiants fournis.
     """
-    await page.goto("https://webshop.voltaneo.com/login")
+    await page.goto(f"{BASE_URL_VOLTANEO}/login")
     await accept_cookies_voltaneo(page)
     await page.fill('input[name="username"]', email)
     await page.fill('input[name="password"]', password)
@@ -29,19 +93,26 @@ async def login_voltaneo(page, email, password):
     await page.locator('button:has-text("Se connecter")').click(force=True)
     await page.wait_for_url(lambda url: not url.endswith("/login/"), timeout=10000)
 
+def is_login_page_voltaneo(url):
+    """
+    Indique si l'URL correspond à la page de connexion Voltaneo.
+    """
+    return url.split("?")[0].rstrip("/").endswith("/login")
+
 async def scrape_product_voltaneo(page, item):
     """
     Scrape les informations détaillées d'un produit Voltaneo à partir de son URL.
     """
     url = item["url"]
-    errors = []
-    data = {}
 
     try:
-        await page.goto(url)
-        await page.wait_for_load_state("domcontentloaded")
-        await accept_cookies_voltaneo(page)
+        with timed("goto", "voltaneo"):
+            await host_scheduler.call(url, lambda: goto(page, url))
+            await page.wait_for_load_state("domcontentloaded")
+        with timed("consent", "voltaneo"):
+            await accept_cookies_voltaneo(page)
     except Exception as e:
+        record_field_errors("voltaneo", "page.goto failed")
         return {
             **item,
             **{f: "N/A" for f in ["name", "reference", "price_per_unit_1", "unit_1", "price_per_unit_2", "unit_2", "price_per_unit_3", "unit_3", "stock", "technical_ref"]},
@@ -49,167 +120,190 @@ async def scrape_product_voltaneo(page, item):
             "error": f"page.goto failed: {str(e)}"
         }
 
-    try:
-        name = await page.text_content('h1.product_title.entry-title')
-        data["name"] = name.strip() if name else "N/A"
-        if not name:
-            errors.append("missing name")
-    except Exception as e:
-        data["name"] = "N/A"
-        errors.append(f"name error: {str(e)}")
+    if is_login_page_voltaneo(page.url):
+        raise SessionExpired(f"redirected to login page: {page.url}")
 
-    try:
-        desc = await page.text_content('div.product_description')
-        data["description"] = desc.strip() if desc else "N/A"
-        if not desc:
-            errors.append("missing description")
-    except Exception as e:
-        data["description"] = "N/A"
-        errors.append(f"description error: {str(e)}")
+    extracted = await extract_page(page, EXTRACTION_SPEC_VOLTANEO, WAITS_VOLTANEO)
+    result = build_product_voltaneo(item, extracted)
+    record_field_errors("voltaneo", result["error"])
+    return result
 
-    try:
-        await page.wait_for_selector('section.addToCartSection p.conditionnement', timeout=5000)
-        price_elements = page.locator('section.addToCartSection p.conditionnement')
-        count = await price_elements.count()
-
-        max_prices = 3
-        index = 1
-        for i in range(min(count, max_prices)):
-            element = price_elements.nth(i)
-            if await element.is_visible():
-                label = await element.locator('span.label').text_content()
-                label = label.strip() if label else "N/A"
-                number = await element.locator('span.number').text_content()
-                number = number.strip() if number else "N/A"
-                data[f"unit_{index}"] = label
-                data[f"price_per_unit_{index}"] = number
-                index += 1
-
-        for i in range(index, max_prices + 1):
-            data[f"unit_{i}"] = "N/A"
-            data[f"price_per_unit_{i}"] = "N/A"
+def build_product_voltaneo(item, extracted):
+    """
+    Construit la ligne de résultat Voltaneo à partir des champs extraits :
+    paliers de prix visibles (3 max) et stock composé du libellé et de la quantité.
+    """
+    data, errors = collect_fields(EXTRACTION_SPEC_VOLTANEO, extracted)
+    values = extracted["values"]
 
-    except Exception as e:
-        errors.append(f"price options error: {str(e)}")
+    options = values.get("price_options")
+    if options is not None:
+        if options["count"] == 0:
+            errors.append("price options error: no price option found")
+        else:
+            index = 1
+            for option in options["visible"]:
+                label = option.get("label")
+                number = option.get("number")
+                data[f"unit_{index}"] = label.strip() if label else "N/A"
+                data[f"price_per_unit_{index}"] = number.strip() if number else "N/A"
+                index += 1
+            for i in range(index, MAX_PRICES_VOLTANEO + 1):
+                data[f"unit_{i}"] = "N/A"
+                data[f"price_per_unit_{i}"] = "N/A"
 
-    try:
-        stock_text = await page.text_content('div.stock span.label')
+    if "stock_label" in values:
+        stock_text = values["stock_label"]
         stock_text = stock_text.strip() if stock_text else ""
         if stock_text:
-            stock_number = ""
-            if await page.locator('div.stock span.number').count() > 0:
-                number = await page.text_content('div.stock span.number')
-                stock_number = number.strip() if number else ""
-            combined = f"{stock_text} {stock_number}".strip()
-            data["stock"] = combined
+            number = values.get("stock_number")
+            stock_number = number.strip() if number else ""
+            data["stock"] = f"{stock_text} {stock_number}".strip()
         else:
             data["stock"] = "N/A"
             errors.append("missing stock label")
-    except Exception as e:
+    else:
         data["stock"] = "N/A"
-        errors.append(f"stock error: {str(e)}")
 
-    try:
-        await page.wait_for_selector('div.col', timeout=3000)
-        tech_elements = await page.locator('div.col div.fcat').all_text_contents()
-        data["technical_ref"] = tech_elements if tech_elements else "N/A"
-        if not tech_elements:
-            errors.append("missing technical_ref")
-    except Exception as e:
-        data["technical_ref"] = "N/A"
-        errors.append(f"technical_ref error: {str(e)}")
-
-    return {
-        **item,
-        **data,
-        "is_ok": 0 if errors else 1,
-        "error": "; ".join(errors) if errors else None
+    return product_result(item, data, errors)
+
+def extract_product_voltaneo(html, item):
+    """
+    Construit la ligne de résultat Voltaneo à partir du HTML d'une page produit
+    (servi sans navigateur ou rejoué depuis une capture).
+    """
+    return build_product_voltaneo(item, extract_tree(parse_html(html), EXTRACTION_SPEC_VOLTANEO))
+
+def parse_product_voltaneo(html, item):
+    """
+    Extrait un produit Voltaneo depuis le HTML servi sans navigateur.
+    Renvoie None si un champ est introuvable, pour reprendre le produit avec Playwright.
+    """
+    result = extract_product_voltaneo(html, item)
+    return result if result["is_ok"] else None
+
+def build_product_voltaneo_api(item, product, variations):
+    """
+    Construit la ligne de résultat Voltaneo depuis l'API Store WooCommerce :
+    conditionnements achetables parmi les trois premières variations, comme
+    sur la page (prix unique "À l'unité" pour un produit simple), stock,
+    description et caractéristiques
+    (attributs hors variations). Renvoie None si un champ manque, pour
+    reprendre le produit avec Playwright.
+    """
+    if variations:
+        tiers = [
+            (variation.get("variation", "").split(": ", 1)[-1], price_text(variation["prices"]))
+            for variation in variations[:MAX_PRICES_VOLTANEO] if variation.get("is_purchasable", True)
+        ]
+    else:
+        tiers = [("À l'unité", price_text(product["prices"]))] if product.get("prices", {}).get("price") else []
+    technical_ref = [
+        f"{attribute['name']} : {', '.join(term['name'] for term in attribute.get('terms') or [])}"
+        for attribute in product.get("attributes") or [] if not attribute.get("has_variations")
+    ]
+    stock_text = (product.get("stock_availability") or {}).get("text", "").strip()
+    name = html_text(product.get("name"))
+    if not tiers or not technical_ref or not name or (product.get("is_in_stock") and not stock_text):
+        return None
+
+    data = {
+        "name": name,
+        "description": html_text(product.get("description")) or "N/A",
+        "technical_ref": technical_ref,
+        # Sans le mot "stock", que is_available cherche dans le libellé
+        "stock": stock_text if product.get("is_in_stock") else "Indisponible",
     }
+    for index in range(1, MAX_PRICES_VOLTANEO + 1):
+        label, price = tiers[index - 1] if index <= len(tiers) else ("N/A", "N/A")
+        data[f"unit_{index}"] = label
+        data[f"price_per_unit_{index}"] = price
+    return product_result(item, data, [])
+
+def clean_output_voltaneo(rows):
+    """
+    Nettoie et enrichit les résultats du scraping Voltaneo (RecordSet), ligne
+    à ligne comme clean_record_voltaneo.
+    """
+    return RecordSet.from_rows(rows, clean_record_voltaneo, datetime.now())
 
-def clean_output_voltaneo(output_df):
+def clean_record_voltaneo(row, created_at=None):
     """
-    Nettoie et enrichit le DataFrame final des résultats du scraping Voltaneo.
+    Nettoie un résultat brut Voltaneo (aussi utilisé pour le streaming).
     """
+    record = dict(row)
     for col in ['price_per_unit_1', 'price_per_unit_2', 'price_per_unit_3']:
-        if col in output_df.columns:
-            output_df[col] = output_df[col].astype(str).apply(
-                lambda x: re.findall(r'[\d,]+', x)[0] if re.findall(r'[\d,]+', x) else "N/A"
-            )
-            output_df[col] = output_df[col].str.replace(',', '.').astype(float, errors='ignore')
-
-    output_df['is_available'] = output_df['stock'].apply(
-        lambda x: 1 if isinstance(x, str) and 'stock' in x.lower() else 0
-    )
-
-    def clean_technical_ref(raw_list):
-        cleaned = []
-        if isinstance(raw_list, list):
-            for item in raw_list:
-                if isinstance(item, str):
-                    item = item.strip().replace('\n', '').replace('\r', '')
-                    item = re.sub(r'\s+', ' ', item)
-                    cleaned.append(item)
-        return cleaned if cleaned else "N/A"
-
-    if 'technical_ref' in output_df.columns:
-        output_df['technical_ref'] = output_df['technical_ref'].apply(clean_technical_ref)
-
-    output_df['created_at'] = datetime.now()
-
-    columns_order = [
-        "product_category",
-        "manufacturer",
-        "manufacturer_id",
-        "supplier",
-        "url",
-        "name",
-        "description",
-        "technical_ref",
-        "unit_1",
-        "price_per_unit_1",
-        "unit_2",
-        "price_per_unit_2",
-        "unit_3",
-        "price_per_unit_3",
-        "is_available",
-        "stock",
-        "is_ok",
-        "error",
-        "created_at"
-    ]
-    output_df = output_df.reindex(columns=columns_order)
+        record[col] = clean_price(record.get(col))
+
+    record['is_available'] = is_available(record.get('stock'), 'stock')
+    record['technical_ref'] = clean_technical_ref(record.get('technical_ref'))
+    record['created_at'] = created_at or datetime.now()
 
-    return output_df
+    return order_record(record)
 
-async def scrape_voltaneo(payload, headless=True):
+async def scrape_voltaneo(payload, headless=True, pool=None, on_result=None, collect=True):
     """
-    Lance la session Playwright et exécute le scraping pour chaque produit Voltaneo.
+    Loue un contexte Playwright et exécute le scraping pour chaque produit Voltaneo.
+    Les produits assez récents dans le cache de résultats ne sont pas rescrapés.
     """
     credentials = payload["credentials"]
-    data = payload["data"]
+    run = CachedRun(result_cache, "voltaneo", payload, on_result)
+    capture = capture_for(payload, "voltaneo")
     results = []
+    resource_stats = None
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context()
-        page = await context.new_page()
+    if run.to_scrape or listing_pages(payload):
+        session = SupplierSession(session_cache, "voltaneo", credentials, login_voltaneo)
 
-        try:
-            await login_voltaneo(page, credentials["username"], credentials["password"])
-        except:
-            return [{"error": "login_failed"}]
+        async with open_context(
+            pool,
+            headless=headless,
+            storage_state=session.restored_state
+        ) as context:
+            if lean_loading_enabled(payload):
+                resource_stats = await apply_resource_policy(context, RESOURCE_POLICY_VOLTANEO)
+            page = await context.new_page()
 
-        for item in data:
             try:
-                result = await scrape_product_voltaneo(page, item)
-            except Exception as e:
-                result = {**item, "error": str(e), "status": "failed"}
-            results.append(result)
+                await session.open(context, page)
+            except:
+                return [{"error": "login_failed"}]
+
+            concurrency = resolve_concurrency(payload, CONCURRENCY_VOLTANEO)
+            engine = resolve_engine(payload, ENGINE_VOLTANEO, ENGINES_VOLTANEO)
+
+            async def visit(items, on_result):
+                if engine == "api":
+                    return await scrape_store_api(
+                        context, page, session, scrape_product_voltaneo, build_product_voltaneo_api, items,
+                        BASE_URL_VOLTANEO, NONCE_URL_VOLTANEO, concurrency,
+                        on_result=on_result, collect=collect, capture=capture
+                    )
+                if engine == "hybrid":
+                    return await scrape_hybrid(
+                        context, page, session, scrape_product_voltaneo, parse_product_voltaneo,
+                        is_login_page_voltaneo, items, concurrency,
+                        on_result=on_result, collect=collect, revalidator=run, capture=capture
+                    )
+                return await scrape_items(
+                    context, page, session, scrape_product_voltaneo, items, concurrency,
+                    on_result=on_result, collect=collect, capture=capture
+                )
+
+            if listing_mode(payload):
+                results = await scrape_listing(
+                    context, page, run, LISTING_SPEC_VOLTANEO, is_login_page_voltaneo, visit, payload, engine,
+                    collect=collect
+                )
+            else:
+                results = await visit(run.to_scrape, run.on_result)
 
-        await browser.close()
+    if not collect:
+        return None
 
-    output = pd.DataFrame(results)
-    output = clean_output_voltaneo(output)
+    with timed("cleaning", "voltaneo"):
+        output = clean_output_voltaneo(run.merge(results))
+    output.attrs["resource_stats"] = resource_stats.to_dict() if resource_stats else None
 
     return output
 
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from scrapers.metrics import timed
+from scrapers.resource_filter import reset_consent
+
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "3600"))
+SESSION_CACHE_DIR = os.getenv("SESSION_CACHE_DIR")
+SESSION_CACHE_KEY = os.getenv("SESSION_CACHE_KEY")
+
+# Sans SESSION_CACHE_KEY, les empreintes ne sont stables que dans le processus
+_ACCOUNT_SECRET = SESSION_CACHE_KEY.encode("utf-8") if SESSION_CACHE_KEY else os.urandom(32)
+
+
+def account_key(credentials):
+    """
+    Identité d'un compte dans les caches (sessions, résultats, visites en
+    cours) : l'identifiant suivi d'une empreinte HMAC du mot de passe, pour
+    qu'un mauvais mot de passe ne réutilise rien du compte.
+    """
+    credentials = credentials or {}
+    password = str(credentials.get("password") or "").encode("utf-8")
+    digest = hmac.new(_ACCOUNT_SECRET, password, hashlib.sha256).hexdigest()
+    return f"{credentials.get('username', '')}#{digest[:32]}"
+
+
+class SessionExpired(Exception):
+    """
+    Levée quand une page produit redirige vers la page de connexion.
+    """
+
+
+class SessionCache:
+    """
+    Cache des sessions authentifiées (storage_state Playwright : cookies et
+    localStorage), indexé par fournisseur et compte (voir account_key).
+
+    Si un répertoire est fourni, les sessions sont aussi persistées sur disque,
+    chiffrées avec une clé Fernet (paquet cryptography).
+    """
+
+    def __init__(self, ttl=SESSION_CACHE_TTL, directory=SESSION_CACHE_DIR, key=SESSION_CACHE_KEY):
+        self.ttl = ttl
+        self.directory = directory
+        self._entries = {}
+        self._fernet = None
+        if directory:
+            if not key:
+                raise ValueError("SESSION_CACHE_KEY is required to persist sessions on disk")
+            try:
+                from cryptography.fernet import Fernet
+            except ImportError:
+                raise RuntimeError("the cryptography package is required to persist sessions on disk")
+            self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, supplier, account):
+        digest = hashlib.sha256(f"{supplier}:{account}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.session")
+
+    def _load(self, supplier, account):
+        if not self._fernet:
+            return None
+        try:
+            with open(self._path(supplier, account), "rb") as f:
+                entry = json.loads(self._fernet.decrypt(f.read()))
+        except Exception:
+            return None
+        return entry["saved_at"], entry["state"]
+
+    def get(self, supplier, account):
+        """
+        Renvoie le storage_state en cache, ou None s'il est absent ou expiré.
+        """
+        key = (supplier, account)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load(supplier, account)
+            if entry is not None:
+                self._entries[key] = entry
+        if entry is None:
+            return None
+        saved_at, state = entry
+        if time.time() - saved_at > self.ttl:
+            self.invalidate(supplier, account)
+            return None
+        return state
+
+    def set(self, supplier, account, state):
+        saved_at = time.time()
+        self._entries[(supplier, account)] = (saved_at, state)
+        if self._fernet:
+            payload = json.dumps({"saved_at": saved_at, "state": state}).encode("utf-8")
+            path = self._path(supplier, account)
+            with open(path + ".tmp", "wb") as f:
+                f.write(self._fernet.encrypt(payload))
+            os.replace(path + ".tmp", path)
+
+    def invalidate(self, supplier, account):
+        self._entries.pop((supplier, account), None)
+        if self._fernet:
+            try:
+                os.remove(self._path(supplier, account))
+            except FileNotFoundError:
+                pass
+
+
+class SupplierSession:
+    """
+    Session d'un run de scraping : restaure la session en cache ou se connecte,
+    et se reconnecte une seule fois si la session expire en cours de run.
+    """
+
+    def __init__(self, cache, supplier, credentials, login, max_renewals=1):
+        self.cache = cache
+        self.supplier = supplier
+        self.username = credentials["username"]
+        self.password = credentials["password"]
+        self.account = account_key(credentials)
+        self.login = login
+        self.max_renewals = max_renewals
+        self.renewals = 0
+        self.generation = 0
+        self.restored_state = cache.get(supplier, self.account)
+        self._lock = asyncio.Lock()
+
+    async def open(self, context, page):
+        """
+        Se connecte si aucune session n'a été restaurée dans le contexte.
+        """
+        if self.restored_state is None:
+            await self._login(context, page)
+
+    async def renew(self, context, page, seen_generation):
+        """
+        Reconnecte le contexte après une redirection vers la page de connexion.
+        Ne fait rien si une autre tâche a déjà renouvelé la session.
+        """
+        async with self._lock:
+            if self.generation != seen_generation:
+                return
+            if self.renewals >= self.max_renewals:
+                raise SessionExpired("session expired and re-login limit reached")
+            self.renewals += 1
+            self.cache.invalidate(self.supplier, self.account)
+            await context.clear_cookies()
+            reset_consent(context)
+            await self._login(context, page)
+            self.generation += 1
+
+    async def _login(self, context, page):
+        with timed("login", self.supplier):
+            await self.login(page, self.username, self.password)
+        self.cache.set(self.supplier, self.account, await context.storage_state())
+
+
+session_cache = SessionCache()
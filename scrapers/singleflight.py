@@ -0,0 +1,83 @@
+import asyncio
+
+from scrapers.metrics import Counter
+
+COALESCED = Counter(
+    "scraper_coalesced_total",
+    "Produits non visités car déjà demandés (doublon du payload ou visite en cours)",
+    labels=("supplier", "scope"),
+)
+
+
+class FlightAborted(Exception):
+    """
+    Transmise aux requêtes rattachées quand la visite en cours est annulée.
+    """
+
+
+def rebase(row, source_item, item):
+    """
+    Ligne scrapée pour `source_item` recopiée pour `item` : les métadonnées
+    du payload (catégorie, fabricant...) sont celles de `item`.
+    """
+    return {**item, **{k: v for k, v in row.items() if k not in source_item}}
+
+
+class SingleFlight:
+    """
+    Une seule visite à la fois par clé dans le processus : un appel lancé
+    pendant qu'un autre est en cours pour la même clé attend et partage son
+    résultat au lieu de refaire la visite.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    async def run(self, key, call):
+        """
+        Renvoie (résultat, partagé) ; partagé vaut True si le résultat vient
+        d'un appel déjà en cours.
+        """
+        future = self._flights.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        try:
+            result = await call()
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else FlightAborted(f"{key[-1]}: fetch aborted"))
+            # L'exception est relevée par l'appelant ; évite l'avertissement si personne n'attendait
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def in_flight(self):
+        return len(self._flights)
+
+
+async def coalesce(flights, scope, supplier, account, item, visit):
+    """
+    Visite `item` via visit() (qui renvoie la ligne), ou rattache la demande
+    à la visite en cours de la même URL chez le même fournisseur, pour le
+    même compte (`account`, voir account_key) : les prix affichés dépendent du compte connecté.
+    """
+    key = (scope, supplier, account, item["url"])
+    (source_item, row), shared = await flights.run(key, lambda: _visit(item, visit))
+    if not shared:
+        return row
+    COALESCED.inc(supplier=supplier, scope="inflight")
+    return None if row is None else rebase(row, source_item, item)
+
+
+async def _visit(item, visit):
+    return item, await visit()
+
+
+product_flights = SingleFlight()
@@ -0,0 +1,166 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from scrapers.records import TRACKING_COLUMNS, RecordSet
+
+SNAPSHOT_STORE_PATH = os.getenv("SNAPSHOT_STORE_PATH", "snapshots.sqlite3")
+
+TRACKED_FIELDS = (
+    "unit_1", "price_per_unit_1",
+    "unit_2", "price_per_unit_2",
+    "unit_3", "price_per_unit_3",
+    "stock", "is_available",
+)
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+def _normalize(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+class SnapshotStore:
+    """
+    Dernier état scrapé (prix, conditionnements, stock, disponibilité) par
+    fournisseur, compte et URL, pour ne renvoyer que les produits qui ont
+    changé. Les méthodes sont bloquantes (SQLite) : depuis la boucle asyncio,
+    passer par asyncio.to_thread.
+    """
+
+    def __init__(self, path=SNAPSHOT_STORE_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(snapshots)")]
+        if columns and "username" not in columns:
+            # Ancien état partagé entre comptes : il ne peut pas être réattribué
+            self._db.execute("DROP TABLE snapshots")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                supplier TEXT, username TEXT, url TEXT, state TEXT, scraped_at REAL,
+                PRIMARY KEY (supplier, username, url)
+            )
+        """)
+        self._db.commit()
+
+    def _previous(self, supplier, username, urls):
+        previous = {}
+        urls = list(urls)
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT url, state FROM snapshots WHERE supplier = ? AND username = ? "
+                f"AND url IN ({', '.join('?' * len(chunk))})",
+                (supplier, username, *chunk)
+            )
+            previous.update((url, json.loads(state)) for url, state in rows)
+        return previous
+
+    def compare(self, supplier, username, records):
+        """
+        Compare des enregistrements nettoyés au dernier état connu pour le
+        compte `username` et met à jour le store. Renvoie, pour chaque enregistrement, (type de changement,
+        {champ: {"old", "new"}}) ; None pour les produits en erreur, qui ne
+        modifient pas le store.
+        """
+        with self._lock:
+            return self._compare(supplier, username, records)
+
+    def _compare(self, supplier, username, records):
+        ok_urls = {r["url"] for r in records if r.get("is_ok") == 1}
+        previous = self._previous(supplier, username, ok_urls)
+        now = time.time()
+        comparisons = []
+        updates = []
+
+        for record in records:
+            if record.get("is_ok") != 1:
+                comparisons.append(None)
+                continue
+            state = {field: _normalize(record.get(field)) for field in TRACKED_FIELDS}
+            old = previous.get(record["url"])
+            if old is None:
+                comparisons.append((NEW, {}))
+            else:
+                changes = {
+                    field: {"old": old.get(field), "new": state[field]}
+                    for field in TRACKED_FIELDS
+                    if old.get(field) != state[field]
+                }
+                comparisons.append((CHANGED if changes else UNCHANGED, changes))
+            previous[record["url"]] = state
+            updates.append((supplier, username, record["url"], json.dumps(state), now))
+
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO snapshots (supplier, username, url, state, scraped_at) VALUES (?, ?, ?, ?, ?)",
+                updates
+            )
+        return comparisons
+
+    def changes(self, supplier, username, records):
+        """
+        Met à jour le store et ne garde que les Records nouveaux ou modifiés,
+        avec les colonnes change_type et changes.
+        """
+        comparisons = self.compare(supplier, username, records)
+        changed = []
+        for record, comparison in zip(records, comparisons):
+            if comparison and comparison[0] != UNCHANGED:
+                record.change_type, record.changes = comparison
+                changed.append(record)
+        return RecordSet(changed, columns=(*records.columns, *TRACKING_COLUMNS), attrs=records.attrs)
+
+
+snapshot_store = None
+
+
+def get_snapshot_store():
+    """
+    Store partagé, ouvert au premier usage.
+    """
+    global snapshot_store
+    if snapshot_store is None:
+        snapshot_store = SnapshotStore()
+    return snapshot_store
+
+
+def payload_username(payload):
+    return (payload.get("credentials") or {}).get("username", "")
+
+
+def track_changes(supplier, records, payload):
+    """
+    Enregistre le dernier état scrapé pour le compte du payload ; avec
+    "changes_only", ne renvoie que les lignes nouvelles ou modifiées.
+    Bloquant : à appeler via asyncio.to_thread depuis la boucle.
+    """
+    store = get_snapshot_store()
+    if payload.get("changes_only"):
+        return store.changes(supplier, payload_username(payload), records)
+    store.compare(supplier, payload_username(payload), records)
+    return records
+
+
+def track_record(supplier, record, payload):
+    """
+    Version ligne à ligne de track_changes, pour le streaming : renvoie None
+    pour une ligne inchangée (ou en erreur) si seuls les changements sont demandés.
+    Bloquant, comme track_changes.
+    """
+    comparison = get_snapshot_store().compare(supplier, payload_username(payload), [record])[0]
+    if not payload.get("changes_only"):
+        return record
+    if comparison is None or comparison[0] == UNCHANGED:
+        return None
+    return {**record, "change_type": comparison[0], "changes": comparison[1]}
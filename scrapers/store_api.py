@@ -0,0 +1,186 @@
+import asyncio
+import html
+import os
+import re
+from urllib.parse import parse_qs, unquote, urlencode, urlsplit
+
+from scrapers.extraction import parse_html
+from scrapers.host_scheduler import host_scheduler
+from scrapers.http_engine import HttpFetcher, resume_with_browser
+from scrapers.metrics import Counter, timed
+from scrapers.scheduler import fair_scheduler
+
+STORE_API_PATH = "/wp-json/wc/store/v1/products"
+# L'API Store plafonne per_page à 100
+STORE_API_BATCH_SIZE = min(100, int(os.getenv("STORE_API_BATCH_SIZE", "50")))
+
+NONCE_PATTERN = re.compile(r'wpApiSettings\s*=\s*\{[^}]*"nonce"\s*:\s*"(\w+)"')
+
+STORE_API_PRODUCTS = Counter(
+    "scraper_store_api_products_total",
+    "Produits demandés à l'API Store WooCommerce, extraits du JSON ou repris avec Playwright",
+    labels=("supplier", "outcome"),
+)
+
+
+def product_ref(url):
+    """
+    ("id", identifiant) pour une URL de la forme ?p=<id>, sinon ("slug", dernier
+    segment du chemin), pour retrouver le produit dans l'API.
+    """
+    parts = urlsplit(url)
+    post_id = parse_qs(parts.query).get("p", [""])[0]
+    if post_id.isdigit():
+        return "id", int(post_id)
+    segments = [segment for segment in parts.path.split("/") if segment]
+    return "slug", unquote(segments[-1]).lower() if segments else ""
+
+
+def price_text(prices):
+    """
+    Prix de l'API (entier en unités mineures) au format affiché par le site,
+    "12,50 €", pour passer par le même nettoyage que le HTML.
+    """
+    minor = int(prices.get("currency_minor_unit", 2))
+    value = int(prices["price"]) / 10 ** minor
+    return f"{value:.{minor}f}".replace(".", ",") + f" {prices.get('currency_symbol') or '€'}"
+
+
+def html_text(fragment):
+    """
+    Texte d'un fragment HTML renvoyé par l'API (description, nom avec entités).
+    """
+    if not fragment:
+        return ""
+    return " ".join(html.unescape(parse_html(fragment).text(separator=" ")).split())
+
+
+class StoreApiClient:
+    """
+    Requêtes groupées à l'API Store WooCommerce sur la session HTTP connectée :
+    jusqu'à STORE_API_BATCH_SIZE produits par requête, par slug ou par
+    identifiant. Le nonce REST de WordPress (X-WP-Nonce) fait reconnaître
+    les cookies de session, donc les prix du compte client.
+    """
+
+    def __init__(self, fetcher, base_url, batch_size=STORE_API_BATCH_SIZE):
+        self.fetcher = fetcher
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.headers = {}
+
+    async def authenticate(self, page_url):
+        """
+        Lit le nonce REST dans une page du compte connecté. Sans nonce, l'API
+        répond comme à un visiteur anonyme.
+        """
+        try:
+            _, status, page, _ = await host_scheduler.call(page_url, lambda: self.fetcher.fetch(page_url))
+        except Exception:
+            return False
+        match = NONCE_PATTERN.search(page) if status == 200 else None
+        if match:
+            self.headers["X-WP-Nonce"] = match.group(1)
+        return match is not None
+
+    async def get(self, **params):
+        url = f"{self.base_url}{STORE_API_PATH}?{urlencode(params, safe=',')}"
+        status, data = await host_scheduler.call(url, lambda: self.fetcher.fetch_json(url, self.headers))
+        if status != 200 or not isinstance(data, list):
+            raise RuntimeError(f"store api returned {status}: {url}")
+        return data
+
+    async def lookup(self, refs):
+        """
+        Produits correspondant à des références (product_ref), en une requête
+        par type de référence.
+        """
+        slugs = sorted({value for kind, value in refs if kind == "slug" and value})
+        ids = sorted({value for kind, value in refs if kind == "id"})
+        products = []
+        if slugs:
+            products += await self.get(slug=",".join(slugs), per_page=len(slugs))
+        if ids:
+            products += await self.get(include=",".join(map(str, ids)), per_page=len(ids))
+        return products
+
+    async def variations(self, ids):
+        """
+        Variations (conditionnements) par identifiant, avec leurs prix.
+        """
+        found = {}
+        for start in range(0, len(ids), 100):
+            chunk = ids[start:start + 100]
+            for variation in await self.get(include=",".join(map(str, chunk)), type="variation", per_page=len(chunk)):
+                found[variation["id"]] = variation
+        return found
+
+
+async def fetch_store_products(client, build_product, data, on_result=None, collect=True, supplier=""):
+    """
+    Extrait les produits de `data` par lots depuis l'API Store. Renvoie une
+    liste alignée sur `data`, avec None pour les produits à reprendre avec
+    Playwright (lot en erreur, produit introuvable ou champ absent du JSON :
+    build_product(item, produit, variations) renvoie alors None).
+    Chaque lot occupe une place de l'ordonnanceur des tenants.
+    """
+    results = [None] * len(data)
+    refs = [product_ref(item["url"]) for item in data]
+
+    async def fetch_batch(indexes):
+        try:
+            async with fair_scheduler.slot():
+                with timed("store_api", supplier):
+                    products = await client.lookup([refs[i] for i in indexes])
+                    variation_ids = sorted({v["id"] for product in products for v in product.get("variations") or []})
+                    variations = await client.variations(variation_ids) if variation_ids else {}
+        except Exception:
+            STORE_API_PRODUCTS.inc(len(indexes), supplier=supplier, outcome="error")
+            return
+        by_ref = {}
+        for product in products:
+            by_ref[("id", product["id"])] = product
+            by_ref[("slug", unquote(product.get("slug") or "").lower())] = product
+
+        for index in indexes:
+            product = by_ref.get(refs[index])
+            result = None
+            if product is not None:
+                try:
+                    result = build_product(data[index], product, [
+                        variations[v["id"]] for v in product.get("variations") or [] if v["id"] in variations
+                    ])
+                except Exception:
+                    result = None
+            STORE_API_PRODUCTS.inc(supplier=supplier, outcome="ok" if result is not None else "fallback")
+            if result is None:
+                continue
+            if on_result:
+                on_result(index, result)
+            results[index] = result if collect else True
+
+    batches = [range(start, min(len(data), start + client.batch_size)) for start in range(0, len(data), client.batch_size)]
+    await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+    return results
+
+
+async def scrape_store_api(context, page, session, scrape_product, build_product, data, base_url, nonce_url,
+                           concurrency=1, headers=None, on_result=None, collect=True, capture=None):
+    """
+    Lit les produits dans l'API Store WooCommerce avec les cookies de la
+    session, puis reprend avec Playwright uniquement les produits non
+    extraits. Sans nonce REST, l'API ne servirait que les prix publics : tout
+    le lot est alors repris avec Playwright. L'ordre d'entrée est conservé.
+    """
+    async with HttpFetcher(headers=headers) as fetcher:
+        await fetcher.sync_cookies(context)
+        client = StoreApiClient(fetcher, base_url)
+        if await client.authenticate(nonce_url):
+            results = await fetch_store_products(client, build_product, data, on_result, collect, session.supplier)
+        else:
+            STORE_API_PRODUCTS.inc(len(data), supplier=session.supplier, outcome="fallback")
+            results = [None] * len(data)
+
+    return await resume_with_browser(
+        context, page, session, scrape_product, data, results, concurrency, on_result, collect, capture
+    )
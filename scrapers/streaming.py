@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import time
+
+from scrapers.cleaning import record_json
+from scrapers.metrics import start_request_timings
+
+HEARTBEAT_INTERVAL = float(os.getenv("STREAM_HEARTBEAT_INTERVAL", "10"))
+
+_END = object()
+
+
+def _control_line(kind, **fields):
+    return json.dumps({"type": kind, **fields}).encode("utf-8") + b"\n"
+
+
+async def stream_ndjson(scrape, clean_record, payload, pool=None, heartbeat=HEARTBEAT_INTERVAL, track=None):
+    """
+    Exécute le scraping et renvoie chaque produit nettoyé sur une ligne NDJSON
+    dès qu'il est terminé, avec son rang dans le payload (`index`).
+
+    Les lignes de contrôle ont une clé "type" : "heartbeat" en l'absence de
+    résultat pendant `heartbeat` secondes, "error" si le scraping échoue,
+    "end" en fin de flux. Les résultats ne sont pas conservés en mémoire.
+    Avec "debug" dans le payload, la ligne "end" porte le détail des temps.
+
+    `track(record)` peut transformer chaque enregistrement nettoyé ou le
+    retirer du flux en renvoyant None ; fonction bloquante, exécutée dans un thread.
+    """
+    timings = start_request_timings(payload)
+    queue = asyncio.Queue()
+    total = len(payload["data"])
+    done = 0
+    errors = 0
+
+    def on_result(index, row):
+        queue.put_nowait((index, row))
+
+    async def run():
+        try:
+            output = await scrape(payload, pool=pool, on_result=on_result, collect=False)
+            if isinstance(output, list):
+                queue.put_nowait(_control_line("error", error=output[0].get("error") if output else None))
+        except Exception as e:
+            queue.put_nowait(_control_line("error", error=str(e)))
+        finally:
+            queue.put_nowait(_END)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield _control_line("heartbeat", done=done, total=total, at=time.time())
+                continue
+            if message is _END:
+                break
+            if isinstance(message, bytes):
+                yield message
+                continue
+            index, row = message
+            done += 1
+            if row.get("is_ok") == 0 or row.get("status") == "failed":
+                errors += 1
+            record = clean_record(row)
+            if track:
+                record = await asyncio.to_thread(track, record)
+                if record is None:
+                    continue
+            yield record_json({**record, "index": index}) + b"\n"
+        end = {"timings": timings.to_dict()} if timings else {}
+        yield _control_line("end", done=done, total=total, errors=errors, **end)
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+WORK_QUEUE = os.getenv("WORK_QUEUE", "sqlite")
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.sqlite3")
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+
+def _cipher():
+    """
+    Chiffre les identifiants stockés dans la file avec SESSION_CACHE_KEY si elle est définie.
+    """
+    key = os.getenv("SESSION_CACHE_KEY")
+    if not key:
+        return None
+    from cryptography.fernet import Fernet
+    return Fernet(key.encode())
+
+
+class SQLiteWorkQueue:
+    """
+    File durable de tâches produit partagée entre l'API et les processus
+    workers. Un worker loue des tâches d'un même lot pour une durée limitée ;
+    les tâches d'un worker mort ou dont le bail expire sont remises en file.
+    La connexion est partagée entre threads (appels via asyncio.to_thread)
+    sous un verrou.
+    """
+
+    def __init__(self, path=WORK_QUEUE_PATH, max_attempts=WORKER_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._cipher = _cipher()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                id TEXT PRIMARY KEY, supplier TEXT, options TEXT, credentials BLOB,
+                total INTEGER, created_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, batch_id TEXT, idx INTEGER,
+                item TEXT, status TEXT, worker TEXT, lease_until REAL,
+                attempts INTEGER DEFAULT 0, result TEXT, delivered INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+            CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch_id, status, delivered);
+        """)
+
+    def _dump_credentials(self, credentials):
+        data = json.dumps(credentials).encode("utf-8")
+        return self._cipher.encrypt(data) if self._cipher else data
+
+    def _load_credentials(self, data):
+        return json.loads(self._cipher.decrypt(data) if self._cipher else data)
+
+    def enqueue(self, supplier, payload):
+        """
+        Ajoute un lot (un produit = une tâche) et renvoie son identifiant.
+        """
+        batch_id = uuid.uuid4().hex
+        options = {k: v for k, v in payload.items() if k not in ("data", "credentials")}
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "INSERT INTO batches (id, supplier, options, credentials, total, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (batch_id, supplier, json.dumps(options), self._dump_credentials(payload["credentials"]),
+                 len(payload["data"]), time.time())
+            )
+            self._db.executemany(
+                "INSERT INTO tasks (batch_id, idx, item, status) VALUES (?, ?, ?, ?)",
+                [(batch_id, i, json.dumps(item), PENDING) for i, item in enumerate(payload["data"])]
+            )
+        return batch_id
+
+    def _tenant_counts(self, status):
+        """
+        {(tenant, priorité, lot): (tâches, première tâche, création du lot)}
+        des tâches dans l'état `status` ; tenant et priorité sont posés dans
+        les options par l'ordonnanceur.
+        """
+        counts = {}
+        for batch_id, options, count, first, created_at in self._db.execute(
+            "SELECT t.batch_id, b.options, COUNT(*), MIN(t.id), b.created_at FROM tasks t "
+            "JOIN batches b ON b.id = t.batch_id WHERE t.status = ? GROUP BY t.batch_id", (status,)
+        ):
+            options = json.loads(options)
+            counts[(options.get("tenant", ""), options.get("priority", "bulk"), batch_id)] = (count, first, created_at)
+        return counts
+
+    def _next_batch(self, tenant_cap):
+        """
+        Lot à servir : priorité "interactive" d'abord, puis le tenant qui a le
+        moins de tâches louées (sous `tenant_cap`), puis le lot le plus ancien.
+        """
+        leased = {}
+        for (tenant, _, _), (count, _, _) in self._tenant_counts(LEASED).items():
+            leased[tenant] = leased.get(tenant, 0) + count
+        candidates = [
+            (priority != "interactive", leased.get(tenant, 0), first, batch_id)
+            for (tenant, priority, batch_id), (_, first, _) in self._tenant_counts(PENDING).items()
+            if not tenant_cap or leased.get(tenant, 0) < tenant_cap
+        ]
+        return min(candidates)[-1] if candidates else None
+
+    def lease(self, worker, limit, lease_seconds, tenant_cap=0):
+        """
+        Loue jusqu'à `limit` tâches d'un lot en attente, choisi équitablement
+        entre tenants (voir _next_batch). Renvoie
+        {"supplier", "options", "credentials", "tasks": [(id, item)]} ou None.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            batch_id = self._next_batch(tenant_cap)
+            if batch_id is None:
+                return None
+            tasks = self._db.execute(
+                "SELECT id, item FROM tasks WHERE batch_id = ? AND status = ? ORDER BY idx LIMIT ?",
+                (batch_id, PENDING, limit)
+            ).fetchall()
+            self._db.execute(
+                f"UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                f"WHERE id IN ({', '.join('?' * len(tasks))})",
+                (LEASED, worker, now + lease_seconds, *(task_id for task_id, _ in tasks))
+            )
+            supplier, options, credentials = self._db.execute(
+                "SELECT supplier, options, credentials FROM batches WHERE id = ?", (batch_id,)
+            ).fetchone()
+        return {
+            "supplier": supplier,
+            "options": json.loads(options),
+            "credentials": self._load_credentials(credentials),
+            "tasks": [(task_id, json.loads(item)) for task_id, item in tasks],
+        }
+
+    def extend(self, worker, lease_seconds):
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET lease_until = ? WHERE worker = ? AND status = ?",
+                (time.time() + lease_seconds, worker, LEASED)
+            )
+
+    def complete(self, task_id, row):
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_until = NULL WHERE id = ? AND status = ?",
+                (DONE, json.dumps(row, default=str), task_id, LEASED)
+            )
+
+    def _requeue(self, condition, params):
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            failed = self._db.execute(
+                f"SELECT id, item FROM tasks WHERE status = ? AND {condition} AND attempts >= ?",
+                (LEASED, *params, self.max_attempts)
+            ).fetchall()
+            for task_id, item in failed:
+                row = {**json.loads(item), "is_ok": 0, "error": f"worker lost {self.max_attempts} times"}
+                self._db.execute(
+                    "UPDATE tasks SET status = ?, result = ? WHERE id = ?", (DONE, json.dumps(row), task_id)
+                )
+            return self._db.execute(
+                f"UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL WHERE status = ? AND {condition}",
+                (PENDING, LEASED, *params)
+            ).rowcount
+
+    def requeue_worker(self, worker):
+        """
+        Remet en file les tâches d'un worker arrêté ; celles qui ont déjà
+        épuisé leurs tentatives sont terminées en erreur.
+        """
+        return self._requeue("worker = ?", (worker,))
+
+    def requeue_expired(self):
+        """
+        Idem pour les baux expirés (worker bloqué).
+        """
+        return self._requeue("lease_until < ?", (time.time(),))
+
+    def take_completed(self, batch_id):
+        """
+        Renvoie les (rang, ligne) terminés depuis le dernier appel.
+        """
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute(
+                "SELECT id, idx, result FROM tasks WHERE batch_id = ? AND status = ? AND delivered = 0",
+                (batch_id, DONE)
+            ).fetchall()
+            if rows:
+                self._db.execute(
+                    f"UPDATE tasks SET delivered = 1 WHERE id IN ({', '.join('?' * len(rows))})",
+                    [task_id for task_id, _, _ in rows]
+                )
+        return [(idx, json.loads(result)) for _, idx, result in rows]
+
+    def delete(self, batch_id):
+        """
+        Supprime un lot terminé ou annulé ; les tâches en cours chez un worker sont ignorées.
+        """
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM tasks WHERE batch_id = ?", (batch_id,))
+            self._db.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+        return {status: counts.get(status, 0) for status in (PENDING, LEASED, DONE)}
+
+    def tenant_stats(self):
+        """
+        Par tenant : tâches en attente par priorité, tâches louées et attente
+        du plus ancien lot en file.
+        """
+        now = time.time()
+        tenants = {}
+        with self._lock:
+            counts = {status: self._tenant_counts(status) for status in (PENDING, LEASED)}
+        for status in (PENDING, LEASED):
+            for (tenant, priority, _), (count, _, created_at) in counts[status].items():
+                stats = tenants.setdefault(tenant, {"queue_depth": {}, "leased": 0, "oldest_wait_ms": None})
+                if status == LEASED:
+                    stats["leased"] += count
+                    continue
+                stats["queue_depth"][priority] = stats["queue_depth"].get(priority, 0) + count
+                wait = round((now - created_at) * 1000, 1)
+                stats["oldest_wait_ms"] = max(stats["oldest_wait_ms"] or 0, wait)
+        return tenants
+
+
+def create_work_queue(kind=WORK_QUEUE):
+    if kind != "sqlite":
+        raise ValueError(f"unsupported work queue: {kind}")
+    return SQLiteWorkQueue()
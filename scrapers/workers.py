@@ -0,0 +1,237 @@
+import asyncio
+import glob
+import json
+import multiprocessing
+import os
+import time
+import uuid
+
+from scrapers.browser_pool import BrowserPool, MemoryPressure
+from scrapers.memory import memory_watchdog
+from scrapers.metrics import dump_metrics
+from scrapers.scheduler import TENANT_MAX_CONCURRENCY, fair_scheduler
+from scrapers.work_queue import SQLiteWorkQueue
+
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "0"))
+WORKER_TASK_BATCH = int(os.getenv("WORKER_TASK_BATCH", "8"))
+WORKER_LEASE_SECONDS = float(os.getenv("WORKER_LEASE_SECONDS", "120"))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.2"))
+WORKER_CHECK_INTERVAL = float(os.getenv("WORKER_CHECK_INTERVAL", "2"))
+WORKER_METRICS_DIR = os.getenv("WORKER_METRICS_DIR", "worker_metrics")
+WORKER_METRICS_INTERVAL = float(os.getenv("WORKER_METRICS_INTERVAL", "5"))
+
+
+def _scrapers():
+    from scrapers.scraper_eklor import scrape_eklor
+    from scrapers.scraper_powr_connect import scrape_powr_connect
+    from scrapers.scraper_voltaneo import scrape_voltaneo
+    scrapers = {"eklor": scrape_eklor, "powr-connect": scrape_powr_connect, "voltaneo": scrape_voltaneo}
+    return {name: fair_scheduler.wrap(name, scrape) for name, scrape in scrapers.items()}
+
+
+async def run_lease(queue, worker, pool, scrape, lease):
+    """
+    Scrape les produits d'un bail et enregistre chaque ligne dès qu'elle est terminée.
+    """
+    tasks = lease["tasks"]
+    payload = {**lease["options"], "credentials": lease["credentials"], "data": [item for _, item in tasks]}
+    completed = set()
+
+    def on_result(index, row):
+        queue.complete(tasks[index][0], row)
+        completed.add(index)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(WORKER_LEASE_SECONDS / 3)
+            queue.extend(worker, WORKER_LEASE_SECONDS)
+
+    keepalive = asyncio.create_task(heartbeat())
+    error = None
+    try:
+        output = await scrape(payload, pool=pool, on_result=on_result, collect=False)
+        if isinstance(output, list):
+            error = output[0].get("error") if output else "scraping failed"
+    except Exception as e:
+        error = str(e)
+    finally:
+        keepalive.cancel()
+
+    for index, (task_id, item) in enumerate(tasks):
+        if index not in completed:
+            queue.complete(task_id, {**item, "is_ok": 0, "error": error or "no result"})
+
+
+def metrics_path(metrics_dir, worker):
+    return os.path.join(metrics_dir, f"{worker}.json")
+
+
+async def publish_metrics(path, interval=WORKER_METRICS_INTERVAL):
+    """
+    Écrit régulièrement les métriques du worker pour /metrics de l'API.
+    """
+    while True:
+        await asyncio.to_thread(dump_metrics, path)
+        await asyncio.sleep(interval)
+
+
+async def run_worker(worker, queue_path, metrics_dir=WORKER_METRICS_DIR):
+    """
+    Boucle d'un processus worker : un navigateur dédié, des tâches louées dans la file.
+    Le worker s'arrête entre deux baux si sa mémoire dépasse le seuil "shed" de
+    sa part de la limite ; le superviseur le relance.
+    """
+    queue = SQLiteWorkQueue(queue_path)
+    scrapers = _scrapers()
+    memory_watchdog.share(SCRAPER_WORKERS)
+    memory_watchdog.start()
+    publisher = asyncio.create_task(publish_metrics(metrics_path(metrics_dir, worker)))
+    pool = BrowserPool(size=1)
+    await pool.start()
+    try:
+        while True:
+            if memory_watchdog.at_least("shed"):
+                memory_watchdog.record_action("worker_restart")
+                return
+            lease = queue.lease(worker, WORKER_TASK_BATCH, WORKER_LEASE_SECONDS, TENANT_MAX_CONCURRENCY)
+            if lease is None:
+                await asyncio.sleep(WORKER_POLL_INTERVAL)
+                continue
+            await run_lease(queue, worker, pool, scrapers[lease["supplier"]], lease)
+    finally:
+        publisher.cancel()
+        dump_metrics(metrics_path(metrics_dir, worker))
+        await pool.stop()
+        await memory_watchdog.stop()
+
+
+def worker_main(worker, queue_path, metrics_dir=WORKER_METRICS_DIR):
+    asyncio.run(run_worker(worker, queue_path, metrics_dir))
+
+
+class WorkerSupervisor:
+    """
+    Lance `processes` workers et les relance s'ils meurent, après avoir remis
+    leurs tâches en file. Les workers publient leurs métriques dans `metrics_dir`.
+    """
+
+    def __init__(self, queue, processes=SCRAPER_WORKERS, check_interval=WORKER_CHECK_INTERVAL,
+                 metrics_dir=WORKER_METRICS_DIR):
+        self.queue = queue
+        self.processes = max(1, processes)
+        self.check_interval = check_interval
+        self.metrics_dir = metrics_dir
+        self.restarts = 0
+        self._workers = {}
+        self._monitor_task = None
+        self._context = multiprocessing.get_context("spawn")
+
+    def _spawn(self, slot):
+        worker = f"{slot}-{uuid.uuid4().hex[:8]}"
+        process = self._context.Process(
+            target=worker_main, args=(worker, self.queue.path, self.metrics_dir), name=f"scraper-worker-{slot}", daemon=True
+        )
+        process.start()
+        self._workers[slot] = (worker, process, time.time())
+
+    async def start(self):
+        # Les métriques d'une exécution précédente de l'API ne sont pas reprises
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(self.metrics_dir, "*.json")):
+            os.remove(path)
+        for slot in range(self.processes):
+            self._spawn(slot)
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            await asyncio.gather(self._monitor_task, return_exceptions=True)
+        for worker, process, _ in self._workers.values():
+            process.terminate()
+        for worker, process, _ in self._workers.values():
+            await asyncio.to_thread(process.join, 10)
+            self.queue.requeue_worker(worker)
+        self._workers = {}
+
+    def check(self):
+        """
+        Relance les workers morts et remet en file les tâches perdues.
+        """
+        for slot, (worker, process, _) in list(self._workers.items()):
+            if not process.is_alive():
+                self.queue.requeue_worker(worker)
+                self.restarts += 1
+                self._spawn(slot)
+        self.queue.requeue_expired()
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self.check()
+
+    def metrics(self):
+        """
+        Instantanés {worker: métriques} publiés par les workers, y compris les
+        workers arrêtés ou relancés (compteurs et histogrammes conservés) ;
+        les jauges ne sont gardées que pour les workers vivants.
+        """
+        alive = {worker for worker, process, _ in self._workers.values() if process.is_alive()}
+        snapshots = {}
+        for path in glob.glob(os.path.join(self.metrics_dir, "*.json")):
+            worker = os.path.basename(path)[:-len(".json")]
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if worker not in alive:
+                snapshot = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+            snapshots[worker] = snapshot
+        return snapshots
+
+    def stats(self):
+        return {
+            "workers": [
+                {"id": worker, "pid": process.pid, "alive": process.is_alive(), "started_at": started_at}
+                for worker, process, started_at in self._workers.values()
+            ],
+            "restarts": self.restarts,
+            "tasks": self.queue.stats(),
+            "memory": memory_watchdog.stats(),
+        }
+
+
+def remote_scraper(queue, supplier, clean_output, poll_interval=WORKER_POLL_INTERVAL):
+    """
+    Scraper de même signature que scrape_* qui dépose les produits dans la file
+    et attend les lignes produites par les workers.
+    """
+    async def scrape(payload, headless=True, pool=None, on_result=None, collect=True):
+        if not memory_watchdog.admit():
+            raise MemoryPressure(f"memory usage above {memory_watchdog.ratios[1]:.0%} of the limit")
+        total = len(payload["data"])
+        # Requêtes SQLite bloquantes : hors de la boucle d'événements
+        batch_id = await asyncio.to_thread(queue.enqueue, supplier, payload)
+        rows = [None] * total
+        remaining = total
+        try:
+            while remaining:
+                for index, row in await asyncio.to_thread(queue.take_completed, batch_id):
+                    remaining -= 1
+                    if on_result:
+                        on_result(index, row)
+                    if collect:
+                        rows[index] = row
+                if remaining:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            await asyncio.to_thread(queue.delete, batch_id)
+
+        if not collect:
+            return None
+        output = clean_output(rows)
+        output.attrs["resource_stats"] = None
+        return output
+
+    return scrape
@@ -0,0 +1,68 @@
+import asyncio
+
+from scrapers.adaptive_waits import AdaptiveWaits
+from scrapers.extraction import WAIT_TIMEOUT
+from scrapers.metrics import render_metrics
+
+
+class SlowPage:
+    """
+    Page dont les sélecteurs apparaissent après `delays[sélecteur]` ms (jamais si absent).
+    """
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def wait_for_selector(self, selector, timeout):
+        delay = self.delays.get(selector)
+        if delay is None or delay > timeout:
+            await asyncio.sleep(0)
+            raise TimeoutError(selector)
+
+
+def test_stats_use_each_field_default_timeout():
+    waits = AdaptiveWaits("test-defaults", min_samples=1000, product_budget_ms=6000)
+    fields = [{"field": "name", "selector": "h1", "timeout": 2000}, {"field": "price", "selector": ".price", "wait": True}]
+    asyncio.run(waits.wait_for_fields(SlowPage({"h1": 0, ".price": 0}), fields))
+
+    # Sans assez d'observations : délai par défaut du champ, borné par le budget du produit
+    assert waits.stats()["timeouts_ms"] == {"h1": 2000, ".price": min(6000, WAIT_TIMEOUT)}
+
+
+def test_cut_short_and_skipped_waits_are_exported():
+    waits = AdaptiveWaits("test-metrics", min_samples=1, floor_ms=10, margin=0)
+    field = {"field": "price", "selector": ".price", "timeout": 1000}
+    asyncio.run(waits.wait_for_fields(SlowPage({".price": 0}), [field]))
+    asyncio.run(waits.wait_for_fields(SlowPage({}), [field]))
+    assert waits.counters["wait_ms_saved"] == 0
+    # Le sélecteur est retrouvé dans le délai appris : l'attente écourtée était bien un élément absent
+    asyncio.run(waits.wait_for_fields(SlowPage({".price": 0}), [field]))
+    waits.skip_consent()
+
+    metrics = render_metrics()
+    assert 'scraper_selector_waits_total{supplier="test-metrics",outcome="found"} 2' in metrics
+    assert 'scraper_selector_waits_total{supplier="test-metrics",outcome="cut_short"} 1' in metrics
+    assert 'scraper_wait_seconds_saved_total{supplier="test-metrics"} 0.99' in metrics
+    assert 'scraper_consent_skipped_total{supplier="test-metrics"} 1' in metrics
+
+
+def test_learned_timeout_recovers_when_the_site_slows_down():
+    waits = AdaptiveWaits("test-slowdown", min_samples=20, margin=0.5, floor_ms=100, reset_after=5)
+    field = {"field": "name", "selector": "h1", "timeout": 3000}
+    for _ in range(50):
+        waits.observe("h1", 100)
+    assert waits.timeout("h1", 3000) == 150
+
+    # Le site passe à 900 ms : les attentes sont écourtées jusqu'à l'oubli du délai appris
+    page = SlowPage({"h1": 900})
+    for _ in range(5):
+        asyncio.run(waits.wait_for_fields(page, [field]))
+    assert waits.counters["waits_cut_short"] == 5
+    assert waits.counters["timeouts_reset"] == 1
+    assert waits.counters["wait_ms_saved"] == 0
+    assert waits.timeout("h1", 3000) == 3000
+
+    for _ in range(20):
+        asyncio.run(waits.wait_for_fields(page, [field]))
+    assert waits.counters["waits_cut_short"] == 5
+    assert waits.counters["waits_timed_out"] == 5
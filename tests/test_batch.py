@@ -0,0 +1,202 @@
+import asyncio
+
+import pytest
+
+import scrapers.listing as listing
+from benchmarks.fixture_server import SESSION_COOKIE, start_servers
+from scrapers.batch import InvalidBatch, scrape_batch
+from scrapers.browser_pool import MemoryPressure, PoolExhausted
+from scrapers.jobs import DONE, FAILED, JobManager, MemoryJobStore
+from scrapers.listing import ListingIndex, product_key, scrape_listing
+from scrapers.records import Record, RecordSet
+from scrapers.result_cache import CachedRun, MemoryResultBackend, ResultCache
+from scrapers.scraper_voltaneo import LISTING_SPEC_VOLTANEO, clean_output_voltaneo, is_login_page_voltaneo
+from scrapers.session_cache import account_key
+
+PORT = 18910
+CREDENTIALS = {"username": "alice", "password": "x"}
+
+
+class FakeContext:
+    """
+    Contexte Playwright réduit aux cookies de la session du serveur de test.
+    """
+
+    async def storage_state(self):
+        return {"cookies": [{"name": SESSION_COOKIE, "value": "bench", "domain": "127.0.0.1", "path": "/"}]}
+
+
+def listing_scraper(cache):
+    """
+    Scraper Voltaneo en mode listing (pages de liste en HTTP) ; les pages
+    produit sont remplacées par des lignes "visited".
+    """
+    async def scrape(payload, pool=None, on_result=None, collect=True):
+        run = CachedRun(cache, "voltaneo", payload, on_result)
+
+        async def visit(items, on_result):
+            rows = [{**item, "name": "visited", "is_ok": 1, "error": None} for item in items]
+            for i, row in enumerate(rows):
+                on_result(i, row)
+            return rows
+
+        results = await scrape_listing(
+            FakeContext(), None, run, LISTING_SPEC_VOLTANEO, is_login_page_voltaneo, visit, payload
+        )
+        return clean_output_voltaneo(run.merge(results))
+
+    return scrape
+
+
+async def echo_scraper(payload, pool=None, on_result=None, collect=True):
+    return RecordSet(Record({**item, "name": "echo", "is_ok": 1}) for item in payload["data"])
+
+
+def run_with_servers(test):
+    async def main():
+        runners, urls = await start_servers(PORT)
+        try:
+            return await test(urls)
+        finally:
+            for runner in runners:
+                await runner.cleanup()
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    index = ListingIndex(str(tmp_path / "listings.sqlite3"))
+    monkeypatch.setattr(listing, "listing_index", index)
+    return index
+
+
+def test_listing_mode_through_batch_keeps_payload_order(index):
+    async def test(urls):
+        base = urls["voltaneo"]
+        cache = ResultCache(MemoryResultBackend())
+        for n in (1, 3):
+            url = f"{base}/produit/{n}"
+            index.record("voltaneo", {product_key(url): f"{base}/categorie/5"})
+            cache.put("voltaneo", account_key(CREDENTIALS), url, {"url": url, "name": "cached", "description": "Description"})
+        suppliers = {"voltaneo": (listing_scraper(cache), None), "eklor": (echo_scraper, None)}
+        payload = {
+            "mode": "listing",
+            "details": True,
+            "credentials": {"voltaneo": CREDENTIALS, "eklor": CREDENTIALS},
+            "data": [
+                {"supplier": "voltaneo", "url": f"{base}/produit/3"},
+                {"supplier": "eklor", "url": "https://eklor.test/produit/1"},
+                {"supplier": "voltaneo", "url": f"{base}/produit/99"},
+                {"supplier": "voltaneo", "url": f"{base}/produit/1"},
+            ],
+        }
+        return payload, await scrape_batch(payload, suppliers)
+
+    payload, records = run_with_servers(test)
+
+    assert [record.url for record in records] == [item["url"] for item in payload["data"]]
+    # Produits 1 et 3 relus sur la page de liste, 99 visité (absent de la catégorie)
+    assert [record.name for record in records] == ["Produit Voltaneo 3", "echo", "visited", "Produit Voltaneo 1"]
+    assert records[0].description == "Description"
+
+
+def test_batch_rejects_explicit_listings():
+    payload = {
+        "mode": "listing",
+        "listings": ["https://webshop.voltaneo.com/categorie/5"],
+        "credentials": {"voltaneo": CREDENTIALS},
+        "data": [],
+    }
+    with pytest.raises(InvalidBatch):
+        asyncio.run(scrape_batch(payload, {"voltaneo": (echo_scraper, None)}))
+
+
+def test_job_counts_products_discovered_in_listings():
+    async def test(urls):
+        base = urls["voltaneo"]
+        jobs = JobManager(MemoryJobStore(), {"voltaneo": (listing_scraper(ResultCache(MemoryResultBackend())), clean_output_voltaneo)})
+        await jobs.start()
+        try:
+            job = jobs.submit("voltaneo", {
+                "mode": "listing",
+                "details": False,
+                "listings": [f"{base}/categorie/5"],
+                "credentials": CREDENTIALS,
+                "data": [{"url": f"{base}/produit/2"}],
+            })
+            while jobs.get(job.id).status not in (DONE, FAILED):
+                await asyncio.sleep(0.01)
+            return jobs.get(job.id), jobs.results_json(job)
+        finally:
+            await jobs.stop()
+
+    job, results = run_with_servers(test)
+
+    assert job.status == DONE
+    assert (job.total, job.done, job.errors) == (5, 5, 0)
+    assert results.count(b'"url"') == 5
+
+
+def test_batch_refused_by_every_supplier_raises_pool_exhausted():
+    async def busy_scraper(payload, pool=None, on_result=None, collect=True):
+        raise MemoryPressure("memory usage above 85% of the limit")
+
+    payload = {
+        "credentials": {"voltaneo": CREDENTIALS, "eklor": CREDENTIALS},
+        "data": [{"supplier": "voltaneo", "url": "https://voltaneo.test/1"}, {"supplier": "eklor", "url": "https://eklor.test/1"}],
+    }
+    with pytest.raises(PoolExhausted):
+        asyncio.run(scrape_batch(payload, {"voltaneo": (busy_scraper, None), "eklor": (busy_scraper, None)}))
+
+    # Un seul fournisseur refusé : ses lignes sont en erreur, les autres sont servies
+    records = asyncio.run(scrape_batch(payload, {"voltaneo": (busy_scraper, None), "eklor": (echo_scraper, None)}))
+    assert [(record.is_ok, record.name) for record in records] == [(0, None), (1, "echo")]
+
+
+def test_batch_rows_follow_payload_order_across_suppliers():
+    async def slow_scraper(payload, pool=None, on_result=None, collect=True):
+        # Termine après les autres fournisseurs
+        await asyncio.sleep(0.01)
+        return RecordSet(Record({**item, "name": "slow", "is_ok": 1}) for item in payload["data"])
+
+    async def failing_scraper(payload, pool=None, on_result=None, collect=True):
+        return [{"error": "login_failed"}]
+
+    payload = {
+        "credentials": {"eklor": CREDENTIALS, "Powr Connect": CREDENTIALS, "voltaneo": CREDENTIALS},
+        "data": [
+            {"supplier": "eklor", "url": "https://eklor.test/1"},
+            {"supplier": "powr_connect", "url": "https://powr.test/1"},
+            {"supplier": "voltaneo", "url": "https://voltaneo.test/1"},
+            {"supplier": "eklor", "url": "https://eklor.test/2"},
+            {"supplier": "Voltaneo", "url": "https://voltaneo.test/2"},
+        ],
+    }
+    suppliers = {"eklor": (echo_scraper, None), "powr-connect": (slow_scraper, None), "voltaneo": (failing_scraper, None)}
+
+    records = asyncio.run(scrape_batch(payload, suppliers))
+
+    assert [record.url for record in records] == [item["url"] for item in payload["data"]]
+    assert [record.is_ok for record in records] == [1, 1, 0, 1, 0]
+    assert records[1].name == "slow"
+    assert records[2].error == "voltaneo: login_failed"
+
+
+def test_batch_tracking_can_filter_rows_without_shifting_others():
+    payload = {
+        "credentials": {"eklor": CREDENTIALS, "voltaneo": CREDENTIALS},
+        "data": [
+            {"supplier": "eklor", "url": "https://eklor.test/1"},
+            {"supplier": "voltaneo", "url": "https://voltaneo.test/1"},
+            {"supplier": "eklor", "url": "https://eklor.test/2"},
+            {"supplier": "voltaneo", "url": "https://voltaneo.test/2"},
+        ],
+    }
+
+    def track(supplier, records, group):
+        # Ne garde que les produits "2" (changes_only)
+        return RecordSet(record for record in records if record.url.endswith("2"))
+
+    records = asyncio.run(scrape_batch(payload, {"eklor": (echo_scraper, None), "voltaneo": (echo_scraper, None)}, track=track))
+
+    assert [record.url for record in records] == ["https://eklor.test/2", "https://voltaneo.test/2"]
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+from scrapers.capture import CaptureStore, HtmlCapture, load_blob
+
+HTML = "<html><body><h1>Produit</h1></body></html>"
+
+
+class RecordingStore(CaptureStore):
+    """
+    Store qui note le thread de chaque enregistrement.
+    """
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.threads = []
+
+    def save(self, supplier, item, html):
+        self.threads.append(threading.current_thread())
+        return super().save(supplier, item, html)
+
+
+def test_pages_are_saved_off_the_event_loop(tmp_path):
+    store = RecordingStore(str(tmp_path))
+    capture = HtmlCapture(store, "eklor")
+    items = [{"url": f"https://eklor.test/produit/{n}"} for n in range(8)]
+
+    async def main():
+        # Même page pour tous les produits : un seul fichier, écrit sans conflit
+        await asyncio.gather(*(capture.save(item, HTML) for item in items))
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+
+    assert len(store.threads) == len(items)
+    assert all(thread is not loop_thread for thread in store.threads)
+    captures = store.latest("eklor")
+    assert sorted(item["url"] for _, item, _ in captures) == [item["url"] for item in items]
+    assert {digest for digest, _, _ in captures} == {captures[0][0]}
+    assert load_blob(str(tmp_path), captures[0][0]) == HTML
+    assert not list(tmp_path.glob("blobs/*/*.tmp"))
@@ -0,0 +1,42 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from scrapers.host_scheduler import HostLimits, HostScheduler, is_transient
+
+URL = "https://eklor.test/produit/1"
+
+
+def test_dropped_connections_and_timeouts_are_transient():
+    assert is_transient(aiohttp.ServerDisconnectedError())
+    assert is_transient(aiohttp.ClientOSError(104, "Connection reset by peer"))
+    assert is_transient(asyncio.TimeoutError())
+    assert not is_transient(aiohttp.ClientSSLError(None, OSError("certificate verify failed")))
+    assert not is_transient(ValueError("parse error"))
+
+
+def test_server_disconnect_is_retried():
+    scheduler = HostScheduler(HostLimits(rate=0, attempts=3, base_delay=0))
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) < 3:
+            raise aiohttp.ServerDisconnectedError()
+        return "ok"
+
+    assert asyncio.run(scheduler.call(URL, request)) == "ok"
+    stats = scheduler.stats()["eklor.test"]
+    assert (stats["requests"], stats["retries"], stats["transient_failures"]) == (3, 2, 2)
+
+
+def test_non_transient_errors_are_not_retried():
+    scheduler = HostScheduler(HostLimits(rate=0, attempts=3, base_delay=0))
+
+    async def request():
+        raise ValueError("parse error")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.call(URL, request))
+    assert scheduler.stats()["eklor.test"]["requests"] == 1
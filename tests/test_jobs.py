@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from scrapers.records import Record, RecordSet
+from scrapers.jobs import CANCELLED, DONE, INTERRUPTED, RUNNING, JobManager, MemoryJobStore, SQLiteJobStore
+
+PAYLOAD = {"credentials": {"username": "alice", "password": "x"}, "data": [{"url": "https://example.test/produit/1"}]}
+
+
+async def blocking_scraper(payload, pool=None, on_result=None, collect=True):
+    await asyncio.Event().wait()
+
+
+async def running_job(jobs):
+    await jobs.start()
+    job = jobs.submit("eklor", dict(PAYLOAD))
+    while jobs.get(job.id).status != RUNNING:
+        await asyncio.sleep(0.01)
+    return job
+
+
+def test_cancelled_job():
+    async def main():
+        jobs = JobManager(MemoryJobStore(), {"eklor": (blocking_scraper, None)})
+        job = await running_job(jobs)
+        await jobs.cancel(job.id)
+        await jobs.stop()
+        return jobs.get(job.id)
+
+    assert asyncio.run(main()).status == CANCELLED
+
+
+def test_job_running_at_shutdown_is_interrupted():
+    async def main():
+        jobs = JobManager(MemoryJobStore(), {"eklor": (blocking_scraper, None)})
+        job = await running_job(jobs)
+        await jobs.stop()
+        return jobs.get(job.id)
+
+    job = asyncio.run(main())
+    assert job.status == INTERRUPTED
+    assert job.finished_at is not None
+
+
+class RecordingStore(SQLiteJobStore):
+    """
+    Store SQLite qui note le nombre de lignes et le thread de chaque écriture.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.writes = []
+
+    def save_progress(self, job, rows):
+        self.writes.append((len(rows), threading.current_thread()))
+        super().save_progress(job, rows)
+
+
+def test_rows_and_progress_are_written_in_batches_off_the_loop(tmp_path):
+    data = [{"url": f"https://example.test/produit/{n}"} for n in range(25)]
+    partial = []
+
+    async def scraper(payload, pool=None, on_result=None, collect=True):
+        for index, item in enumerate(payload["data"]):
+            on_result(index, {**item, "is_ok": 1})
+            await asyncio.sleep(0)
+        # Lignes écrites par lots avant la fin du job
+        for _ in range(100):
+            if len(store.rows(job.id)) >= 20:
+                break
+            await asyncio.sleep(0.01)
+        partial.extend(store.rows(job.id))
+        return RecordSet(Record({**item, "is_ok": 1}) for item in payload["data"])
+
+    store = RecordingStore(str(tmp_path / "jobs.sqlite3"))
+    jobs = JobManager(store, {"eklor": (scraper, None)}, flush_rows=10, flush_interval=10)
+
+    async def main():
+        nonlocal job
+        await jobs.start()
+        job = jobs.submit("eklor", {**PAYLOAD, "data": data})
+        while jobs.get(job.id).status != DONE:
+            await asyncio.sleep(0.01)
+        await jobs.stop()
+        return jobs.get(job.id), threading.current_thread()
+
+    job = None
+    job, loop_thread = asyncio.run(main())
+
+    assert (job.done, job.total) == (25, 25)
+    assert len(partial) >= 20
+    # Écriture "running", lots de lignes, puis état final sans les lignes déjà dans les résultats
+    assert sum(count for count, _ in store.writes) <= 25
+    assert len(store.writes) < 25
+    assert all(thread is not loop_thread for _, thread in store.writes)
+    assert store.rows(job.id) == []
+    assert store.results(job.id).count(b'"url"') == 25
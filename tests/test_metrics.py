@@ -0,0 +1,37 @@
+import json
+
+from scrapers.metrics import Counter, Gauge, Histogram, dump_metrics, render_metrics, snapshot_metrics
+from scrapers.workers import WorkerSupervisor
+
+PAGES = Counter("test_pages_total", "Pages", labels=("supplier",))
+ACTIVE = Gauge("test_active", "Actifs", labels=("supplier",))
+SECONDS = Histogram("test_seconds", "Durées", labels=("supplier",), buckets=(1, 10))
+
+
+def test_worker_snapshots_are_merged(tmp_path):
+    PAGES.inc(2, supplier="eklor")
+    ACTIVE.set(1, supplier="eklor")
+    SECONDS.observe(0.5, supplier="eklor")
+    dump_metrics(str(tmp_path / "w1.json"))
+    worker = json.loads((tmp_path / "w1.json").read_text())
+    assert worker == json.loads(json.dumps(snapshot_metrics()))
+
+    metrics = render_metrics({"w1": worker, "w2": worker})
+
+    # Compteurs et histogrammes additionnés (API + deux workers), jauges par worker
+    assert 'test_pages_total{supplier="eklor"} 6' in metrics
+    assert 'test_seconds_bucket{supplier="eklor",le="1"} 3' in metrics
+    assert 'test_seconds_count{supplier="eklor"} 3' in metrics
+    assert 'test_active{supplier="eklor"} 1' in metrics
+    assert 'test_active{supplier="eklor",worker="w2"} 1' in metrics
+
+
+def test_gauges_of_stopped_workers_are_dropped(tmp_path):
+    PAGES.inc(supplier="voltaneo")
+    ACTIVE.set(3, supplier="voltaneo")
+    dump_metrics(str(tmp_path / "0-dead.json"))
+
+    snapshots = WorkerSupervisor(None, metrics_dir=str(tmp_path)).metrics()
+
+    assert "test_pages_total" in snapshots["0-dead"]
+    assert "test_active" not in snapshots["0-dead"]
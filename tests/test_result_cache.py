@@ -0,0 +1,46 @@
+import sqlite3
+
+from scrapers.result_cache import (
+    CachedRun, MemoryResultBackend, ResultCache, SQLiteResultBackend
+)
+
+URL = "https://example.test/produit/1"
+ROW = {"url": URL, "name": "Produit", "price_per_unit": "10,00 €", "stock": "En stock", "is_ok": 1}
+
+
+def payload(username, password="x", **extra):
+    return {"credentials": {"username": username, "password": password}, "data": [{"url": URL}], **extra}
+
+
+def test_entries_are_kept_per_account():
+    cache = ResultCache(MemoryResultBackend())
+    cache.put("eklor", "alice", URL, ROW)
+
+    assert cache.get("eklor", "alice", URL, 60)[0]["price_per_unit"] == "10,00 €"
+    assert cache.get("eklor", "bob", URL, 60) is None
+    assert cache.static_fields("eklor", "bob", URL) is None
+
+
+def test_cached_run_only_serves_its_own_account():
+    cache = ResultCache(MemoryResultBackend())
+    run = CachedRun(cache, "eklor", payload("alice"))
+    run.on_result(0, dict(ROW))
+
+    assert CachedRun(cache, "eklor", payload("alice", max_cache_age=60)).to_scrape == []
+    assert CachedRun(cache, "eklor", payload("bob", max_cache_age=60)).to_scrape == [{"url": URL}]
+    assert CachedRun(cache, "eklor", payload("alice", "wrong", max_cache_age=60)).to_scrape == [{"url": URL}]
+
+
+def test_sqlite_backend_drops_the_shared_cache(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE results (supplier TEXT, url TEXT, entry TEXT, PRIMARY KEY (supplier, url))")
+    db.execute("INSERT INTO results VALUES ('eklor', ?, '{}')", (URL,))
+    db.commit()
+    db.close()
+
+    cache = ResultCache(SQLiteResultBackend(path))
+    assert cache.get("eklor", "", URL, 60) is None
+    cache.put("eklor", "alice", URL, ROW)
+    assert cache.get("eklor", "alice", URL, 60) is not None
+    assert cache.get("eklor", "bob", URL, 60) is None
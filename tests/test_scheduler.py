@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from scrapers.scheduler import FairScheduler, Ticket, parse_weights
+
+BULK = Ticket("bulk-tenant", "bulk")
+INTERACTIVE = Ticket("interactive-tenant", "interactive")
+
+
+def test_reserved_places_are_kept_for_interactive_requests():
+    async def main():
+        scheduler = FairScheduler(capacity=2, reserved=1, weights={})
+        await scheduler.acquire(BULK)
+        second_bulk = asyncio.create_task(scheduler.acquire(BULK))
+        await asyncio.sleep(0)
+        # Le lot en attente ne bloque pas la requête interactive
+        await asyncio.wait_for(scheduler.acquire(INTERACTIVE), 1)
+        blocked = not second_bulk.done()
+        scheduler.release(INTERACTIVE)
+        await asyncio.sleep(0)
+        still_blocked = not second_bulk.done()
+        scheduler.release(BULK)
+        await asyncio.wait_for(second_bulk, 1)
+        return blocked, still_blocked
+
+    assert asyncio.run(main()) == (True, True)
+
+
+def test_tenant_cap_lets_other_tenants_through():
+    async def main():
+        scheduler = FairScheduler(capacity=4, tenant_cap=1, weights={})
+        await scheduler.acquire(BULK)
+        waiting = asyncio.create_task(scheduler.acquire(BULK))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.acquire(Ticket("other", "bulk")), 1)
+        capped = not waiting.done()
+        scheduler.release(BULK)
+        await asyncio.wait_for(waiting, 1)
+        return capped, scheduler.stats()["tenants"]["bulk-tenant"]["active"]
+
+    assert asyncio.run(main()) == (True, 1)
+
+
+def test_weights_must_be_positive():
+    assert parse_weights("key:abc:2, eklor:acme:0.5") == {"key:abc": 2.0, "eklor:acme": 0.5}
+    for value in ("eklor:acme:0", "eklor:acme:-1", "eklor:acme:fast", "eklor:acme:nan"):
+        with pytest.raises(ValueError, match="eklor:acme"):
+            parse_weights(value)
@@ -0,0 +1,44 @@
+import asyncio
+
+from scrapers.session_cache import SessionCache, SupplierSession, account_key
+
+STATE = {"cookies": [{"name": "session", "value": "alice", "domain": "example.test", "path": "/"}]}
+
+
+class FakeContext:
+    async def storage_state(self):
+        return STATE
+
+
+def test_wrong_password_does_not_reuse_the_session():
+    cache = SessionCache(directory=None)
+    logins = []
+
+    async def login(page, username, password):
+        logins.append(password)
+
+    async def open_session(password):
+        session = SupplierSession(cache, "eklor", {"username": "alice", "password": password}, login)
+        await session.open(FakeContext(), None)
+        return session
+
+    async def main():
+        await open_session("secret")
+        restored = await open_session("secret")
+        intruder = await open_session("guess")
+        return restored, intruder
+
+    restored, intruder = asyncio.run(main())
+
+    assert restored.restored_state == STATE
+    assert intruder.restored_state is None
+    assert logins == ["secret", "guess"]
+
+
+def test_account_key_depends_on_the_password():
+    alice = {"username": "alice", "password": "secret"}
+
+    assert account_key(alice) == account_key(dict(alice))
+    assert account_key(alice) != account_key({**alice, "password": "guess"})
+    assert account_key(alice).startswith("alice#")
+    assert "secret" not in account_key(alice)
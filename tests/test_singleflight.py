@@ -0,0 +1,49 @@
+import asyncio
+
+from scrapers.singleflight import SingleFlight, coalesce
+
+
+def test_same_account_shares_the_visit():
+    async def scenario():
+        flights = SingleFlight()
+        visits = []
+
+        first = {"url": "https://example.test/p", "manufacturer": "a"}
+        second = {"url": "https://example.test/p", "manufacturer": "b"}
+
+        async def visit():
+            visits.append(1)
+            await asyncio.sleep(0.01)
+            return {**first, "price_per_unit": "10"}
+        rows = await asyncio.gather(
+            coalesce(flights, "http", "eklor", "alice", first, visit),
+            coalesce(flights, "http", "eklor", "alice", second, visit),
+        )
+        return visits, rows
+
+    visits, rows = asyncio.run(scenario())
+    assert len(visits) == 1
+    assert [row["manufacturer"] for row in rows] == ["a", "b"]
+
+
+def test_other_account_is_visited_separately():
+    async def scenario():
+        flights = SingleFlight()
+        seen = []
+
+        def visit_as(username):
+            async def visit():
+                seen.append(username)
+                await asyncio.sleep(0.01)
+                return {"url": "https://example.test/p", "price_per_unit": username}
+            return visit
+
+        item = {"url": "https://example.test/p"}
+        return seen, await asyncio.gather(
+            coalesce(flights, "http", "eklor", "alice", item, visit_as("alice")),
+            coalesce(flights, "http", "eklor", "bob", item, visit_as("bob")),
+        )
+
+    seen, rows = asyncio.run(scenario())
+    assert sorted(seen) == ["alice", "bob"]
+    assert [row["price_per_unit"] for row in rows] == ["alice", "bob"]
@@ -0,0 +1,28 @@
+from scrapers.records import Record, RecordSet
+from scrapers.snapshots import CHANGED, NEW, UNCHANGED, SnapshotStore
+
+URL = "https://example.test/produit/1"
+
+
+def records(price):
+    return RecordSet([Record({"url": URL, "is_ok": 1, "price_per_unit_1": price, "stock": "En stock"})])
+
+
+def test_states_are_compared_per_account(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+
+    assert store.compare("eklor", "alice", records(10.0))[0][0] == NEW
+    assert store.compare("eklor", "bob", records(12.0))[0][0] == NEW
+    assert store.compare("eklor", "alice", records(10.0))[0][0] == UNCHANGED
+    change_type, changes = store.compare("eklor", "bob", records(11.0))[0]
+    assert change_type == CHANGED
+    assert changes == {"price_per_unit_1": {"old": 12.0, "new": 11.0}}
+
+
+def test_changes_only_keeps_new_and_changed_rows(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.sqlite3"))
+    store.compare("eklor", "alice", records(10.0))
+
+    assert len(store.changes("eklor", "alice", records(10.0))) == 0
+    changed = store.changes("eklor", "alice", records(9.0))
+    assert [record.change_type for record in changed] == [CHANGED]
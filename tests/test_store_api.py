@@ -0,0 +1,114 @@
+import asyncio
+
+import scrapers.store_api as store_api
+from benchmarks.fixture_server import SESSION_COOKIE, start_servers
+from scrapers.http_engine import HttpFetcher
+from scrapers.scraper_voltaneo import build_product_voltaneo_api, parse_product_voltaneo
+from scrapers.store_api import StoreApiClient, fetch_store_products, scrape_store_api
+
+PORT = 18920
+COMPARED_FIELDS = (
+    "name", "description", "technical_ref",
+    "unit_1", "price_per_unit_1", "unit_2", "price_per_unit_2", "unit_3", "price_per_unit_3",
+)
+
+
+class FakeContext:
+    """
+    Contexte Playwright réduit à ses cookies (connecté au serveur de test ou non).
+    """
+
+    def __init__(self, logged_in=True):
+        self.logged_in = logged_in
+
+    async def storage_state(self):
+        cookies = [{"name": SESSION_COOKIE, "value": "bench", "domain": "127.0.0.1", "path": "/"}]
+        return {"cookies": cookies if self.logged_in else []}
+
+
+class FakeSession:
+    supplier = "voltaneo"
+
+
+def run_with_servers(test):
+    async def main():
+        runners, urls = await start_servers(PORT)
+        try:
+            return await test(urls["voltaneo"])
+        finally:
+            for runner in runners:
+                await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_api_rows_match_product_pages():
+    async def test(base):
+        data = [{"url": f"{base}/produit/{n}"} for n in range(9)]
+        async with HttpFetcher() as fetcher:
+            await fetcher.sync_cookies(FakeContext())
+            client = StoreApiClient(fetcher, base)
+            assert await client.authenticate(f"{base}/mon-compte/")
+            rows = await fetch_store_products(client, build_product_voltaneo_api, data)
+            pages = [parse_product_voltaneo((await fetcher.fetch(item["url"]))[2], item) for item in data]
+        return rows, pages
+
+    rows, pages = run_with_servers(test)
+
+    for row, page in zip(rows, pages):
+        assert {field: row[field] for field in COMPARED_FIELDS} == {field: page[field] for field in COMPARED_FIELDS}
+        # Libellé de l'API ("12 en stock") au lieu de celui de la page
+        assert row["stock"].endswith("en stock")
+
+
+def test_missing_and_unknown_products_fall_back_to_the_browser(monkeypatch):
+    resumed = []
+
+    async def resume_with_browser(context, page, session, scrape_product, data, results, *args):
+        resumed.extend(item["url"] for item, result in zip(data, results) if result is None)
+        return results
+
+    monkeypatch.setattr(store_api, "resume_with_browser", resume_with_browser)
+
+    async def test(base):
+        # Produit 9 sans libellé de stock (missing_every=10), produit inconnu de l'API
+        data = [{"url": f"{base}/produit/{n}"} for n in (8, 9)] + [{"url": f"{base}/produit/inconnu"}]
+        results = await scrape_store_api(
+            FakeContext(), None, FakeSession(), None, build_product_voltaneo_api, data, base, f"{base}/mon-compte/"
+        )
+        return data, results
+
+    data, results = run_with_servers(test)
+
+    assert results[0]["name"] == "Produit Voltaneo 8"
+    assert resumed == [data[1]["url"], data[2]["url"]]
+
+
+def test_batch_is_resumed_with_the_browser_without_nonce(monkeypatch):
+    resumed = []
+    lookups = []
+
+    async def lookup(self, refs):
+        # Sans nonce, la vraie API répondrait avec les prix publics
+        lookups.append(refs)
+        return []
+
+    monkeypatch.setattr(StoreApiClient, "lookup", lookup)
+
+    async def resume_with_browser(context, page, session, scrape_product, data, results, *args):
+        resumed.extend(item["url"] for item, result in zip(data, results) if result is None)
+        return results
+
+    monkeypatch.setattr(store_api, "resume_with_browser", resume_with_browser)
+
+    async def test(base):
+        data = [{"url": f"{base}/produit/{n}"} for n in range(3)]
+        await scrape_store_api(
+            FakeContext(logged_in=False), None, FakeSession(), None, build_product_voltaneo_api, data,
+            base, f"{base}/mon-compte/"
+        )
+        return data
+
+    data = run_with_servers(test)
+
+    assert lookups == []
+    assert resumed == [item["url"] for item in data]
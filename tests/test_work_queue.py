@@ -0,0 +1,101 @@
+import asyncio
+
+from scrapers.records import Record, RecordSet
+from scrapers.work_queue import SQLiteWorkQueue
+from scrapers.workers import remote_scraper, run_lease
+
+CREDENTIALS = {"username": "alice", "password": "x"}
+
+
+def clean_output(rows):
+    return RecordSet(Record(row) for row in rows)
+
+
+def test_remote_scraper_returns_rows_in_payload_order(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    payload = {"credentials": CREDENTIALS, "data": [{"url": f"https://example.test/produit/{n}"} for n in range(5)]}
+
+    async def worker():
+        # Tâches terminées dans le désordre, en deux baux
+        while True:
+            lease = await asyncio.to_thread(queue.lease, "w1", 3, 60)
+            if lease is None:
+                await asyncio.sleep(0.01)
+                continue
+            for task_id, item in reversed(lease["tasks"]):
+                queue.complete(task_id, {**item, "name": item["url"][-1], "is_ok": 1})
+
+    async def main():
+        task = asyncio.create_task(worker())
+        received = []
+        try:
+            records = await remote_scraper(queue, "eklor", clean_output, poll_interval=0.01)(
+                payload, on_result=lambda index, row: received.append(index)
+            )
+        finally:
+            task.cancel()
+        return records, received
+
+    records, received = asyncio.run(main())
+
+    assert [record.name for record in records] == ["0", "1", "2", "3", "4"]
+    assert sorted(received) == [0, 1, 2, 3, 4]
+    assert queue.stats() == {"pending": 0, "leased": 0, "done": 0}
+
+
+def test_completed_rows_keep_their_payload_index(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    payload = {"credentials": CREDENTIALS, "data": [{"url": f"https://example.test/produit/{n}"} for n in range(4)]}
+    batch_id = queue.enqueue("eklor", payload)
+
+    lease = queue.lease("w1", 10, 60)
+    assert [item["url"] for _, item in lease["tasks"]] == [item["url"] for item in payload["data"]]
+    (id0, item0), (id1, item1), (id2, item2), (id3, item3) = lease["tasks"]
+    queue.complete(id2, {**item2, "is_ok": 1})
+    queue.complete(id0, {**item0, "is_ok": 1})
+
+    assert sorted((index, row["url"]) for index, row in queue.take_completed(batch_id)) == [
+        (0, item0["url"]), (2, item2["url"])
+    ]
+    # Une ligne n'est livrée qu'une fois
+    assert queue.take_completed(batch_id) == []
+
+    queue.complete(id3, {**item3, "is_ok": 1})
+    queue.complete(id1, {**item1, "is_ok": 1})
+    assert sorted(index for index, _ in queue.take_completed(batch_id)) == [1, 3]
+
+
+def test_requeued_tasks_keep_their_index(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"), max_attempts=2)
+    payload = {"credentials": CREDENTIALS, "data": [{"url": f"https://example.test/produit/{n}"} for n in range(3)]}
+    batch_id = queue.enqueue("eklor", payload)
+
+    queue.lease("w1", 2, 60)
+    assert queue.requeue_worker("w1") == 2
+    lease = queue.lease("w2", 3, 60)
+    for task_id, item in reversed(lease["tasks"]):
+        queue.complete(task_id, {**item, "is_ok": 1})
+
+    rows = dict(queue.take_completed(batch_id))
+    assert {index: row["url"] for index, row in rows.items()} == {
+        index: item["url"] for index, item in enumerate(payload["data"])
+    }
+
+
+def test_run_lease_completes_missing_rows_with_the_error(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.sqlite3"))
+    payload = {"credentials": CREDENTIALS, "data": [{"url": f"https://example.test/produit/{n}"} for n in range(3)]}
+    batch_id = queue.enqueue("eklor", payload)
+
+    async def scrape(payload, pool=None, on_result=None, collect=True):
+        on_result(2, {**payload["data"][2], "is_ok": 1})
+        on_result(0, {**payload["data"][0], "is_ok": 1})
+        return [{"error": "login_failed"}]
+
+    asyncio.run(run_lease(queue, "w1", None, scrape, queue.lease("w1", 10, 60)))
+
+    rows = dict(queue.take_completed(batch_id))
+    assert [(rows[i]["url"], rows[i]["is_ok"]) for i in range(3)] == [
+        (item["url"], ok) for item, ok in zip(payload["data"], (1, 0, 1))
+    ]
+    assert rows[1]["error"] == "login_failed"